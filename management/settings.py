@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,12 +40,17 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.forms',
     'web'
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'web.middleware.ProfilageMiddleware',
+    'web.middleware.BudgetRequetesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'web.middleware.RepliqueMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -54,7 +62,8 @@ ROOT_URLCONF = 'management.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, avec le temps de rendu dans Server-Timing
+        'BACKEND': 'web.gabarits.DjangoTemplatesChronometres',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -67,6 +76,9 @@ TEMPLATES = [
     },
 ]
 
+# widgets de formulaire cherchés aussi dans templates/ (web/widgets/)
+FORM_RENDERER = 'django.forms.renderers.TemplatesSetting'
+
 WSGI_APPLICATION = 'management.wsgi.application'
 
 
@@ -80,6 +92,44 @@ DATABASES = {
     }
 }
 
+# Profil SQLite de production (opt-in : FLOTTE_SQLITE_PRODUCTION=1) :
+# WAL (les lecteurs ne bloquent plus l'écrivain), attente au lieu de
+# « database is locked », transactions IMMEDIATE (le verrou d'écriture
+# est pris au BEGIN, jamais au milieu de la transaction).
+SQLITE_OPTIONS_PRODUCTION = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=134217728;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+
+if os.environ.get('FLOTTE_SQLITE_PRODUCTION'):
+    DATABASES['default']['OPTIONS'] = SQLITE_OPTIONS_PRODUCTION
+
+# Réplique de lecture (opt-in : FLOTTE_REPLICA_DB=<nom de la base>) :
+# dashboard, listes et exports y lisent (voir web/routers.py). En test,
+# elle est un miroir de la base par défaut.
+if os.environ.get('FLOTTE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['FLOTTE_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['web.routers.LectureEcritureRouter']
+
+# après une écriture, ce client lit sur la base principale (secondes)
+REPLICA_DELAI_LECTURE = 5
+
+# Vues asynchrones : chaque lecture d'un asyncio.gather sur sa propre
+# connexion (à réserver à PostgreSQL avec OPTIONS["pool"])
+ORM_ASYNC_PARALLELE = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -107,6 +157,124 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 
+# Cache (fragments du tableau de bord, compteur de génération) :
+# mémoire locale par défaut, fichiers partagés entre workers si
+# FLOTTE_CACHE_DIR est défini
+if os.environ.get('FLOTTE_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['FLOTTE_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'flotte',
+        }
+    }
+
+
+# Sessions lues dans le cache, écrites aussi en base (survivent à un
+# vidage du cache)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Sessions, utilisateurs (web/utilisateurs.py), limitations et OTP sont
+# invalidés dans le cache : avec la mémoire locale, chaque worker a le
+# sien et ne voit pas les invalidations des autres (déconnexion, mot de
+# passe, rôle, désactivation). Hors DEBUG, un cache partagé est requis.
+if not DEBUG and CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    raise ImproperlyConfigured(
+        "Cache partagé requis hors DEBUG : définir FLOTTE_CACHE_DIR (ou un autre backend partagé dans CACHES)."
+    )
+
+
+# Budget de requêtes SQL par vue (@budget_requetes) :
+# warning en production, exception si strict (tests)
+QUERY_BUDGET_STRICT = False
+
+
+# Profilage (web/middleware.py, ProfilageMiddleware) : en-tête
+# Server-Timing (SQL, gabarits, vue) sur chaque réponse ; les requêtes
+# plus lentes que seuil_ms, échantillonnées, vont dans le journal
+# requetes-lentes.jsonl avec leurs sql_lentes requêtes SQL les plus
+# lentes. cprofile : part des requêtes passées sous cProfile (coûteux).
+PROFILAGE = {
+    'server_timing': True,
+    'seuil_ms': 500,
+    'echantillon': 1.0,
+    'sql_lentes': 5,
+    'cprofile': 0.0,
+    'profil_lignes': 30,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'brut': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requetes_lentes': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.environ.get('FLOTTE_JOURNAL_LENTES', BASE_DIR / 'requetes-lentes.jsonl'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'brut',
+        },
+    },
+    'loggers': {
+        'web.requetes_lentes': {
+            'handlers': ['requetes_lentes'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Métriques Prometheus (/metrics, web/metriques.py). Avec plusieurs
+# workers, chacun publie ses compteurs dans FLOTTE_METRIQUES_DIR (dossier
+# partagé, au plus toutes les METRIQUES_INTERVALLE secondes) et /metrics
+# les additionne. Lecture réservée à METRIQUES_IPS et aux managers.
+METRIQUES_DIR = os.environ.get('FLOTTE_METRIQUES_DIR')
+METRIQUES_INTERVALLE = 5
+METRIQUES_IPS = ['127.0.0.1', '::1']
+
+
+# Affectation automatique (web/affectation.py) : coût entier d'un couple
+# véhicule / chauffeur, minimisé sur l'ensemble des couples. charge : par
+# véhicule déjà conduit (ou reçu dans le même calcul) ; permis_bientot :
+# permis expirant sous jours_permis jours ; marque_connue : bonus si le
+# chauffeur conduit déjà la marque. par_chauffeur : véhicules reçus au
+# plus par chauffeur et par calcul.
+AFFECTATION = {
+    'charge': 10,
+    'permis_bientot': 5,
+    'jours_permis': 30,
+    'marque_connue': 3,
+    'par_chauffeur': 1,
+}
+
+
+# Limitation des tentatives (web/limitation.py), fenêtre glissante en cache :
+# action -> critère -> (tentatives, fenêtre en secondes). Avec plusieurs
+# workers, le cache doit être partagé (FLOTTE_CACHE_DIR, Redis...).
+LIMITES_TENTATIVES = {
+    'connexion': {'telephone': (5, 300), 'ip': (30, 300)},
+    'otp': {'telephone': (3, 900), 'ip': (10, 900)},
+    'verification_otp': {'utilisateur': (5, 900), 'ip': (30, 900)},
+}
+
+
+# Codes OTP de réinitialisation, en cache (web/otp.py)
+OTP_DUREE = 600
+OTP_ESSAIS_MAX = 5
+
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 LOGIN_URL = '/login/'
@@ -135,6 +303,22 @@ STATICFILES_DIRS = [
 ]
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# En production (DEBUG = False), collectstatic écrit des noms avec
+# empreinte de contenu (style.3f2a....css) et leurs versions gzip et
+# Brotli ; WhiteNoise les sert avec Cache-Control: immutable (dix ans).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
\ No newline at end of file
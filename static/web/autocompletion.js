@@ -0,0 +1,111 @@
+/* Widget Autocompletion (web/forms.py) : le champ texte interroge la vue
+   autocompletion, le choix est reporté dans le champ caché envoyé avec le
+   formulaire. « Plus de résultats » charge la page suivante. */
+(function () {
+  function brancher(zone) {
+    var cache = zone.querySelector("input[type=hidden]");
+    var champ = zone.querySelector("input[type=text]");
+    var liste = zone.querySelector(".autocompletion-resultats");
+    var minuterie = null;
+    var enCours = null;
+
+    function fermer() {
+      liste.hidden = true;
+      liste.innerHTML = "";
+    }
+
+    function choisir(resultat) {
+      cache.value = resultat.id;
+      champ.value = resultat.libelle;
+      fermer();
+    }
+
+    function afficher(donnees, texte) {
+      var suite = liste.querySelector(".autocompletion-suite");
+      if (suite) suite.remove();
+      donnees.resultats.forEach(function (resultat) {
+        var a = document.createElement("a");
+        a.href = "#";
+        a.textContent = resultat.libelle;
+        a.addEventListener("mousedown", function (e) {
+          e.preventDefault();
+          choisir(resultat);
+        });
+        a.resultat = resultat;
+        liste.appendChild(a);
+      });
+      if (donnees.suivant !== null) {
+        suite = document.createElement("div");
+        suite.className = "autocompletion-suite";
+        suite.textContent = "Plus de résultats…";
+        suite.addEventListener("mousedown", function (e) {
+          e.preventDefault();
+          charger(texte, donnees.suivant);
+        });
+        liste.appendChild(suite);
+      }
+      if (!liste.children.length) {
+        var vide = document.createElement("div");
+        vide.className = "autocompletion-suite";
+        vide.textContent = "Aucun résultat.";
+        liste.appendChild(vide);
+      }
+      liste.hidden = false;
+    }
+
+    function charger(texte, avant) {
+      if (enCours) enCours.abort();
+      enCours = new AbortController();
+      var url = zone.dataset.url + "?q=" + encodeURIComponent(texte) + (avant ? "&avant=" + avant : "");
+      fetch(url, { headers: { Accept: "application/json" }, signal: enCours.signal })
+        .then(function (reponse) { return reponse.ok ? reponse.json() : null; })
+        .then(function (donnees) {
+          if (!donnees) return;
+          if (!avant) liste.innerHTML = "";
+          afficher(donnees, texte);
+        })
+        .catch(function () {});
+    }
+
+    function deplacer(pas) {
+      var liens = Array.prototype.slice.call(liste.querySelectorAll("a"));
+      if (!liens.length) return;
+      var actif = liste.querySelector("a.actif");
+      var index = liens.indexOf(actif);
+      index = index < 0 ? (pas > 0 ? 0 : liens.length - 1) : (index + pas + liens.length) % liens.length;
+      if (actif) actif.classList.remove("actif");
+      liens[index].classList.add("actif");
+      liens[index].scrollIntoView({ block: "nearest" });
+    }
+
+    champ.addEventListener("input", function () {
+      // la saisie libre ne vaut pas choix : le champ caché est vidé
+      cache.value = "";
+      clearTimeout(minuterie);
+      minuterie = setTimeout(function () { charger(champ.value.trim()); }, 150);
+    });
+
+    champ.addEventListener("focus", function () {
+      if (!cache.value) charger(champ.value.trim());
+    });
+
+    champ.addEventListener("keydown", function (e) {
+      if (e.key === "ArrowDown" || e.key === "ArrowUp") {
+        e.preventDefault();
+        deplacer(e.key === "ArrowDown" ? 1 : -1);
+      } else if (e.key === "Enter") {
+        var actif = liste.querySelector("a.actif");
+        if (actif) {
+          e.preventDefault();
+          choisir(actif.resultat);
+        }
+      } else if (e.key === "Escape") {
+        fermer();
+      }
+    });
+
+    champ.addEventListener("blur", fermer);
+  }
+
+  document.querySelectorAll(".autocompletion").forEach(brancher);
+})();
@@ -0,0 +1,93 @@
+/* Recherche de la barre du haut : véhicules et chauffeurs au fil de la
+   frappe (vue recherche_flotte). Une seule requête en vol : la saisie
+   suivante annule la précédente. */
+(function () {
+  var zone = document.getElementById("recherche");
+  if (!zone) return;
+  var champ = zone.querySelector("input");
+  var liste = zone.querySelector(".recherche-resultats");
+  var GROUPES = [["vehicules", "Véhicules"], ["chauffeurs", "Chauffeurs"]];
+  var minuterie = null;
+  var enCours = null;
+
+  function fermer() {
+    liste.hidden = true;
+    liste.innerHTML = "";
+  }
+
+  function lien(resultat) {
+    var a = document.createElement("a");
+    a.href = resultat.url;
+    a.textContent = resultat.libelle;
+    var detail = document.createElement("small");
+    detail.textContent = resultat.detail;
+    a.appendChild(detail);
+    return a;
+  }
+
+  function afficher(donnees) {
+    liste.innerHTML = "";
+    GROUPES.forEach(function (groupe) {
+      var resultats = donnees[groupe[0]];
+      if (!resultats.length) return;
+      var titre = document.createElement("div");
+      titre.className = "recherche-groupe";
+      titre.textContent = groupe[1];
+      liste.appendChild(titre);
+      resultats.forEach(function (resultat) { liste.appendChild(lien(resultat)); });
+    });
+    if (!liste.children.length) {
+      var vide = document.createElement("div");
+      vide.className = "recherche-vide";
+      vide.textContent = "Aucun résultat.";
+      liste.appendChild(vide);
+    }
+    liste.hidden = false;
+  }
+
+  function chercher() {
+    var texte = champ.value.trim();
+    if (enCours) enCours.abort();
+    if (!texte) return fermer();
+    enCours = new AbortController();
+    fetch(zone.dataset.url + "?q=" + encodeURIComponent(texte), {
+      headers: { Accept: "application/json" },
+      signal: enCours.signal
+    })
+      .then(function (reponse) { return reponse.ok ? reponse.json() : null; })
+      .then(function (donnees) { if (donnees) afficher(donnees); })
+      .catch(function () {});
+  }
+
+  function deplacer(pas) {
+    var liens = Array.prototype.slice.call(liste.querySelectorAll("a"));
+    if (!liens.length) return;
+    var actif = liste.querySelector("a.actif");
+    var index = liens.indexOf(actif);
+    index = index < 0 ? (pas > 0 ? 0 : liens.length - 1) : (index + pas + liens.length) % liens.length;
+    if (actif) actif.classList.remove("actif");
+    liens[index].classList.add("actif");
+    liens[index].scrollIntoView({ block: "nearest" });
+  }
+
+  champ.addEventListener("input", function () {
+    clearTimeout(minuterie);
+    minuterie = setTimeout(chercher, 150);
+  });
+
+  champ.addEventListener("keydown", function (e) {
+    if (e.key === "ArrowDown" || e.key === "ArrowUp") {
+      e.preventDefault();
+      deplacer(e.key === "ArrowDown" ? 1 : -1);
+    } else if (e.key === "Enter") {
+      var actif = liste.querySelector("a.actif") || liste.querySelector("a");
+      if (actif) window.location = actif.href;
+    } else if (e.key === "Escape") {
+      fermer();
+    }
+  });
+
+  document.addEventListener("click", function (e) {
+    if (!zone.contains(e.target)) fermer();
+  });
+})();
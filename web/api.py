@@ -0,0 +1,226 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.forms.models import model_to_dict
+from django.http import JsonResponse
+
+from .filtres import filtrer_vehicules, filtrer_par_vehicule
+from .forms import VehiculeForm, ChauffeurForm, DocumentVehiculeForm, EntretienForm
+from .generation import generation
+from .pagination import paginer_keyset
+
+
+TAILLE_DEFAUT = 50
+TAILLE_MAX = 200
+
+
+class ErreurApi(Exception):
+    def __init__(self, message, statut=400):
+        super().__init__(message)
+        self.statut = statut
+
+
+# ----------------------------
+# RESSOURCES
+# ----------------------------
+class Ressource:
+    """
+    Description d'une ressource de l'API : champs exposés (les clés
+    étrangères sont rendues par leur id), formulaire d'écriture, relations
+    incluables (nom -> ("select" | "prefetch", ressource cible)), filtre
+    de liste et lecture ouverte aux chauffeurs (sinon : managers seuls).
+    """
+    def __init__(self, formulaire, champs, inclusions=None, filtrer=None, lecture_libre=False):
+        self.formulaire = formulaire
+        self.model = formulaire._meta.model
+        self.champs = champs
+        self.inclusions = inclusions or {}
+        self.filtrer = filtrer
+        self.lecture_libre = lecture_libre
+
+
+def _filtrer_vehicules(queryset, params):
+    return filtrer_vehicules(queryset, params)[0]
+
+
+RESSOURCES = {
+    "vehicules": Ressource(
+        VehiculeForm,
+        ["immatriculation", "marque", "modele", "annee", "kilometrage", "statut", "chauffeur", "date_creation"],
+        {"chauffeur": ("select", "chauffeurs"), "documents": ("prefetch", "documents"),
+         "entretiens": ("prefetch", "entretiens")},
+        _filtrer_vehicules,
+        lecture_libre=True,
+    ),
+    "chauffeurs": Ressource(
+        ChauffeurForm,
+        ["nom", "telephone", "statut", "numero_permis", "date_expiration_permis"],
+        {"vehicules": ("prefetch", "vehicules")},
+    ),
+    "documents": Ressource(
+        DocumentVehiculeForm,
+        ["vehicule", "type_document", "date_expiration"],
+        {"vehicule": ("select", "vehicules")},
+        filtrer_par_vehicule,
+    ),
+    "entretiens": Ressource(
+        EntretienForm,
+        ["vehicule", "type_entretien", "date_prevue", "cout", "effectue"],
+        {"vehicule": ("select", "vehicules")},
+        filtrer_par_vehicule,
+    ),
+}
+
+
+def ressource(nom):
+    if nom not in RESSOURCES:
+        raise ErreurApi(f"Ressource inconnue : {nom}", statut=404)
+    return RESSOURCES[nom]
+
+
+def verifier_lecture(res, params, utilisateur):
+    """
+    Comme les pages HTML : hors managers, seules les ressources en lecture
+    libre se lisent, sans inclure une ressource réservée (téléphone et
+    permis des chauffeurs).
+    """
+    if utilisateur.role == "manager":
+        return
+    incluses = [RESSOURCES[res.inclusions[nom][1]] for nom in inclusions_demandees(res, params)]
+    if not res.lecture_libre or not all(cible.lecture_libre for cible in incluses):
+        raise ErreurApi("Accès refusé.", statut=403)
+
+
+# ----------------------------
+# PARAMÈTRES fields= / include=
+# ----------------------------
+def _liste(params, cle, autorises):
+    valeurs = [v for v in params.get(cle, "").split(",") if v]
+    inconnus = [v for v in valeurs if v not in autorises]
+    if inconnus:
+        raise ErreurApi(f"{cle} inconnu(s) : {', '.join(inconnus)}")
+    return valeurs
+
+
+def champs_demandes(res, params):
+    return _liste(params, "fields", res.champs) or res.champs
+
+
+def inclusions_demandees(res, params):
+    return _liste(params, "include", res.inclusions)
+
+
+def construire_queryset(res, champs, inclusions):
+    """
+    Queryset limité aux colonnes demandées (.only()) ; les inclusions
+    sont jointes (select_related) ou préchargées en une requête chacune
+    (prefetch_related), elles aussi limitées à leurs colonnes.
+    """
+    colonnes = ["id", *champs]
+    queryset = res.model.objects.all()
+
+    for nom in inclusions:
+        mode, cible = res.inclusions[nom]
+        cible = RESSOURCES[cible]
+        if mode == "select":
+            queryset = queryset.select_related(nom)
+            colonnes += [nom, *(f"{nom}__{champ}" for champ in cible.champs)]
+        else:
+            cle = res.model._meta.get_field(nom).field.name
+            queryset = queryset.prefetch_related(Prefetch(
+                nom, queryset=cible.model.objects.only("id", cle, *cible.champs).order_by("id")
+            ))
+
+    return queryset.only(*colonnes)
+
+
+# ----------------------------
+# SÉRIALISATION
+# ----------------------------
+def serialiser(res, objet, champs=None, inclusions=()):
+    donnees = {"id": objet.pk}
+    for champ in champs or res.champs:
+        donnees[champ] = getattr(objet, res.model._meta.get_field(champ).attname)
+
+    for nom in inclusions:
+        mode, cible = res.inclusions[nom]
+        cible = RESSOURCES[cible]
+        if mode == "select":
+            lie = getattr(objet, nom)
+            donnees[nom] = serialiser(cible, lie) if lie is not None else None
+        else:
+            donnees[nom] = [serialiser(cible, lie) for lie in getattr(objet, nom).all()]
+
+    return donnees
+
+
+def reponse_json(donnees, status=200):
+    return JsonResponse(
+        donnees, status=status, encoder=DjangoJSONEncoder,
+        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+    )
+
+
+def lire_corps(request):
+    try:
+        donnees = json.loads(request.body or b"{}")
+    except ValueError:
+        raise ErreurApi("Corps JSON invalide.")
+    if not isinstance(donnees, dict):
+        raise ErreurApi("Objet JSON attendu.")
+    return donnees
+
+
+# ----------------------------
+# LECTURE / ÉCRITURE
+# ----------------------------
+def page(res, params):
+    champs = champs_demandes(res, params)
+    inclusions = inclusions_demandees(res, params)
+    queryset = construire_queryset(res, champs, inclusions)
+    if res.filtrer:
+        queryset = res.filtrer(queryset, params)
+
+    try:
+        taille = min(max(int(params.get("taille", TAILLE_DEFAUT)), 1), TAILLE_MAX)
+    except ValueError:
+        raise ErreurApi("taille doit être un entier.")
+
+    resultat = paginer_keyset(
+        queryset, ("id",), apres=params.get("apres"), avant=params.get("avant"), taille=taille
+    )
+    return {
+        "resultats": [serialiser(res, objet, champs, inclusions) for objet in resultat["objets"]],
+        "suivant": resultat["suivant"],
+        "precedent": resultat["precedent"],
+    }
+
+
+def enregistrer(res, donnees, instance=None):
+    """
+    Création ou modification via le formulaire de la ressource : mêmes
+    règles de validation que les pages HTML. En modification, les champs
+    absents du corps gardent leur valeur (PATCH).
+    """
+    if instance is not None:
+        donnees = {**model_to_dict(instance, fields=res.formulaire._meta.fields), **donnees}
+
+    form = res.formulaire(donnees, instance=instance)
+    if not form.is_valid():
+        return None, form.errors
+    return form.save(), None
+
+
+# ----------------------------
+# ETAG
+# ----------------------------
+def etag(request):
+    """
+    ETag fort calculé sans lire la base : la représentation ne dépend que
+    de l'URL et de la génération de la flotte, qui change à chaque
+    écriture sur les quatre ressources.
+    """
+    empreinte = hashlib.sha256(f"{generation()}:{request.get_full_path()}".encode()).hexdigest()
+    return f'"{empreinte[:32]}"'
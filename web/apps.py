@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WebConfig(AppConfig):
     name = 'web'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,50 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connections
+
+from .stats import kpis_de, reconstruire_fleet_stats, requete_fleet_stats, requetes_alertes
+
+
+# ----------------------------
+# EXÉCUTION DES REQUÊTES
+# ----------------------------
+# Par défaut, l'ORM asynchrone de Django exécute toutes les requêtes d'une
+# requête HTTP dans un même thread (thread_sensitive) : asyncio.gather les
+# enchaîne sans les chevaucher. Avec ORM_ASYNC_PARALLELE (PostgreSQL avec
+# un pool de connexions), chaque lecture part dans son propre thread, sur
+# sa propre connexion, rendue au pool aussitôt après.
+def _lire(queryset):
+    try:
+        return list(queryset)
+    finally:
+        connections[queryset.db].close()
+
+
+async def liste(queryset):
+    if settings.ORM_ASYNC_PARALLELE:
+        return await sync_to_async(_lire, thread_sensitive=False)(queryset)
+    return [objet async for objet in queryset]
+
+
+# ----------------------------
+# TABLEAU DE BORD
+# ----------------------------
+async def akpis_du_jour(jour):
+    stats = await requete_fleet_stats(jour).afirst()
+    if stats is None:
+        stats = await sync_to_async(reconstruire_fleet_stats)(jour)
+    return kpis_de(stats, jour)
+
+
+async def aalertes_flotte(today):
+    requetes = requetes_alertes(today)
+    listes = await asyncio.gather(*(liste(qs) for qs in requetes.values()))
+    return dict(zip(requetes, listes))
+
+
+async def fragment_en_cache(nom, *cles):
+    return await cache.ahas_key(make_template_fragment_key(nom, cles))
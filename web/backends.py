@@ -1,17 +1,42 @@
 from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
 from .models import User
 from django.contrib.auth import get_user_model
+from .utilisateurs import charger_utilisateur, acharger_utilisateur
 
 User = get_user_model()  # ✅ le vrai modèle
 
 class TelephoneBackend(ModelBackend):
     """
-    Authentification via telephone au lieu de username
+    Authentification via telephone au lieu de username.
+
+    Exactement un hachage par tentative : un numéro inconnu coûte un
+    hachage factice (même durée qu'un vrai), et un échec arrête
+    authenticate() (PermissionDenied) pour que ModelBackend, qui suit dans
+    AUTHENTICATION_BACKENDS, ne hache pas une seconde fois.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
         try:
             user = User.objects.get(telephone=username)
-            if user.check_password(password):
-                return user
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            User().set_password(password)
+            raise PermissionDenied
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
+
+    # utilisateur de la session, avec son profil chauffeur : lu dans le
+    # cache (web/utilisateurs.py) plutôt qu'en base à chaque requête
+    def get_user(self, user_id):
+        user = charger_utilisateur(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await acharger_utilisateur(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
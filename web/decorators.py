@@ -0,0 +1,64 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.http import JsonResponse
+
+from .routers import requete_en_cours, replique_configuree, ecriture_recente, aecriture_recente
+
+
+def budget_requetes(maximum):
+    """
+    Déclare le nombre maximal de requêtes SQL d'une vue (session et
+    utilisateur compris). Vérifié par BudgetRequetesMiddleware.
+    """
+    def decorator(view_func):
+        # simple annotation : convient aux vues synchrones et asynchrones
+        view_func.budget_requetes = maximum
+        return view_func
+
+    return decorator
+
+
+def api_authentifie(view_func):
+    """
+    Comme login_required, mais répond 401 en JSON au lieu de rediriger
+    vers la page de connexion.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"erreur": "Authentification requise."}, status=401)
+        return view_func(request, *args, **kwargs)
+
+    return _wrapped_view
+
+
+def lecture_replique(view_func):
+    """
+    Vue en lecture seule : ses requêtes GET lisent sur la réplique, sauf
+    si ce client vient d'écrire. À placer sous @login_required (la session
+    et l'utilisateur restent lus sur la base principale).
+    """
+    def lecture_seule(request):
+        etat = requete_en_cours.get()
+        if etat is not None and replique_configuree() and request.method in ("GET", "HEAD"):
+            return etat
+        return None
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            etat = lecture_seule(request)
+            if etat is not None and not await aecriture_recente(request):
+                etat["lecture_seule"] = True
+            return await view_func(request, *args, **kwargs)
+    else:
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            etat = lecture_seule(request)
+            if etat is not None and not ecriture_recente(request):
+                etat["lecture_seule"] = True
+            return view_func(request, *args, **kwargs)
+
+    return _wrapped_view
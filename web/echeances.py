@@ -0,0 +1,220 @@
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Case, CharField, F, IntegerField, Value, When
+from django.db.models.functions import Concat
+
+from .models import (
+    Vehicule, DocumentVehicule, Entretien, Chauffeur, EcheanceEvent, Etat,
+    DocumentVehiculeQuerySet, ChauffeurQuerySet, EntretienQuerySet,
+)
+
+
+Type = EcheanceEvent.Type
+
+# les règles (délai « bientôt », états) sont celles des querysets d'échéance
+REGLES = {
+    Type.DOCUMENT: DocumentVehiculeQuerySet,
+    Type.PERMIS: ChauffeurQuerySet,
+    Type.ENTRETIEN: EntretienQuerySet,
+}
+
+SOURCES = {
+    DocumentVehicule: (Type.DOCUMENT, "document"),
+    Chauffeur: (Type.PERMIS, "chauffeur"),
+    Entretien: (Type.ENTRETIEN, "entretien"),
+}
+
+# champs des lignes sources dont dépend leur événement (voir _evenement)
+CHAMPS_ECHEANCE = {
+    DocumentVehicule: ("date_expiration", "type_document", "vehicule"),
+    Chauffeur: ("date_expiration_permis", "nom"),
+    Entretien: ("date_prevue", "effectue", "type_entretien", "vehicule"),
+}
+
+
+def classer(type_echeance, date_echeance, jour):
+    regle = REGLES[type_echeance]
+    if date_echeance < jour:
+        return regle.etat_depasse
+    if date_echeance <= jour + timedelta(days=regle.delai_bientot):
+        return Etat.BIENTOT
+    return regle.etat_normal
+
+
+def echues(type_echeance, jour):
+    return EcheanceEvent.objects.filter(type_echeance=type_echeance, date_echeance__lt=jour)
+
+
+def bientot(type_echeance, jour):
+    limite = jour + timedelta(days=REGLES[type_echeance].delai_bientot)
+    return EcheanceEvent.objects.filter(type_echeance=type_echeance, date_echeance__range=[jour, limite])
+
+
+# ----------------------------
+# CONSTRUCTION DES ÉVÉNEMENTS
+# ----------------------------
+def _evenement(objet, jour):
+    if isinstance(objet, DocumentVehicule):
+        return EcheanceEvent(
+            type_echeance=Type.DOCUMENT,
+            date_echeance=objet.date_expiration,
+            etat=classer(Type.DOCUMENT, objet.date_expiration, jour),
+            sujet=objet.vehicule.immatriculation,
+            libelle=objet.get_type_document_display(),
+            vehicule_id=objet.vehicule_id,
+            document=objet,
+        )
+
+    if isinstance(objet, Chauffeur):
+        return EcheanceEvent(
+            type_echeance=Type.PERMIS,
+            date_echeance=objet.date_expiration_permis,
+            etat=classer(Type.PERMIS, objet.date_expiration_permis, jour),
+            sujet=objet.nom,
+            libelle="Permis",
+            chauffeur=objet,
+        )
+
+    # un entretien effectué n'est plus une échéance
+    if objet.effectue:
+        return None
+    return EcheanceEvent(
+        type_echeance=Type.ENTRETIEN,
+        date_echeance=objet.date_prevue,
+        etat=classer(Type.ENTRETIEN, objet.date_prevue, jour),
+        sujet=str(objet.vehicule),
+        libelle=objet.get_type_entretien_display(),
+        vehicule_id=objet.vehicule_id,
+        entretien=objet,
+    )
+
+
+def _sources(model, pks):
+    qs = model._base_manager.filter(pk__in=pks)
+    if model is not Chauffeur:
+        qs = qs.select_related("vehicule")
+    return qs
+
+
+def synchroniser(model, pks, jour, taille=500):
+    """
+    Remplace les événements des lignes sources `pks` par des événements
+    recalculés (par paquets, en écritures groupées).
+    """
+    champ = SOURCES[model][1]
+    pks = list(pks)
+    for i in range(0, len(pks), taille):
+        paquet = pks[i:i + taille]
+        EcheanceEvent.objects.filter(**{f"{champ}_id__in": paquet}).delete()
+        evenements = [_evenement(objet, jour) for objet in _sources(model, paquet)]
+        EcheanceEvent.objects.bulk_create([e for e in evenements if e is not None])
+
+
+def renommer_vehicules(pks, taille=500):
+    """
+    Met à jour le sujet dénormalisé des événements des véhicules `pks`.
+    """
+    pks = list(pks)
+    for i in range(0, len(pks), taille):
+        for vehicule in Vehicule._base_manager.filter(pk__in=pks[i:i + taille]):
+            EcheanceEvent.objects.filter(vehicule=vehicule, type_echeance=Type.DOCUMENT).update(
+                sujet=vehicule.immatriculation
+            )
+            EcheanceEvent.objects.filter(vehicule=vehicule, type_echeance=Type.ENTRETIEN).update(
+                sujet=str(vehicule)
+            )
+
+
+# colonnes de EcheanceEvent remplies par reconstruire()
+COLONNES = [
+    "type_echeance", "date_echeance", "etat", "sujet", "libelle",
+    "vehicule", "document", "chauffeur", "entretien",
+]
+
+
+def _libelle(champ, choix):
+    # get_FOO_display() en SQL : la valeur brute hors des choix
+    return Case(*[When(**{champ: valeur}, then=Value(str(libelle))) for valeur, libelle in choix], default=F(champ))
+
+
+def _selection(model, jour):
+    """
+    Les événements de toutes les lignes de `model`, en une requête SELECT
+    dont les colonnes suivent COLONNES (mêmes règles que _evenement).
+    """
+    type_echeance, champ = SOURCES[model]
+    queryset = model.objects.all()
+    aucun = Value(None, output_field=IntegerField())
+    cles = {f"e_{nom}": aucun for nom in ("vehicule", "document", "chauffeur", "entretien")}
+    cles[f"e_{champ}"] = F("pk")
+
+    if model is Chauffeur:
+        sujet, libelle = F("nom"), Value("Permis")
+    else:
+        cles["e_vehicule"] = F("vehicule_id")
+        if model is DocumentVehicule:
+            sujet = F("vehicule__immatriculation")
+            libelle = _libelle("type_document", DocumentVehicule.TypeDocument.choices)
+        else:
+            queryset = queryset.filter(effectue=False)
+            # str(vehicule)
+            sujet = Concat(
+                "vehicule__marque", Value(" "), "vehicule__modele", Value(" - "), "vehicule__immatriculation",
+                output_field=CharField(),
+            )
+            libelle = _libelle("type_entretien", Entretien.TYPE_CHOICES)
+
+    return queryset.order_by().annotate(
+        e_type_echeance=Value(type_echeance),
+        e_date_echeance=F(queryset.champ_echeance),
+        e_etat=Case(*queryset._cas_etat(jour), default=Value(queryset.etat_normal)),
+        e_sujet=sujet,
+        e_libelle=libelle,
+        **cles,
+    ).values(*(f"e_{nom}" for nom in COLONNES))
+
+
+def reconstruire(jour):
+    """
+    Recrée toute la chronologie depuis les tables sources : un
+    INSERT ... SELECT par table, sans passer les lignes par Python
+    (quelques secondes pour des centaines de milliers d'événements).
+    """
+    using = router.db_for_write(EcheanceEvent)
+    connexion = connections[using]
+    qn = connexion.ops.quote_name
+    colonnes = ", ".join(qn(EcheanceEvent._meta.get_field(nom).column) for nom in COLONNES)
+    # une seule transaction : les lecteurs voient l'ancienne chronologie
+    # jusqu'au commit, les écritures concurrentes (signaux) attendent, et
+    # un échec en cours de route ne laisse pas la chronologie vide
+    with transaction.atomic(using=using):
+        EcheanceEvent.objects.using(using).all().delete()
+        with connexion.cursor() as cursor:
+            for model in SOURCES:
+                sql, params = _selection(model, jour).query.get_compiler(using).as_sql()
+                cursor.execute(f"INSERT INTO {qn(EcheanceEvent._meta.db_table)} ({colonnes}) {sql}", params)
+
+
+def avancer(jour):
+    """
+    Fait avancer l'état des événements au jour `jour` (tâche de nuit).
+    Renvoie le nombre d'événements modifiés.
+    """
+    modifies = 0
+    for type_echeance, regle in REGLES.items():
+        evenements = EcheanceEvent.objects.filter(type_echeance=type_echeance)
+        limite = jour + timedelta(days=regle.delai_bientot)
+        modifies += (
+            evenements.filter(date_echeance__lt=jour)
+            .exclude(etat=regle.etat_depasse).update(etat=regle.etat_depasse)
+        )
+        modifies += (
+            evenements.filter(date_echeance__range=[jour, limite])
+            .exclude(etat=Etat.BIENTOT).update(etat=Etat.BIENTOT)
+        )
+        modifies += (
+            evenements.filter(date_echeance__gt=limite)
+            .exclude(etat=regle.etat_normal).update(etat=regle.etat_normal)
+        )
+    return modifies
@@ -0,0 +1,126 @@
+import csv
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .filtres import filtrer_vehicules, filtrer_par_vehicule, TRIS_VEHICULES, TRI_VEHICULES_DEFAUT
+from .models import Vehicule, DocumentVehicule, Entretien
+
+
+TAILLE_PAQUET = 2000
+
+
+# ----------------------------
+# COLONNES (en-tête CSV -> champ)
+# ----------------------------
+# Les en-têtes reprennent les colonnes de l'import : un export peut être
+# ré-importé tel quel.
+COLONNES_VEHICULES = [
+    ("immatriculation", "immatriculation"),
+    ("marque", "marque"),
+    ("modele", "modele"),
+    ("annee", "annee"),
+    ("kilometrage", "kilometrage"),
+    ("statut", "statut"),
+    ("numero_permis", "chauffeur__numero_permis"),
+    ("date_creation", "date_creation"),
+]
+
+COLONNES_DOCUMENTS = [
+    ("immatriculation", "vehicule__immatriculation"),
+    ("type_document", "type_document"),
+    ("date_expiration", "date_expiration"),
+    ("etat", "etat"),
+]
+
+COLONNES_ENTRETIENS = [
+    ("immatriculation", "vehicule__immatriculation"),
+    ("type_entretien", "type_entretien"),
+    ("date_prevue", "date_prevue"),
+    ("cout", "cout"),
+    ("effectue", "effectue"),
+    ("etat", "etat"),
+]
+
+
+# ----------------------------
+# QUERYSETS (mêmes filtres que les listes)
+# ----------------------------
+def lignes_vehicules(params):
+    vehicules, _ = filtrer_vehicules(Vehicule.objects.all(), params)
+    tri = params.get("tri", TRI_VEHICULES_DEFAUT)
+    return vehicules.order_by(*TRIS_VEHICULES.get(tri, TRIS_VEHICULES[TRI_VEHICULES_DEFAUT]))
+
+
+def lignes_documents(params):
+    documents = DocumentVehicule.objects.avec_etat(timezone.now().date())
+    return filtrer_par_vehicule(documents, params).order_by("date_expiration", "id")
+
+
+def lignes_entretiens(params):
+    entretiens = Entretien.objects.avec_etat(timezone.now().date())
+    return filtrer_par_vehicule(entretiens, params).order_by("-date_prevue", "-id")
+
+
+EXPORTS = {
+    "vehicules": (lignes_vehicules, COLONNES_VEHICULES),
+    "documents": (lignes_documents, COLONNES_DOCUMENTS),
+    "entretiens": (lignes_entretiens, COLONNES_ENTRETIENS),
+}
+
+
+# ----------------------------
+# CSV EN FLUX
+# ----------------------------
+# Une cellule texte qui commence par l'un de ces caractères est évaluée
+# comme une formule par les tableurs : préfixée d'une apostrophe (retirée
+# à l'import, voir importation._normaliser)
+DEBUTS_FORMULE = ("=", "+", "-", "@", "\t", "\r")
+
+
+def neutraliser(valeur):
+    if isinstance(valeur, str) and valeur.startswith(DEBUTS_FORMULE):
+        return "'" + valeur
+    return valeur
+
+
+class Echo:
+    """
+    Pseudo-fichier : write() renvoie la ligne au lieu de la stocker.
+    """
+    def write(self, valeur):
+        return valeur
+
+
+def flux_csv(queryset, colonnes, taille=TAILLE_PAQUET):
+    """
+    Produit le CSV au fil de la lecture : des tuples (values_list) lus par
+    paquets de `taille` via iterator(), sans instancier de modèles. Chaque
+    paquet est envoyé en un seul morceau.
+    """
+    writer = csv.writer(Echo())
+    yield "\ufeff" + writer.writerow([entete for entete, _ in colonnes])
+
+    champs = [champ for _, champ in colonnes]
+    morceau = []
+    for ligne in queryset.values_list(*champs).iterator(chunk_size=taille):
+        morceau.append(writer.writerow([neutraliser(valeur) for valeur in ligne]))
+        if len(morceau) >= taille:
+            yield "".join(morceau)
+            morceau = []
+    if morceau:
+        yield "".join(morceau)
+
+
+def reponse_csv(nom, params):
+    lignes, colonnes = EXPORTS[nom]
+    queryset = lignes(params)
+    # le flux est lu après la vue : on fige la base choisie par le routeur
+    queryset = queryset.using(queryset.db)
+    response = StreamingHttpResponse(
+        flux_csv(queryset, colonnes),
+        content_type="text/csv; charset=utf-8",
+    )
+    jour = timezone.now().date().isoformat()
+    response["Content-Disposition"] = f'attachment; filename="{nom}-{jour}.csv"'
+    return response
@@ -0,0 +1,62 @@
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+
+from .models import Vehicule
+
+
+# ----------------------------
+# FILTRES VEHICULES (liste, exports...)
+# ----------------------------
+TRIS_VEHICULES = {
+    "-date_creation": ("-date_creation", "-id"),
+    "date_creation": ("date_creation", "id"),
+    "immatriculation": ("immatriculation", "id"),
+    "-immatriculation": ("-immatriculation", "-id"),
+    "marque": ("marque", "modele", "id"),
+    "kilometrage": ("kilometrage", "id"),
+    "-kilometrage": ("-kilometrage", "-id"),
+}
+
+TRI_VEHICULES_DEFAUT = "-date_creation"
+
+
+def filtrer_vehicules(queryset, params):
+    """
+    Applique les filtres statut / marque / chauffeur de la requête.
+    Renvoie le queryset filtré et les filtres effectivement retenus.
+    """
+    filtres = {}
+
+    statut = params.get("statut", "")
+    if statut in Vehicule.Statut.values:
+        queryset = queryset.filter(statut=statut)
+        filtres["statut"] = statut
+
+    marque = params.get("marque", "").strip()
+    if marque:
+        # LOWER des deux côtés plutôt que iexact (LIKE sous SQLite, UPPER
+        # sous PostgreSQL) : même expression que l'index vehicule_marque_ci_idx
+        queryset = queryset.filter(Exact(Lower("marque"), Lower(Value(marque))))
+        filtres["marque"] = marque
+
+    chauffeur = params.get("chauffeur", "")
+    if chauffeur in ("oui", "non"):
+        queryset = queryset.filter(chauffeur__isnull=(chauffeur == "non"))
+        filtres["chauffeur"] = chauffeur
+
+    return queryset, filtres
+
+
+# ----------------------------
+# FILTRE PAR VÉHICULE (documents, entretiens)
+# ----------------------------
+def filtrer_par_vehicule(queryset, params):
+    """
+    Restreint aux lignes du véhicule `?vehicule=<id>`, comme les listes
+    par véhicule.
+    """
+    vehicule_id = params.get("vehicule", "")
+    if vehicule_id.isdigit():
+        queryset = queryset.filter(vehicule_id=vehicule_id)
+    return queryset
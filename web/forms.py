@@ -1,5 +1,40 @@
 from .models import Vehicule, DocumentVehicule, Entretien, Chauffeur, User
 from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+
+# ----------------------------
+# Autocomplétion (clés étrangères)
+# ----------------------------
+class Autocompletion(forms.Widget):
+    """
+    Champ texte qui interroge la vue `autocompletion` au fil de la frappe,
+    à la place d'un <select> qui chargerait toute la table. Seul l'objet
+    de la valeur actuelle est lu, pour son libellé.
+    """
+    template_name = "web/widgets/autocompletion.html"
+
+    def __init__(self, source, attrs=None):
+        super().__init__(attrs)
+        self.source = source
+        # ModelChoiceField y range son itérateur de choix (jamais parcouru)
+        self.choices = None
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["url"] = reverse("autocompletion", args=[self.source])
+        context["widget"]["libelle"] = self.libelle(value)
+        return context
+
+    def libelle(self, value):
+        champ = self.choices.field
+        try:
+            # une seule ligne, par la validation du champ
+            objet = champ.to_python(value)
+        except ValidationError:
+            return ""
+        return champ.label_from_instance(objet) if objet is not None else ""
 
 # ... Existing forms ...
 
@@ -80,6 +115,14 @@ class VehiculeForm(forms.ModelForm):
     class Meta:
         model = Vehicule
         fields = "__all__"
+        widgets = {
+            "chauffeur": Autocompletion("chauffeurs"),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if "chauffeur" in self.fields:
+            self.fields["chauffeur"].queryset = Chauffeur.objects.select_related("utilisateur")
 
 
 class DocumentVehiculeForm(forms.ModelForm):
@@ -87,6 +130,7 @@ class DocumentVehiculeForm(forms.ModelForm):
         model = DocumentVehicule
         fields = "__all__"
         widgets = {
+            "vehicule": Autocompletion("vehicules"),
             "date_emission": forms.DateInput(attrs={"type": "date"}),
             "date_expiration": forms.DateInput(attrs={"type": "date"}),
         }
@@ -99,6 +143,14 @@ class AssignVehiculeForm(forms.ModelForm):
         labels = {
             "chauffeur": "Choisir un chauffeur"
         }
+        widgets = {
+            "chauffeur": Autocompletion("chauffeurs"),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Chauffeur.__str__ lit l'utilisateur : joint au libellé du chauffeur actuel
+        self.fields["chauffeur"].queryset = Chauffeur.objects.select_related("utilisateur")
 
 
 class EntretienForm(forms.ModelForm):
@@ -106,5 +158,18 @@ class EntretienForm(forms.ModelForm):
         model = Entretien
         fields = ["vehicule", "type_entretien", "date_prevue", "cout", "effectue"]
         widgets = {
+            "vehicule": Autocompletion("vehicules"),
             "date_prevue": forms.DateInput(attrs={"type": "date"})
-        }
\ No newline at end of file
+        }
+
+
+class ImportFlotteForm(forms.Form):
+    TYPE_CHOICES = (
+        ("vehicules", "Véhicules"),
+        ("chauffeurs", "Chauffeurs"),
+        ("documents", "Documents"),
+        ("entretiens", "Entretiens"),
+    )
+
+    type_import = forms.ChoiceField(choices=TYPE_CHOICES, label="Type de données")
+    fichier = forms.FileField(label="Fichier CSV ou JSONL")
@@ -0,0 +1,40 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .middleware import mesure_en_cours
+
+
+# ----------------------------
+# GABARITS CHRONOMÉTRÉS
+# ----------------------------
+# Le signal template_rendered n'est envoyé que sous le lanceur de tests
+# (et sans durée) : le temps de rendu est pris ici, au niveau du moteur.
+class TemplateChronometre(Template):
+
+    def render(self, context=None, request=None):
+        mesure = mesure_en_cours.get()
+        # hors requête, ou gabarit rendu depuis un autre (déjà compté)
+        if mesure is None or mesure.en_rendu:
+            return super().render(context, request)
+
+        mesure.en_rendu = True
+        sql_avant = mesure.sql.duree
+        debut = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            mesure.en_rendu = False
+            mesure.gabarits += time.perf_counter() - debut - (mesure.sql.duree - sql_avant)
+
+
+class DjangoTemplatesChronometres(DjangoTemplates):
+    """
+    Moteur DjangoTemplates dont chaque rendu alimente la Mesure de la
+    requête en cours (ProfilageMiddleware).
+    """
+    def from_string(self, template_code):
+        return TemplateChronometre(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TemplateChronometre(super().get_template(template_name).template, self)
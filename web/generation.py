@@ -0,0 +1,37 @@
+import time
+
+from django.core.cache import cache
+
+
+CLE_GENERATION = "flotte:generation"
+
+# durée de vie des fragments : la clé change de toute façon à chaque
+# modification de la flotte (génération) et à minuit (jour)
+DUREE_FRAGMENTS = 60 * 60 * 24
+
+
+# ----------------------------
+# COMPTEUR DE GÉNÉRATION DE LA FLOTTE
+# ----------------------------
+# Les fragments de gabarit mis en cache sont indexés par ce compteur :
+# l'incrémenter invalide d'un coup tous les fragments, sans les parcourir.
+# S'il disparaît du cache (redémarrage, éviction), il repart d'une valeur
+# horodatée, donc jamais d'une génération déjà utilisée.
+def _initialiser():
+    cache.add(CLE_GENERATION, time.time_ns(), timeout=None)
+
+
+def generation():
+    valeur = cache.get(CLE_GENERATION)
+    if valeur is None:
+        _initialiser()
+        valeur = cache.get(CLE_GENERATION)
+    return valeur
+
+
+def incrementer_generation():
+    try:
+        return cache.incr(CLE_GENERATION)
+    except ValueError:
+        _initialiser()
+        return cache.incr(CLE_GENERATION)
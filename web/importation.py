@@ -0,0 +1,231 @@
+import csv
+import io
+import json
+import time
+
+from django.db import IntegrityError, transaction
+
+from .exports import DEBUTS_FORMULE
+from .forms import VehiculeForm, ChauffeurForm, DocumentVehiculeForm, EntretienForm
+from .models import Vehicule, DocumentVehicule, Entretien, Chauffeur
+
+
+ERREURS_MAX = 500
+
+
+# ----------------------------
+# FORMULAIRES D'IMPORT
+# ----------------------------
+# Mêmes règles que les formulaires de saisie, mais :
+# - les clés étrangères sont résolues par clé naturelle, par lot ;
+# - l'unicité est vérifiée par lot (une requête) et non ligne par ligne.
+class ImportFormMixin:
+    def validate_unique(self):
+        pass
+
+
+class VehiculeImportForm(ImportFormMixin, VehiculeForm):
+    class Meta(VehiculeForm.Meta):
+        fields = ["immatriculation", "marque", "modele", "annee", "kilometrage", "statut"]
+
+
+class ChauffeurImportForm(ImportFormMixin, ChauffeurForm):
+    pass
+
+
+class DocumentImportForm(ImportFormMixin, DocumentVehiculeForm):
+    class Meta(DocumentVehiculeForm.Meta):
+        fields = ["type_document", "date_expiration"]
+
+
+class EntretienImportForm(ImportFormMixin, EntretienForm):
+    class Meta(EntretienForm.Meta):
+        fields = ["type_entretien", "date_prevue", "cout", "effectue"]
+
+
+# type -> (formulaire, champ unique, (colonne, champ FK, modèle, clé naturelle))
+TYPES = {
+    "vehicules": (VehiculeImportForm, "immatriculation", ("numero_permis", "chauffeur", Chauffeur, "numero_permis")),
+    "chauffeurs": (ChauffeurImportForm, "numero_permis", None),
+    "documents": (DocumentImportForm, None, ("immatriculation", "vehicule", Vehicule, "immatriculation")),
+    "entretiens": (EntretienImportForm, None, ("immatriculation", "vehicule", Vehicule, "immatriculation")),
+}
+
+
+class RapportImport:
+    def __init__(self):
+        self.lus = 0
+        self.crees = 0
+        self.rejetes = 0
+        self.erreurs = []
+        self.debut = time.monotonic()
+
+    def erreur(self, ligne, message):
+        self.rejetes += 1
+        if len(self.erreurs) < ERREURS_MAX:
+            self.erreurs.append((ligne, message))
+
+    @property
+    def duree(self):
+        return time.monotonic() - self.debut
+
+    @property
+    def lignes_par_seconde(self):
+        return self.lus / self.duree if self.duree else 0
+
+    def __str__(self):
+        return (
+            f"{self.lus} lignes lues, {self.crees} créées, {self.rejetes} rejetées "
+            f"— {self.lignes_par_seconde:.0f} lignes/s"
+        )
+
+
+# ----------------------------
+# LECTURE EN FLUX
+# ----------------------------
+def lire_lignes(flux, format):
+    """
+    Itère sur les lignes d'un flux texte CSV ou JSONL sans le charger.
+    Produit des couples (numéro de ligne, dict).
+    """
+    if format == "jsonl":
+        for numero, brut in enumerate(flux, start=1):
+            if not brut.strip():
+                continue
+            try:
+                donnees = json.loads(brut)
+            except ValueError as e:
+                yield numero, e
+                continue
+            yield numero, donnees if isinstance(donnees, dict) else ValueError("objet JSON attendu")
+    else:
+        for numero, donnees in enumerate(csv.DictReader(flux), start=2):
+            yield numero, donnees
+
+
+def ouvrir_televersement(fichier):
+    return io.TextIOWrapper(fichier.file, encoding="utf-8-sig", newline="")
+
+
+def format_du_fichier(nom):
+    return "jsonl" if nom.lower().endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+def _normaliser(donnees):
+    # JSONL : nombres, booléens et null deviennent du texte, comme en CSV ;
+    # une valeur invalide est alors rejetée par le formulaire, ligne par ligne
+    return {
+        k: "" if v is None else _restaurer(str(v).strip())
+        for k, v in donnees.items() if k
+    }
+
+
+def _restaurer(valeur):
+    # cellule neutralisée par l'export (exports.neutraliser)
+    if valeur.startswith("'") and valeur[1:].startswith(DEBUTS_FORMULE):
+        return valeur[1:]
+    return valeur
+
+
+def _paquets(lignes, taille):
+    paquet = []
+    for ligne in lignes:
+        paquet.append(ligne)
+        if len(paquet) >= taille:
+            yield paquet
+            paquet = []
+    if paquet:
+        yield paquet
+
+
+# ----------------------------
+# IMPORT
+# ----------------------------
+def importer(type_import, flux, format="csv", taille_lot=1000, progression=None):
+    """
+    Importe un flux ligne par ligne, par lots de `taille_lot` lignes :
+    validation par les ModelForms, résolution des clés étrangères et
+    contrôle des doublons en une requête par lot, puis bulk_create dans
+    une transaction par lot. La mémoire utilisée ne dépend que de la
+    taille d'un lot.
+    """
+    form_class, champ_unique, relation = TYPES[type_import]
+    model = form_class._meta.model
+    rapport = RapportImport()
+
+    for paquet in _paquets(lire_lignes(flux, format), taille_lot):
+        rapport.lus += len(paquet)
+        valides = []
+
+        # clés étrangères et doublons : une requête chacun pour tout le lot
+        lignes = [(n, _normaliser(d)) for n, d in paquet if isinstance(d, dict)]
+        for numero, erreur in paquet:
+            if not isinstance(erreur, dict):
+                rapport.erreur(numero, f"ligne illisible ({erreur})")
+
+        references = {}
+        if relation:
+            colonne, champ_fk, model_fk, cle = relation
+            valeurs = {d[colonne] for _, d in lignes if d.get(colonne)}
+            references = dict(
+                model_fk.objects.filter(**{f"{cle}__in": valeurs}).values_list(cle, "pk")
+            )
+
+        existants = set()
+        if champ_unique:
+            valeurs = {d.get(champ_unique, "") for _, d in lignes}
+            existants = set(
+                model.objects.filter(**{f"{champ_unique}__in": valeurs})
+                .values_list(champ_unique, flat=True)
+            )
+
+        for numero, donnees in lignes:
+            if champ_unique:
+                valeur = donnees.get(champ_unique, "")
+                if valeur in existants:
+                    rapport.erreur(numero, f"doublon : {champ_unique} « {valeur} » existe déjà")
+                    continue
+
+            instance = model()
+            if relation and donnees.get(colonne):
+                if donnees[colonne] not in references:
+                    rapport.erreur(numero, f"{colonne} « {donnees[colonne]} » introuvable")
+                    continue
+                setattr(instance, f"{champ_fk}_id", references[donnees[colonne]])
+            elif relation and champ_fk == "vehicule":
+                rapport.erreur(numero, f"{colonne} manquant")
+                continue
+
+            # champs absents du fichier : valeur par défaut du modèle
+            for nom in form_class._meta.fields:
+                champ = model._meta.get_field(nom)
+                if nom not in donnees and champ.has_default():
+                    donnees[nom] = champ.get_default()
+
+            form = form_class(donnees, instance=instance)
+            if not form.is_valid():
+                message = "; ".join(
+                    f"{champ} : {' '.join(erreurs)}" for champ, erreurs in form.errors.items()
+                )
+                rapport.erreur(numero, message)
+                continue
+
+            if champ_unique:
+                existants.add(donnees[champ_unique])
+            valides.append((numero, form.save(commit=False)))
+
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([objet for _, objet in valides], batch_size=500)
+        except IntegrityError as e:
+            # ligne créée entre-temps (import concurrent), contrainte non
+            # vérifiée par lot : le lot est annulé, ses lignes rejetées
+            for numero, _ in valides:
+                rapport.erreur(numero, f"lot rejeté par la base : {e}")
+        else:
+            rapport.crees += len(valides)
+
+        if progression:
+            progression(rapport)
+
+    return rapport
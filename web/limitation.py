@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# ----------------------------
+# LIMITATION DES TENTATIVES (FENÊTRE GLISSANTE)
+# ----------------------------
+# Un compteur par critère (téléphone, IP) et par fenêtre fixe, dans le
+# cache. La fenêtre glissante est estimée à partir de la fenêtre en cours
+# et de la précédente, pondérée par la part encore couverte : deux clés
+# par critère, lues en un seul get_many, sans stocker chaque tentative.
+def _cles(action, critere, valeur, fenetre, maintenant):
+    numero = int(maintenant // fenetre)
+    prefixe = f"limite:{action}:{critere}:{valeur}"
+    return f"{prefixe}:{numero}", f"{prefixe}:{numero - 1}"
+
+
+def _incrementer(cle, fenetre):
+    # la clé doit survivre à la fenêtre suivante, où elle sert de « précédente »
+    if cache.add(cle, 1, timeout=2 * fenetre):
+        return
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.add(cle, 1, timeout=2 * fenetre)
+
+
+def tentative_autorisee(action, **criteres):
+    """
+    Enregistre une tentative pour l'action (clé de LIMITES_TENTATIVES) et
+    renvoie False si l'un des critères (telephone=..., ip=...) a déjà
+    atteint sa limite. Une tentative refusée n'est pas comptée.
+    """
+    limites = settings.LIMITES_TENTATIVES[action]
+    maintenant = time.time()
+
+    cles = {}
+    for critere, valeur in criteres.items():
+        if not valeur or critere not in limites:
+            continue
+        maximum, fenetre = limites[critere]
+        cles[critere] = _cles(action, critere, valeur, fenetre, maintenant)
+
+    compteurs = cache.get_many([cle for paire in cles.values() for cle in paire])
+    for critere, (actuelle, precedente) in cles.items():
+        maximum, fenetre = limites[critere]
+        recouvrement = 1 - (maintenant % fenetre) / fenetre
+        estime = compteurs.get(actuelle, 0) + compteurs.get(precedente, 0) * recouvrement
+        if estime >= maximum:
+            return False
+
+    for critere, (actuelle, _) in cles.items():
+        _incrementer(actuelle, limites[critere][1])
+    return True
+
+
+def ip_client(request):
+    # derrière un proxy, c'est au serveur frontal de renseigner REMOTE_ADDR
+    return request.META.get("REMOTE_ADDR", "")
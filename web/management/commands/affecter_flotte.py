@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from web import affectation
+
+
+class Command(BaseCommand):
+    help = (
+        "Affecte les véhicules disponibles sans chauffeur (ou au chauffeur sans "
+        "permis valide) aux chauffeurs disponibles au permis valide, au coût "
+        "total minimal (charge, marque connue, permis bientôt expiré)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--simulation", action="store_true", help="Calcule sans rien écrire")
+        for cle, valeur in settings.AFFECTATION.items():
+            parser.add_argument(f"--{cle.replace('_', '-')}", type=int, default=valeur)
+
+    def handle(self, *args, **options):
+        poids = {cle: options[cle] for cle in settings.AFFECTATION}
+        if min(poids.values()) < 0 or poids["par_chauffeur"] < 1:
+            raise CommandError("Poids positifs attendus, et --par-chauffeur d'au moins 1.")
+
+        jour = timezone.now().date()
+        debut = time.perf_counter()
+        if options["simulation"]:
+            resultat = affectation.calculer(jour, poids)
+        else:
+            resultat = affectation.affecter(jour, poids)
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(
+            f"{resultat.vehicules} véhicule(s) à affecter, {resultat.chauffeurs} chauffeur(s) éligible(s), "
+            f"coût total {resultat.cout}"
+        )
+        verbe = "proposée(s)" if options["simulation"] else "appliquée(s)"
+        self.stdout.write(self.style.SUCCESS(f"{len(resultat.propositions)} affectation(s) {verbe} en {duree:.2f} s"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from web import echeances
+from web.stats import reconstruire_fleet_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Fait avancer l'état des échéances (expiré, en retard, bientôt) au jour courant "
+        "et crée sa ligne FleetStats. À lancer chaque nuit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reconstruire", action="store_true",
+            help="Recrée toute la chronologie depuis les documents, permis et entretiens",
+        )
+
+    def handle(self, *args, **options):
+        jour = timezone.now().date()
+
+        if options["reconstruire"]:
+            echeances.reconstruire(jour)
+            self.stdout.write(self.style.SUCCESS("Chronologie des échéances reconstruite"))
+        else:
+            modifies = echeances.avancer(jour)
+            self.stdout.write(self.style.SUCCESS(f"{modifies} échéance(s) mise(s) à jour au {jour}"))
+
+        # hors du chemin des requêtes : le tableau de bord ne fait que lire
+        reconstruire_fleet_stats(jour)
+        self.stdout.write(self.style.SUCCESS(f"FleetStats du {jour} reconstruit"))
@@ -0,0 +1,107 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from web.models import User, Vehicule
+
+
+# page -> (vue synchrone, variante asynchrone)
+PAGES = {
+    "dashboard": ("dashboard", "dashboard_async"),
+    "documents": ("document_list", "document_list_async"),
+    "entretiens": ("entretien_list", "entretien_list_async"),
+}
+
+
+def centiles(durees):
+    durees = sorted(durees)
+    p95 = durees[min(len(durees) - 1, int(len(durees) * 0.95))]
+    return statistics.median(durees) * 1000, p95 * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence (p50 / p95) des pages en déploiement WSGI (vues "
+        "synchrones) et ASGI (variantes asynchrones), sur la base configurée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requetes", type=int, default=200, help="Requêtes par page et par mode")
+        parser.add_argument("--concurrence", type=int, default=10)
+        parser.add_argument("--page", choices=[*PAGES, "toutes"], default="toutes")
+
+    def urls(self, page, vehicule_id):
+        args = [] if page == "dashboard" else [vehicule_id]
+        synchrone, asynchrone = PAGES[page]
+        return reverse(synchrone, args=args), reverse(asynchrone, args=args)
+
+    # ----------------------------
+    # WSGI : un thread par client
+    # ----------------------------
+    def mesurer_wsgi(self, url, cookies):
+        def une_requete(_):
+            client = Client()
+            client.cookies = cookies
+            debut = time.perf_counter()
+            response = client.get(url)
+            duree = time.perf_counter() - debut
+            connections.close_all()
+            if response.status_code != 200:
+                raise CommandError(f"{url} : HTTP {response.status_code}")
+            return duree
+
+        with ThreadPoolExecutor(self.concurrence) as pool:
+            return list(pool.map(une_requete, range(self.requetes)))
+
+    # ----------------------------
+    # ASGI : des coroutines sur une boucle
+    # ----------------------------
+    async def mesurer_asgi(self, url, cookies):
+        limite = asyncio.Semaphore(self.concurrence)
+
+        async def une_requete():
+            async with limite:
+                client = AsyncClient()
+                client.cookies = cookies
+                debut = time.perf_counter()
+                response = await client.get(url)
+                duree = time.perf_counter() - debut
+                if response.status_code != 200:
+                    raise CommandError(f"{url} : HTTP {response.status_code}")
+                return duree
+
+        return await asyncio.gather(*(une_requete() for _ in range(self.requetes)))
+
+    def handle(self, *args, **options):
+        self.requetes = options["requetes"]
+        self.concurrence = options["concurrence"]
+
+        manager = User.objects.filter(role="manager").first()
+        vehicule_id = Vehicule.objects.values_list("pk", flat=True).first()
+        if manager is None or vehicule_id is None:
+            raise CommandError("Il faut au moins un manager et un véhicule dans la base.")
+
+        client = Client()
+        client.force_login(manager)
+        cookies = client.cookies
+
+        pages = PAGES if options["page"] == "toutes" else [options["page"]]
+        self.stdout.write(f"{self.requetes} requêtes par mesure, concurrence {self.concurrence}")
+        for page in pages:
+            url_wsgi, url_asgi = self.urls(page, vehicule_id)
+            # les clients de test s'annoncent comme « testserver »
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                wsgi = self.mesurer_wsgi(url_wsgi, cookies)
+                asgi = asyncio.run(self.mesurer_asgi(url_asgi, cookies))
+
+            self.stdout.write(self.style.MIGRATE_HEADING(page))
+            for mode, durees in (("WSGI", wsgi), ("ASGI", asgi)):
+                p50, p95 = centiles(durees)
+                self.stdout.write(f"  {mode} : p50 {p50:7.1f} ms   p95 {p95:7.1f} ms")
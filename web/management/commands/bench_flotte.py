@@ -0,0 +1,216 @@
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from web.middleware import CompteurSQL
+from web.models import Vehicule, DocumentVehicule, Entretien
+from web.routers import replique_configuree
+from web.synthese import construire_flotte, MOT_DE_PASSE
+from web.urls import urlpatterns
+
+
+# arguments des routes paramétrées, à partir des objets de référence
+ARGUMENTS = {
+    "vehicule_update": lambda ids: [ids["vehicule"]],
+    "vehicule_delete": lambda ids: [ids["vehicule"]],
+    "vehicule_assign": lambda ids: [ids["vehicule"]],
+    "document_update": lambda ids: [ids["document"]],
+    "document_delete": lambda ids: [ids["document"]],
+    "document_list": lambda ids: [ids["vehicule"]],
+    "document_list_async": lambda ids: [ids["vehicule"]],
+    "entretien_update": lambda ids: [ids["entretien"]],
+    "entretien_delete": lambda ids: [ids["entretien"]],
+    "entretien_list": lambda ids: [ids["vehicule"]],
+    "entretien_list_async": lambda ids: [ids["vehicule"]],
+    "chauffeur_update": lambda ids: [ids["chauffeur"]],
+    "chauffeur_delete": lambda ids: [ids["chauffeur"]],
+    "export_csv": lambda ids: ["vehicules"],
+    "api_liste": lambda ids: ["vehicules"],
+    "api_detail": lambda ids: ["vehicules", ids["vehicule"]],
+    "autocompletion": lambda ids: ["chauffeurs"],
+}
+
+# sans limitation des tentatives : la connexion est rejouée à chaque itération
+SANS_LIMITE = {
+    action: {critere: (10 ** 9, 60) for critere in criteres}
+    for action, criteres in settings.LIMITES_TENTATIVES.items()
+}
+
+
+def centile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque route de web/urls.py (manager et chauffeur) sur une "
+        "flotte synthétique : latence p50 / p95 / p99, requêtes SQL et temps "
+        "SQL. Résultats en JSON, comparables à une référence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vehicules", type=int, default=1000, help="Taille de la flotte (1000, 10000, 100000...)")
+        parser.add_argument("--iterations", type=int, default=30, help="Requêtes mesurées par route et par rôle")
+        parser.add_argument("--route", action="append", help="Limiter à ces noms de route")
+        parser.add_argument("--sortie", help="Fichier JSON des résultats")
+        parser.add_argument("--comparer", help="Fichier JSON de référence")
+        parser.add_argument(
+            "--seuil", type=float, default=0.2,
+            help="Hausse relative du p95 tolérée avant de signaler une régression",
+        )
+
+    # ----------------------------
+    # SCÉNARIOS
+    # ----------------------------
+    def scenarios(self, ids):
+        """
+        (clé, utilisateur, méthode, url, données) : chaque route en GET
+        pour les deux rôles, plus la connexion par formulaire.
+        """
+        for pattern in urlpatterns:
+            nom = pattern.name
+            if self.routes and nom not in self.routes:
+                continue
+            if pattern.pattern.converters and nom not in ARGUMENTS:
+                raise CommandError(f"Route {nom} sans arguments dans bench_flotte.ARGUMENTS")
+            url = reverse(nom, args=ARGUMENTS[nom](ids) if nom in ARGUMENTS else [])
+            for role in ("manager", "driver"):
+                yield f"{nom}:{role}", ids[role], "get", url, None
+
+        if not self.routes or "login" in self.routes:
+            yield "login:post", None, "post", reverse("login"), {
+                "telephone": ids["driver"].telephone, "password": MOT_DE_PASSE,
+            }
+
+    def mesurer(self, utilisateur, methode, url, donnees):
+        client = Client()
+        durees, requetes, temps_sql, statuts = [], [], [], set()
+
+        # une requête d'échauffement (caches, gabarits compilés)
+        for i in range(self.iterations + 1):
+            # connexion une fois pour toutes (sauf après logout) : chaque
+            # login met à jour last_login et vide le cache de l'utilisateur
+            if utilisateur is not None and "_auth_user_id" not in client.session:
+                client.force_login(utilisateur)
+            # requêtes et temps SQL hors curseur de débogage (et son arrondi à
+            # la milliseconde) ; la lecture des lignes, quand le pilote la
+            # fait à la demande, reste dans le temps de la vue
+            chrono = CompteurSQL()
+            with chrono.installer():
+                debut = time.perf_counter()
+                response = getattr(client, methode)(url, donnees)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                duree = time.perf_counter() - debut
+            if i == 0:
+                continue
+            durees.append(duree * 1000)
+            requetes.append(chrono.requetes)
+            temps_sql.append(chrono.duree * 1000)
+            statuts.add(response.status_code)
+
+        return {
+            "p50_ms": round(statistics.median(durees), 2),
+            "p95_ms": round(centile(durees, 0.95), 2),
+            "p99_ms": round(centile(durees, 0.99), 2),
+            "requetes": max(requetes),
+            "sql_ms": round(statistics.median(temps_sql), 2),
+            "statuts": sorted(statuts),
+        }
+
+    # ----------------------------
+    # COMPARAISON
+    # ----------------------------
+    def comparer(self, resultats, chemin, seuil):
+        reference = json.loads(Path(chemin).read_text(encoding="utf-8"))["resultats"]
+        regressions = []
+        for cle, mesure in resultats.items():
+            base = reference.get(cle)
+            if base is None:
+                continue
+            if mesure["requetes"] > base["requetes"]:
+                regressions.append(f"{cle} : {base['requetes']} -> {mesure['requetes']} requêtes")
+            # en dessous d'une milliseconde, c'est du bruit
+            if mesure["p95_ms"] > base["p95_ms"] * (1 + seuil) and mesure["p95_ms"] - base["p95_ms"] > 1:
+                regressions.append(f"{cle} : p95 {base['p95_ms']} -> {mesure['p95_ms']} ms")
+        return regressions
+
+    def handle(self, *args, **options):
+        self.iterations = options["iterations"]
+        self.routes = set(options["route"] or [])
+        if self.iterations < 1:
+            raise CommandError("--iterations doit être positif.")
+        if replique_configuree():
+            raise CommandError("Banc d'essai sans réplique : retirer FLOTTE_REPLICA_DB.")
+
+        # base et cache jetables : rien n'est écrit dans la base configurée
+        ancien_nom = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench"}},
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                LIMITES_TENTATIVES=SANS_LIMITE,
+            ):
+                resultats = self.executer(options["vehicules"])
+        finally:
+            connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+        rapport = {
+            "meta": {
+                "date": timezone.now().isoformat(),
+                "vehicules": options["vehicules"],
+                "iterations": self.iterations,
+                "base": connection.vendor,
+                "django": django.get_version(),
+                "python": platform.python_version(),
+            },
+            "resultats": resultats,
+        }
+        if options["sortie"]:
+            Path(options["sortie"]).write_text(json.dumps(rapport, indent=2), encoding="utf-8")
+            self.stdout.write(f"Résultats écrits dans {options['sortie']}")
+
+        if options["comparer"]:
+            regressions = self.comparer(resultats, options["comparer"], options["seuil"])
+            for ligne in regressions:
+                self.stdout.write(self.style.ERROR(f"  régression {ligne}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} régression(s) par rapport à {options['comparer']}")
+            self.stdout.write(self.style.SUCCESS("Aucune régression."))
+
+    def executer(self, vehicules):
+        debut = time.perf_counter()
+        manager = construire_flotte(vehicules)
+        self.stdout.write(f"Flotte de {vehicules} véhicules créée en {time.perf_counter() - debut:.1f} s")
+
+        vehicule = Vehicule.objects.exclude(chauffeur=None).order_by("pk").first()
+        ids = {
+            "manager": manager,
+            "driver": vehicule.chauffeur.utilisateur,
+            "vehicule": vehicule.pk,
+            "document": DocumentVehicule.objects.filter(vehicule=vehicule).values_list("pk", flat=True).first(),
+            "entretien": Entretien.objects.filter(vehicule=vehicule).values_list("pk", flat=True).first(),
+            "chauffeur": vehicule.chauffeur_id,
+        }
+
+        resultats = {}
+        self.stdout.write(f"{'route':<32} {'p50':>8} {'p95':>8} {'p99':>8} {'req.':>5} {'SQL':>8}  HTTP")
+        for cle, utilisateur, methode, url, donnees in self.scenarios(ids):
+            mesure = resultats[cle] = self.mesurer(utilisateur, methode, url, donnees)
+            self.stdout.write(
+                f"{cle:<32} {mesure['p50_ms']:8.1f} {mesure['p95_ms']:8.1f} {mesure['p99_ms']:8.1f} "
+                f"{mesure['requetes']:5d} {mesure['sql_ms']:8.1f}  {','.join(map(str, mesure['statuts']))}"
+            )
+        return resultats
@@ -0,0 +1,150 @@
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from web.models import Vehicule, Entretien
+
+
+PROFILS = {
+    "standard": {},
+    "production": settings.SQLITE_OPTIONS_PRODUCTION,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit des lecteurs et des écrivains concurrents sur une "
+        "base SQLite temporaire, avec le profil standard puis le profil de "
+        "production (WAL, busy timeout, transactions IMMEDIATE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lecteurs", type=int, default=4)
+        parser.add_argument("--ecrivains", type=int, default=2)
+        parser.add_argument("--duree", type=float, default=5, help="Durée par profil, en secondes")
+        parser.add_argument("--vehicules", type=int, default=2000)
+        parser.add_argument("--profil", choices=[*PROFILS, "tous"], default="tous")
+
+    # ----------------------------
+    # BASE TEMPORAIRE
+    # ----------------------------
+    def preparer(self, alias, chemin, options, nombre):
+        base = {**settings.DATABASES["default"], "NAME": str(chemin), "OPTIONS": options}
+        connections.settings[alias] = connections.configure_settings(
+            {"default": settings.DATABASES["default"], alias: base}
+        )[alias]
+        call_command("migrate", database=alias, verbosity=0)
+
+        # écritures sans signaux (gestionnaire de base) : FleetStats et la
+        # chronologie vivent sur la base par défaut, pas sur la base de test
+        today = timezone.now().date()
+        Vehicule._base_manager.using(alias).bulk_create([
+            Vehicule(
+                immatriculation=f"BE-{i:06d}", marque="Renault", modele="Clio",
+                annee=2020, kilometrage=i, statut=Vehicule.Statut.DISPONIBLE,
+            )
+            for i in range(nombre)
+        ], batch_size=500)
+        pks = list(Vehicule._base_manager.using(alias).values_list("pk", flat=True))
+        Entretien._base_manager.using(alias).bulk_create([
+            Entretien(vehicule_id=pk, type_entretien="revision", date_prevue=today, cout=100)
+            for pk in pks
+        ], batch_size=500)
+        return pks
+
+    # ----------------------------
+    # CHARGES
+    # ----------------------------
+    def lecteur(self, alias, pks, fin, compteurs):
+        vehicules = Vehicule._base_manager.using(alias)
+        while time.monotonic() < fin:
+            try:
+                list(vehicules.filter(statut=Vehicule.Statut.DISPONIBLE).order_by("-id")[:50])
+                vehicules.filter(pk=random.choice(pks)).first()
+                compteurs["lectures"] += 1
+            except OperationalError:
+                compteurs["erreurs_lecture"] += 1
+        connections[alias].close()
+
+    def ecrivain(self, alias, pks, fin, compteurs):
+        # comme une affectation / une modification d'entretien : on lit,
+        # puis on écrit dans la même transaction
+        vehicules = Vehicule._base_manager.using(alias)
+        entretiens = Entretien._base_manager.using(alias)
+        while time.monotonic() < fin:
+            pk = random.choice(pks)
+            try:
+                with transaction.atomic(using=alias):
+                    vehicule = vehicules.get(pk=pk)
+                    vehicules.filter(pk=pk).update(kilometrage=F("kilometrage") + 1)
+                    entretiens.filter(vehicule_id=vehicule.pk).update(cout=F("cout") + 1)
+                compteurs["ecritures"] += 1
+            except OperationalError:
+                compteurs["erreurs_ecriture"] += 1
+        connections[alias].close()
+
+    def mesurer(self, profil, options):
+        # un compteur par thread, additionnés à la fin
+        par_thread = [Counter() for _ in range(self.lecteurs + self.ecrivains)]
+        alias = f"bench_{profil}"
+
+        with tempfile.TemporaryDirectory() as dossier:
+            pks = self.preparer(alias, Path(dossier) / "bench.sqlite3", options, self.vehicules)
+            connections[alias].close()
+
+            fin = time.monotonic() + self.duree
+            threads = [
+                threading.Thread(
+                    target=self.lecteur if i < self.lecteurs else self.ecrivain,
+                    args=(alias, pks, fin, compteurs),
+                )
+                for i, compteurs in enumerate(par_thread)
+            ]
+            debut = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duree = time.monotonic() - debut
+
+            connections[alias].close()
+            del connections.settings[alias]
+
+        compteurs = sum(par_thread, Counter())
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Profil {profil}"))
+        self.stdout.write(
+            f"  lectures  : {compteurs['lectures'] / duree:8.0f} /s "
+            f"({compteurs['erreurs_lecture']} « database is locked »)"
+        )
+        self.stdout.write(
+            f"  écritures : {compteurs['ecritures'] / duree:8.0f} /s "
+            f"({compteurs['erreurs_ecriture']} « database is locked »)"
+        )
+
+    def handle(self, *args, **options):
+        if settings.DATABASES["default"]["ENGINE"] != "django.db.backends.sqlite3":
+            self.stderr.write("Ce banc d'essai ne concerne que SQLite.")
+            return
+
+        self.lecteurs = options["lecteurs"]
+        self.ecrivains = options["ecrivains"]
+        self.duree = options["duree"]
+        self.vehicules = options["vehicules"]
+
+        profils = PROFILS if options["profil"] == "tous" else {options["profil"]: PROFILS[options["profil"]]}
+        self.stdout.write(
+            f"{self.lecteurs} lecteurs, {self.ecrivains} écrivains, "
+            f"{self.duree:g} s par profil, {self.vehicules} véhicules"
+        )
+        for profil, options_sqlite in profils.items():
+            self.mesurer(profil, options_sqlite)
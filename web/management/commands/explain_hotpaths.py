@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from web.filtres import TRIS_VEHICULES, TRI_VEHICULES_DEFAUT
+from web.models import Vehicule, DocumentVehicule, Entretien, Chauffeur, EcheanceEvent
+from web.stats import requete_fleet_stats, requetes_alertes
+
+
+class Command(BaseCommand):
+    help = "Affiche le plan d'exécution des requêtes du tableau de bord et des listes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--analyze", action="store_true",
+            help="Exécute réellement les requêtes (EXPLAIN ANALYZE, PostgreSQL)",
+        )
+
+    def requetes(self):
+        today = timezone.now().date()
+        vehicule_id = Vehicule.objects.values_list("pk", flat=True).first() or 0
+
+        yield "dashboard : FleetStats du jour", requete_fleet_stats(today)[:1]
+        for nom, qs in requetes_alertes(today).items():
+            yield f"dashboard : {nom}", qs
+        yield "dashboard : derniers_vehicules", Vehicule.objects.order_by("-date_creation")[:5]
+        yield "dashboard : derniers_entretiens", Entretien.objects.order_by("-id")[:5]
+
+        yield "vehicule_list : première page", (
+            Vehicule.objects.select_related("chauffeur")
+            .order_by(*TRIS_VEHICULES[TRI_VEHICULES_DEFAUT])[:51]
+        )
+        yield "vehicule_list : statut", (
+            Vehicule.objects.filter(statut=Vehicule.Statut.MAINTENANCE)
+            .order_by(*TRIS_VEHICULES[TRI_VEHICULES_DEFAUT])[:51]
+        )
+        yield "document_list", DocumentVehicule.objects.filter(vehicule_id=vehicule_id)
+        yield "entretien_list", Entretien.objects.filter(vehicule_id=vehicule_id).order_by("-date_prevue")
+        yield "chauffeur_list", Chauffeur.objects.all()
+        yield "calendrier", EcheanceEvent.objects.filter(
+            date_echeance__range=[today, today + timedelta(days=41)]
+        ).order_by("date_echeance", "type_echeance")
+
+    def handle(self, *args, **options):
+        analyze = options["analyze"] and connection.vendor == "postgresql"
+
+        for titre, qs in self.requetes():
+            self.stdout.write(self.style.MIGRATE_HEADING(titre))
+            plan = qs.explain(analyze=True) if analyze else qs.explain()
+            for ligne in plan.splitlines():
+                self.stdout.write(f"  {ligne}")
+            self.stdout.write("")
@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from web.models import Vehicule, Chauffeur
+from web.synthese import generer_flotte, Repartition, MOT_DE_PASSE, TAILLE_LOT
+
+
+def part(valeur):
+    valeur = float(valeur)
+    if not 0 <= valeur <= 1:
+        raise ValueError(valeur)
+    return valeur
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplit une base vide avec une flotte synthétique déterministe "
+        "(graine) pour les tests de charge et de capacité."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vehicules", type=int, default=10000)
+        parser.add_argument("--graine", type=int, default=0)
+        parser.add_argument("--chauffeurs", type=float, default=0.5, help="Chauffeurs (avec compte) par véhicule")
+        parser.add_argument("--documents", type=int, default=3, help="Documents par véhicule")
+        parser.add_argument("--entretiens", type=int, default=4, help="Entretiens par véhicule")
+        parser.add_argument("--documents-expires", type=part, default=0.08)
+        parser.add_argument("--documents-bientot", type=part, default=0.07, help="Expirant sous 30 jours")
+        parser.add_argument("--entretiens-effectues", type=part, default=0.6)
+        parser.add_argument("--entretiens-retard", type=part, default=0.1)
+        parser.add_argument("--permis-expires", type=part, default=0.05)
+        parser.add_argument(
+            "--statuts", default="60,30,10",
+            help="Poids des statuts disponible,mission,maintenance",
+        )
+        parser.add_argument("--mot-de-passe", default=MOT_DE_PASSE, help="Mot de passe de tous les comptes")
+        parser.add_argument("--lot", type=int, default=TAILLE_LOT, help="Lignes par executemany")
+        parser.add_argument(
+            "--differer-index", action="store_true",
+            help="Supprime les index secondaires (et l'indexation de la recherche) pendant l'insertion, puis les recrée",
+        )
+        parser.add_argument(
+            "--sans-echeances", action="store_true",
+            help="Ne reconstruit ni la chronologie des échéances ni FleetStats",
+        )
+
+    def handle(self, *args, **options):
+        if Vehicule.objects.exists() or Chauffeur.objects.exists():
+            raise CommandError("La base contient déjà une flotte : partir d'une base vide (manage.py flush).")
+        if options["documents_expires"] + options["documents_bientot"] > 1:
+            raise CommandError("--documents-expires + --documents-bientot dépasse 1.")
+        if options["entretiens_effectues"] + options["entretiens_retard"] > 1:
+            raise CommandError("--entretiens-effectues + --entretiens-retard dépasse 1.")
+        try:
+            statuts = tuple(int(poids) for poids in options["statuts"].split(","))
+        except ValueError:
+            statuts = ()
+        if len(statuts) != len(Vehicule.Statut.values):
+            raise CommandError("--statuts attend trois poids entiers, ex. 60,30,10.")
+
+        repartition = Repartition(
+            chauffeurs=options["chauffeurs"], documents=options["documents"], entretiens=options["entretiens"],
+            documents_expires=options["documents_expires"], documents_bientot=options["documents_bientot"],
+            entretiens_effectues=options["entretiens_effectues"], entretiens_retard=options["entretiens_retard"],
+            permis_expires=options["permis_expires"], statuts=statuts,
+        )
+
+        debut = time.perf_counter()
+        lignes, durees = generer_flotte(
+            options["vehicules"], repartition, graine=options["graine"], mot_de_passe=options["mot_de_passe"],
+            differer_index=options["differer_index"], echeances_et_stats=not options["sans_echeances"],
+            lot=options["lot"],
+        )
+        total = time.perf_counter() - debut
+
+        for table, nombre in lignes.items():
+            self.stdout.write(f"  {table:<13} {nombre:>10}")
+        inserees = sum(lignes.values())
+        self.stdout.write(
+            f"Insertion : {inserees} lignes en {durees['insertion']:.1f} s "
+            f"({inserees / durees['insertion']:,.0f} lignes/s)".replace(",", " ")
+        )
+        if "index" in durees:
+            self.stdout.write(f"Index recréés en {durees['index']:.1f} s")
+        if "echeances_et_stats" in durees:
+            self.stdout.write(f"Échéances et FleetStats reconstruites en {durees['echeances_et_stats']:.1f} s")
+        self.stdout.write(self.style.SUCCESS(f"Flotte générée en {total:.1f} s"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from web.importation import TYPES, importer, format_du_fichier
+
+
+class Command(BaseCommand):
+    help = "Importe en flux un fichier CSV ou JSONL de véhicules, chauffeurs, documents ou entretiens."
+
+    def add_arguments(self, parser):
+        parser.add_argument("type", choices=sorted(TYPES))
+        parser.add_argument("fichier")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Déduit de l'extension par défaut")
+        parser.add_argument("--taille-lot", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        format = options["format"] or format_du_fichier(options["fichier"])
+
+        def progression(rapport):
+            self.stdout.write(f"  {rapport}")
+
+        try:
+            with open(options["fichier"], encoding="utf-8-sig", newline="") as flux:
+                rapport = importer(
+                    options["type"], flux, format=format,
+                    taille_lot=options["taille_lot"], progression=progression,
+                )
+        except OSError as e:
+            raise CommandError(f"Impossible de lire le fichier : {e}")
+
+        for ligne, message in rapport.erreurs:
+            self.stderr.write(f"ligne {ligne} : {message}")
+        if rapport.rejetes > len(rapport.erreurs):
+            self.stderr.write(f"... et {rapport.rejetes - len(rapport.erreurs)} autres erreurs")
+
+        self.stdout.write(self.style.SUCCESS(f"Import terminé en {rapport.duree:.1f} s : {rapport}"))
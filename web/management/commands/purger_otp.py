@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from web.models import PasswordResetOTP
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les anciennes lignes PasswordResetOTP : les codes OTP "
+        "vivent désormais dans le cache (web/otp.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, default=5000, help="Lignes supprimées par requête")
+
+    def handle(self, *args, **options):
+        total = 0
+        # par lots, pour ne pas verrouiller la table d'un coup
+        while True:
+            pks = list(PasswordResetOTP.objects.values_list("pk", flat=True)[:options["lot"]])
+            if not pks:
+                break
+            total += PasswordResetOTP.objects.filter(pk__in=pks).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"{total} OTP supprimé(s)"))
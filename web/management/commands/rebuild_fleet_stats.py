@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from web.stats import COMPTEURS, reconstruire_fleet_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule depuis zéro la ligne FleetStats d'un jour (par défaut aujourd'hui)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jour", help="Date au format AAAA-MM-JJ")
+
+    def handle(self, *args, **options):
+        if options["jour"]:
+            try:
+                jour = date.fromisoformat(options["jour"])
+            except ValueError:
+                raise CommandError("Date invalide, format attendu : AAAA-MM-JJ")
+        else:
+            jour = timezone.now().date()
+
+        stats = reconstruire_fleet_stats(jour)
+
+        self.stdout.write(self.style.SUCCESS(f"FleetStats du {jour} reconstruit"))
+        for nom in COMPTEURS:
+            self.stdout.write(f"  {nom}: {getattr(stats, nom)}")
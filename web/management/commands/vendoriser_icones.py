@@ -0,0 +1,109 @@
+import json
+import re
+import zipfile
+from importlib import metadata, resources
+from pathlib import Path
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# version du paquet Python « lucide » (icônes SVG) dont sont tirées les icônes
+VERSION_LUCIDE = "1.1.4"
+
+SORTIE = Path(settings.BASE_DIR) / "static" / "web" / "vendor" / "lucide-icones.js"
+
+# anciens noms employés dans les gabarits -> noms actuels de lucide
+ALIAS = {
+    "alert-circle": "circle-alert",
+    "alert-octagon": "octagon-alert",
+    "alert-triangle": "triangle-alert",
+    "bar-chart-2": "chart-no-axes-column",
+    "check-circle": "circle-check-big",
+    "edit-3": "pen-line",
+    "filter": "funnel",
+    "x-circle": "circle-x",
+}
+
+ICONE_GABARIT = re.compile(r'data-lucide="([a-z0-9-]+)"')
+SVG = "{http://www.w3.org/2000/svg}"
+
+# même API que lucide.createIcons() : chaque <i data-lucide="nom"> est
+# remplacé par le SVG, en gardant ses attributs et ses classes
+SCRIPT = """\
+/* Icônes lucide, (c) Lucide Contributors, licence ISC : https://lucide.dev/license
+   tirées du paquet Python lucide {version} par manage.py vendoriser_icones */
+(function () {{
+  var ICONES = {icones};
+  var SVG = "http://www.w3.org/2000/svg";
+  var DEFAUT = {{
+    xmlns: SVG, width: "24", height: "24", viewBox: "0 0 24 24", fill: "none",
+    stroke: "currentColor", "stroke-width": "2", "stroke-linecap": "round", "stroke-linejoin": "round"
+  }};
+
+  function createIcons() {{
+    document.querySelectorAll("[data-lucide]").forEach(function (element) {{
+      var nom = element.getAttribute("data-lucide");
+      if (!(nom in ICONES)) return;
+      var svg = document.createElementNS(SVG, "svg");
+      Object.keys(DEFAUT).forEach(function (cle) {{ svg.setAttribute(cle, DEFAUT[cle]); }});
+      Array.prototype.forEach.call(element.attributes, function (attribut) {{
+        svg.setAttribute(attribut.name, attribut.value);
+      }});
+      svg.setAttribute("class", ["lucide", "lucide-" + nom, element.getAttribute("class") || ""].join(" ").trim());
+      svg.innerHTML = ICONES[nom];
+      element.parentNode.replaceChild(svg, element);
+    }});
+  }}
+
+  window.lucide = {{ createIcons: createIcons }};
+}})();
+"""
+
+
+def icones_des_gabarits():
+    noms = set()
+    for dossier in settings.TEMPLATES[0]["DIRS"]:
+        for gabarit in Path(dossier).rglob("*.html"):
+            noms.update(ICONE_GABARIT.findall(gabarit.read_text(encoding="utf-8")))
+    return sorted(noms)
+
+
+def contenu_svg(archive, nom):
+    racine = ElementTree.fromstring(archive.read(f"{ALIAS.get(nom, nom)}.svg"))
+    enfants = []
+    for enfant in racine:
+        attributs = "".join(f' {cle}="{valeur}"' for cle, valeur in enfant.attrib.items())
+        enfants.append(f"<{enfant.tag.removeprefix(SVG)}{attributs}/>")
+    return "".join(enfants)
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère static/web/vendor/lucide-icones.js avec les seules icônes "
+        "lucide utilisées dans les gabarits (plus de CDN)."
+    )
+
+    def handle(self, *args, **options):
+        try:
+            version = metadata.version("lucide")
+        except metadata.PackageNotFoundError:
+            raise CommandError(f"Installer le paquet lucide : pip install lucide=={VERSION_LUCIDE}")
+        if version != VERSION_LUCIDE:
+            raise CommandError(f"lucide {version} installé, {VERSION_LUCIDE} attendu.")
+
+        noms = icones_des_gabarits()
+        with resources.files("lucide").joinpath("lucide.zip").open("rb") as fichier:
+            with zipfile.ZipFile(fichier) as archive:
+                try:
+                    icones = {nom: contenu_svg(archive, nom) for nom in noms}
+                except KeyError as erreur:
+                    raise CommandError(f"Icône inconnue de lucide {version} : {erreur}")
+
+        SORTIE.parent.mkdir(parents=True, exist_ok=True)
+        SORTIE.write_text(
+            SCRIPT.format(version=version, icones=json.dumps(icones, indent=2, sort_keys=True)),
+            encoding="utf-8",
+        )
+        self.stdout.write(self.style.SUCCESS(f"{len(icones)} icônes écrites dans {SORTIE}"))
@@ -0,0 +1,230 @@
+import bisect
+import json
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from pathlib import Path
+
+from django.conf import settings
+
+
+# bornes des histogrammes (secondes, requêtes SQL)
+DUREES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+REQUETES_SQL = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# nom -> (type, aide) ; l'ordre est celui de l'exposition
+METRIQUES = {
+    "flotte_requetes_total": ("counter", "Requêtes HTTP par route (nom d'URL) et statut."),
+    "flotte_requete_duree_secondes": ("histogram", "Durée des requêtes HTTP par route."),
+    "flotte_requete_sql": ("histogram", "Requêtes SQL par requête HTTP, par route."),
+    "flotte_connexions_total": ("counter", "Authentifications réussies et échouées (hors 429)."),
+    "flotte_otp_emis_total": ("counter", "Codes OTP de réinitialisation émis."),
+    "flotte_vehicules": ("gauge", "Véhicules par statut."),
+    "flotte_documents_expires": ("gauge", "Documents de véhicule expirés."),
+}
+
+BORNES = {
+    "flotte_requete_duree_secondes": DUREES,
+    "flotte_requete_sql": REQUETES_SQL,
+}
+
+
+# ----------------------------
+# COMPTEURS PAR THREAD
+# ----------------------------
+# Chaque thread écrit dans son propre magasin, sans verrou : le verrou ne
+# sert qu'à enregistrer un nouveau thread, et à l'exposition. Un thread
+# terminé (serveurs à un thread par requête) laisse son magasin dans
+# _morts ; il est versé dans _retraites au prochain enregistrement ou à
+# la prochaine exposition, et la liste des magasins reste bornée par le
+# nombre de threads vivants.
+class Magasin:
+
+    def __init__(self):
+        self.compteurs = defaultdict(float)  # (nom, étiquettes) -> valeur
+        self.histogrammes = {}  # (nom, étiquettes) -> [seaux..., somme, total]
+
+    def verser(self, autre):
+        for cle, valeur in autre.compteurs.copy().items():
+            self.compteurs[cle] += valeur
+        for cle, seaux in autre.histogrammes.copy().items():
+            _additionner(self.histogrammes, cle, list(seaux))
+
+
+class _Jeton:
+    # seul occupant du thread-local avec le magasin : ramassé à la fin du thread
+    __slots__ = ("__weakref__",)
+
+
+_local = threading.local()
+_magasins = []
+_retraites = Magasin()
+_morts = deque()
+_verrou = threading.Lock()
+_publication = {"fichier": None, "derniere": 0.0}
+
+
+def _reinitialiser():
+    # processus fils (fork du serveur WSGI) : repartir de zéro
+    global _local, _magasins, _retraites, _morts, _verrou
+    _local, _magasins, _retraites, _morts, _verrou = threading.local(), [], Magasin(), deque(), threading.Lock()
+    _publication.update(fichier=None, derniere=0.0)
+
+
+os.register_at_fork(after_in_child=_reinitialiser)
+
+
+def _fusionner_morts():
+    # sous _verrou
+    while _morts:
+        magasin = _morts.popleft()
+        if any(m is magasin for m in _magasins):
+            _magasins.remove(magasin)
+            _retraites.verser(magasin)
+
+
+def _magasin():
+    magasin = getattr(_local, "magasin", None)
+    if magasin is None:
+        magasin = _local.magasin = Magasin()
+        # pas de verrou dans le finaliseur (il peut tourner pendant que ce
+        # thread le tient) : le magasin est seulement signalé
+        _local.jeton = _Jeton()
+        weakref.finalize(_local.jeton, _morts.append, magasin)
+        with _verrou:
+            _fusionner_morts()
+            _magasins.append(magasin)
+    return magasin
+
+
+def _etiquettes(etiquettes):
+    return tuple(sorted((cle, str(valeur)) for cle, valeur in etiquettes.items()))
+
+
+def compter(nom, valeur=1, **etiquettes):
+    _magasin().compteurs[nom, _etiquettes(etiquettes)] += valeur
+
+
+def observer(nom, valeur, **etiquettes):
+    histogrammes = _magasin().histogrammes
+    cle = nom, _etiquettes(etiquettes)
+    seaux = histogrammes.get(cle)
+    if seaux is None:
+        bornes = BORNES[nom]
+        seaux = histogrammes[cle] = [0] * (len(bornes) + 3)
+    # seau de la première borne >= valeur (le dernier : +Inf)
+    seaux[bisect.bisect_left(BORNES[nom], valeur)] += 1
+    seaux[-2] += valeur
+    seaux[-1] += 1
+
+
+def instantane():
+    """
+    Somme des magasins de ce processus : {"compteurs": {...}, "histogrammes": {...}}.
+    """
+    total = Magasin()
+    with _verrou:
+        _fusionner_morts()
+        for magasin in [_retraites, *_magasins]:
+            total.verser(magasin)
+    return {"compteurs": dict(total.compteurs), "histogrammes": total.histogrammes}
+
+
+def _additionner(histogrammes, cle, seaux):
+    cumul = histogrammes.get(cle)
+    if cumul is None:
+        histogrammes[cle] = seaux
+    else:
+        for i, valeur in enumerate(seaux):
+            cumul[i] += valeur
+
+
+# ----------------------------
+# PLUSIEURS WORKERS : UN FICHIER PAR PROCESSUS
+# ----------------------------
+# Avec METRIQUES_DIR (dossier partagé), chaque processus y réécrit son
+# instantané (au plus toutes les METRIQUES_INTERVALLE secondes, par
+# renommage atomique) et /metrics additionne tous les fichiers. Les
+# compteurs d'un worker arrêté restent comptés : vider le dossier au
+# déploiement.
+def publier(force=False):
+    dossier = settings.METRIQUES_DIR
+    maintenant = time.monotonic()
+    if not dossier or (not force and maintenant - _publication["derniere"] < settings.METRIQUES_INTERVALLE):
+        return
+    _publication["derniere"] = maintenant
+
+    if _publication["fichier"] is None or _publication["fichier"].parent != Path(dossier):
+        _publication["fichier"] = Path(dossier) / f"{os.getpid()}-{time.time_ns()}.json"
+    fichier = _publication["fichier"]
+    donnees = instantane()
+    temporaire = fichier.with_suffix(f".{threading.get_ident()}.tmp")
+    temporaire.write_text(json.dumps({
+        "compteurs": [[nom, etiquettes, valeur] for (nom, etiquettes), valeur in donnees["compteurs"].items()],
+        "histogrammes": [[nom, etiquettes, seaux] for (nom, etiquettes), seaux in donnees["histogrammes"].items()],
+    }), encoding="utf-8")
+    os.replace(temporaire, fichier)
+
+
+def agreger():
+    """
+    Métriques de tous les workers (METRIQUES_DIR) ou de ce seul processus.
+    """
+    if not settings.METRIQUES_DIR:
+        return instantane()
+
+    publier(force=True)
+    compteurs, histogrammes = defaultdict(float), {}
+    for fichier in Path(settings.METRIQUES_DIR).glob("*.json"):
+        try:
+            donnees = json.loads(fichier.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # fichier supprimé ou remplacé pendant la lecture
+            continue
+        for nom, etiquettes, valeur in donnees["compteurs"]:
+            compteurs[nom, tuple(map(tuple, etiquettes))] += valeur
+        for nom, etiquettes, seaux in donnees["histogrammes"]:
+            _additionner(histogrammes, (nom, tuple(map(tuple, etiquettes))), seaux)
+    return {"compteurs": dict(compteurs), "histogrammes": histogrammes}
+
+
+# ----------------------------
+# FORMAT TEXTE PROMETHEUS
+# ----------------------------
+def _echapper(valeur):
+    return valeur.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _serie(nom, etiquettes, valeur):
+    if etiquettes:
+        nom += "{" + ",".join(f'{cle}="{_echapper(v)}"' for cle, v in etiquettes) + "}"
+    if isinstance(valeur, float) and valeur.is_integer():
+        valeur = int(valeur)
+    return f"{nom} {valeur}"
+
+
+def exposition(jauges):
+    """
+    Texte de /metrics : compteurs et histogrammes agrégés, plus les jauges
+    fournies ({(nom, étiquettes): valeur}), lues à la demande.
+    """
+    donnees = agreger()
+    series = defaultdict(list)
+    for (nom, etiquettes), valeur in sorted(donnees["compteurs"].items()):
+        series[nom].append(_serie(nom, etiquettes, valeur))
+    for (nom, etiquettes), valeur in sorted(jauges.items()):
+        series[nom].append(_serie(nom, etiquettes, valeur))
+    for (nom, etiquettes), seaux in sorted(donnees["histogrammes"].items()):
+        cumul = 0
+        for borne, nombre in zip([*map(str, BORNES[nom]), "+Inf"], seaux):
+            cumul += nombre
+            series[nom].append(_serie(f"{nom}_bucket", (*etiquettes, ("le", borne)), cumul))
+        series[nom].append(_serie(f"{nom}_sum", etiquettes, float(seaux[-2])))
+        series[nom].append(_serie(f"{nom}_count", etiquettes, seaux[-1]))
+
+    lignes = []
+    for nom, (genre, aide) in METRIQUES.items():
+        lignes += [f"# HELP {nom} {aide}", f"# TYPE {nom} {genre}", *series[nom]]
+    return "\n".join(lignes) + "\n"
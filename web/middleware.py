@@ -0,0 +1,322 @@
+import cProfile
+import heapq
+import io
+import json
+import logging
+import pstats
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .routers import requete_en_cours, replique_configuree, CLE_SESSION
+
+logger = logging.getLogger("web.requetes")
+journal_lentes = logging.getLogger("web.requetes_lentes")
+
+# envoyé après chaque requête mesurée (request, response, mesure)
+requete_mesuree = Signal()
+
+# mesure de la requête en cours, lue par le moteur de gabarits
+mesure_en_cours = ContextVar("mesure_en_cours", default=None)
+
+
+class BudgetDepasse(Exception):
+    pass
+
+
+class MiddlewareMixte:
+    """
+    Middleware synchrone et asynchrone : sous ASGI, les vues async
+    restent dans la boucle d'événements au lieu de passer par un thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+# compteurs de la requête en cours : une ContextVar, donc vue aussi dans le
+# thread où sync_to_async exécute l'ORM des vues async (les connexions,
+# elles, sont propres à chaque thread)
+compteurs_actifs = ContextVar("compteurs_actifs", default=())
+
+
+def _compter(execute, sql, params, many, context):
+    compteurs = compteurs_actifs.get()
+    if not compteurs:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duree = time.perf_counter() - debut
+        for compteur in compteurs:
+            compteur.enregistrer(duree, sql)
+
+
+def brancher_compteurs(connection, **kwargs):
+    """
+    Branche _compter sur une connexion, une fois pour toutes.
+    """
+    if _compter not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_compter)
+
+
+connection_created.connect(brancher_compteurs, dispatch_uid="compteurs_sql")
+
+
+class CompteurSQL:
+    """
+    Compte les requêtes SQL et leur durée cumulée ; garde aussi les
+    `lentes` requêtes les plus lentes (SQL sans paramètres).
+    """
+    def __init__(self, lentes=0):
+        self.requetes = 0
+        self.duree = 0.0
+        self.lentes = lentes
+        self.plus_lentes = []  # tas (durée, sql)
+
+    def enregistrer(self, duree, sql):
+        self.requetes += 1
+        self.duree += duree
+        if len(self.plus_lentes) < self.lentes:
+            heapq.heappush(self.plus_lentes, (duree, sql))
+        elif self.lentes and duree > self.plus_lentes[0][0]:
+            heapq.heapreplace(self.plus_lentes, (duree, sql))
+
+    @contextmanager
+    def installer(self):
+        """
+        Compte les requêtes de toutes les connexions le temps d'un `with`,
+        y compris depuis les threads de sync_to_async.
+        """
+        for alias in connections:
+            brancher_compteurs(connections[alias])
+        jeton = compteurs_actifs.set((*compteurs_actifs.get(), self))
+        try:
+            yield self
+        finally:
+            compteurs_actifs.reset(jeton)
+
+
+# ----------------------------
+# PROFILAGE : SERVER-TIMING ET REQUÊTES LENTES
+# ----------------------------
+class Mesure:
+    """
+    Découpage d'une requête HTTP : SQL, rendu des gabarits (hors SQL lancé
+    pendant le rendu) et le reste, la vue et les middlewares en Python.
+    """
+    def __init__(self, sql_lentes=0):
+        self.sql = CompteurSQL(lentes=sql_lentes)
+        self.gabarits = 0.0
+        self.en_rendu = False
+        self.total = 0.0
+
+    @property
+    def vue(self):
+        return max(0.0, self.total - self.sql.duree - self.gabarits)
+
+    def server_timing(self):
+        return ", ".join([
+            f'sql;desc="{self.sql.requetes} req.";dur={self.sql.duree * 1000:.2f}',
+            f"gabarits;dur={self.gabarits * 1000:.2f}",
+            f"vue;dur={self.vue * 1000:.2f}",
+            f"total;dur={self.total * 1000:.2f}",
+        ])
+
+
+class ProfilageMiddleware(MiddlewareMixte):
+    """
+    Mesure chaque requête (voir Mesure) et l'annonce dans l'en-tête
+    Server-Timing, lisible dans l'onglet réseau du navigateur.
+
+    Les requêtes plus lentes que PROFILAGE["seuil_ms"] sont échantillonnées
+    (PROFILAGE["echantillon"]) dans le journal « web.requetes_lentes »
+    (JSONL tournant, voir LOGGING) avec leurs requêtes SQL les plus lentes.
+    Une part PROFILAGE["cprofile"] des requêtes passe sous cProfile : le
+    profil est joint à l'entrée du journal si la requête s'avère lente.
+    """
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        reglages, mesure, profil = self.preparer()
+        jeton = mesure_en_cours.set(mesure)
+        debut = time.perf_counter()
+        try:
+            with mesure.sql.installer():
+                profil = self.demarrer(profil)
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profil is not None:
+                        profil.disable()
+        finally:
+            mesure_en_cours.reset(jeton)
+        mesure.total = time.perf_counter() - debut
+        return self.terminer(request, response, mesure, profil, reglages)
+
+    async def __acall__(self, request):
+        reglages, mesure, profil = self.preparer()
+        jeton = mesure_en_cours.set(mesure)
+        debut = time.perf_counter()
+        try:
+            with mesure.sql.installer():
+                profil = self.demarrer(profil)
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    if profil is not None:
+                        profil.disable()
+        finally:
+            mesure_en_cours.reset(jeton)
+        mesure.total = time.perf_counter() - debut
+        return self.terminer(request, response, mesure, profil, reglages)
+
+    def preparer(self):
+        reglages = settings.PROFILAGE
+        mesure = Mesure(sql_lentes=reglages["sql_lentes"])
+        profil = None
+        if reglages["cprofile"] and random.random() < reglages["cprofile"]:
+            profil = cProfile.Profile()
+        return reglages, mesure, profil
+
+    def demarrer(self, profil):
+        if profil is not None:
+            try:
+                profil.enable()
+            except ValueError:
+                # un autre profileur est déjà actif (Python 3.12+)
+                return None
+        return profil
+
+    def terminer(self, request, response, mesure, profil, reglages):
+        if reglages["server_timing"]:
+            response.headers["Server-Timing"] = mesure.server_timing()
+        if mesure.total * 1000 >= reglages["seuil_ms"] and random.random() < reglages["echantillon"]:
+            self.journaliser(request, response, mesure, profil, reglages)
+
+        requete_mesuree.send(sender=self.__class__, request=request, response=response, mesure=mesure)
+        return response
+
+    def journaliser(self, request, response, mesure, profil, reglages):
+        match = request.resolver_match
+        entree = {
+            "date": timezone.now().isoformat(),
+            "methode": request.method,
+            # sans la chaîne de requête (jetons, termes de recherche)
+            "chemin": request.path,
+            "route": match.url_name if match else None,
+            "statut": response.status_code,
+            "total_ms": round(mesure.total * 1000, 2),
+            "sql_ms": round(mesure.sql.duree * 1000, 2),
+            "requetes": mesure.sql.requetes,
+            "gabarits_ms": round(mesure.gabarits * 1000, 2),
+            "vue_ms": round(mesure.vue * 1000, 2),
+            "sql_lentes": [
+                {"ms": round(duree * 1000, 2), "sql": sql}
+                for duree, sql in sorted(mesure.sql.plus_lentes, reverse=True)
+            ],
+        }
+        if profil is not None:
+            sortie = io.StringIO()
+            pstats.Stats(profil, stream=sortie).sort_stats("cumulative").print_stats(reglages["profil_lignes"])
+            entree["profil"] = sortie.getvalue()
+        journal_lentes.info(json.dumps(entree, ensure_ascii=False))
+
+
+# ----------------------------
+# BUDGET DE REQUÊTES PAR VUE
+# ----------------------------
+class BudgetRequetesMiddleware(MiddlewareMixte):
+    """
+    Mesure le nombre de requêtes SQL et le temps SQL de chaque requête HTTP,
+    par nom d'URL, et les compare au budget déclaré avec @budget_requetes.
+
+    Un dépassement est journalisé (warning) ; si QUERY_BUDGET_STRICT est
+    activé (tests), il lève BudgetDepasse.
+    """
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        compteur = CompteurSQL()
+        with compteur.installer():
+            response = self.get_response(request)
+        self.verifier(request, compteur)
+        return response
+
+    async def __acall__(self, request):
+        compteur = CompteurSQL()
+        with compteur.installer():
+            response = await self.get_response(request)
+        self.verifier(request, compteur)
+        return response
+
+    def verifier(self, request, compteur):
+        match = request.resolver_match
+        if match is None:
+            return
+
+        logger.debug(
+            "%s : %d requêtes SQL, %.1f ms",
+            match.url_name, compteur.requetes, compteur.duree * 1000,
+        )
+
+        budget = getattr(match.func, "budget_requetes", None)
+        if budget is not None and compteur.requetes > budget:
+            message = (
+                f"Budget de requêtes dépassé pour '{match.url_name}' : "
+                f"{compteur.requetes} > {budget} ({compteur.duree * 1000:.1f} ms SQL)"
+            )
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise BudgetDepasse(message)
+            logger.warning(message)
+
+
+# ----------------------------
+# RÉPLIQUE : LIRE SES PROPRES ÉCRITURES
+# ----------------------------
+class RepliqueMiddleware(MiddlewareMixte):
+    """
+    Pose l'état de routage de la requête (voir LectureEcritureRouter).
+    Une requête qui a écrit marque la session : les lectures suivantes de
+    ce client restent sur la base principale pendant REPLICA_DELAI_LECTURE
+    secondes (ex. la redirection après vehicule_update).
+    """
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        etat = {"lecture_seule": False, "ecriture": False}
+        jeton = requete_en_cours.set(etat)
+        try:
+            response = self.get_response(request)
+        finally:
+            requete_en_cours.reset(jeton)
+
+        if etat["ecriture"] and replique_configuree():
+            request.session[CLE_SESSION] = time.time()
+        return response
+
+    async def __acall__(self, request):
+        etat = {"lecture_seule": False, "ecriture": False}
+        jeton = requete_en_cours.set(etat)
+        try:
+            response = await self.get_response(request)
+        finally:
+            requete_en_cours.reset(jeton)
+
+        if etat["ecriture"] and replique_configuree():
+            await request.session.aset(CLE_SESSION, time.time())
+        return response
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0005_chauffeur_utilisateur_alter_chauffeur_nom_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True)),
+                ('total_vehicules', models.IntegerField(default=0)),
+                ('vehicules_disponibles', models.IntegerField(default=0)),
+                ('vehicules_mission', models.IntegerField(default=0)),
+                ('vehicules_maintenance', models.IntegerField(default=0)),
+                ('total_chauffeurs', models.IntegerField(default=0)),
+                ('chauffeurs_disponibles', models.IntegerField(default=0)),
+                ('chauffeurs_mission', models.IntegerField(default=0)),
+                ('chauffeurs_permis_expire_count', models.IntegerField(default=0)),
+                ('total_documents', models.IntegerField(default=0)),
+                ('documents_expires_count', models.IntegerField(default=0)),
+                ('documents_bientot_count', models.IntegerField(default=0)),
+                ('total_entretiens', models.IntegerField(default=0)),
+                ('entretiens_retard_count', models.IntegerField(default=0)),
+                ('entretiens_bientot_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
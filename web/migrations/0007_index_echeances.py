@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0006_fleetstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chauffeur',
+            index=models.Index(fields=['date_expiration_permis'], name='chauffeur_permis_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentvehicule',
+            index=models.Index(fields=['date_expiration', 'vehicule'], name='document_expiration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entretien',
+            index=models.Index(condition=models.Q(('effectue', False)), fields=['date_prevue', 'vehicule'], name='entretien_a_faire_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entretien',
+            index=models.Index(fields=['vehicule', '-date_prevue'], name='entretien_vehicule_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['statut', 'date_creation', 'id'], name='vehicule_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['date_creation', 'id'], name='vehicule_creation_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:37
+
+import django.db.models.deletion
+from datetime import date, timedelta
+from django.db import migrations, models
+
+
+def classer(date_echeance, jour, delai, depasse, normal):
+    if date_echeance < jour:
+        return depasse
+    if date_echeance <= jour + timedelta(days=delai):
+        return "BIENTOT"
+    return normal
+
+
+def remplir_echeances(apps, schema_editor):
+    EcheanceEvent = apps.get_model("web", "EcheanceEvent")
+    DocumentVehicule = apps.get_model("web", "DocumentVehicule")
+    Chauffeur = apps.get_model("web", "Chauffeur")
+    Entretien = apps.get_model("web", "Entretien")
+    db = schema_editor.connection.alias
+    jour = date.today()
+
+    evenements = []
+    for doc in DocumentVehicule.objects.using(db).select_related("vehicule").iterator():
+        evenements.append(EcheanceEvent(
+            type_echeance="DOCUMENT", date_echeance=doc.date_expiration,
+            etat=classer(doc.date_expiration, jour, 30, "EXPIRE", "VALIDE"),
+            sujet=doc.vehicule.immatriculation, libelle=doc.get_type_document_display(),
+            vehicule_id=doc.vehicule_id, document_id=doc.pk,
+        ))
+    for c in Chauffeur.objects.using(db).iterator():
+        evenements.append(EcheanceEvent(
+            type_echeance="PERMIS", date_echeance=c.date_expiration_permis,
+            etat=classer(c.date_expiration_permis, jour, 30, "EXPIRE", "VALIDE"),
+            sujet=c.nom, libelle="Permis", chauffeur_id=c.pk,
+        ))
+    for e in Entretien.objects.using(db).filter(effectue=False).select_related("vehicule").iterator():
+        v = e.vehicule
+        evenements.append(EcheanceEvent(
+            type_echeance="ENTRETIEN", date_echeance=e.date_prevue,
+            etat=classer(e.date_prevue, jour, 7, "RETARD", "PLANIFIE"),
+            sujet=f"{v.marque} {v.modele} - {v.immatriculation}",
+            libelle=e.get_type_entretien_display(),
+            vehicule_id=e.vehicule_id, entretien_id=e.pk,
+        ))
+    EcheanceEvent.objects.using(db).bulk_create(evenements, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0007_index_echeances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EcheanceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_echeance', models.CharField(choices=[('DOCUMENT', 'Document'), ('PERMIS', 'Permis'), ('ENTRETIEN', 'Entretien')], max_length=20)),
+                ('date_echeance', models.DateField()),
+                ('etat', models.CharField(choices=[('EXPIRE', 'Expiré'), ('RETARD', 'En retard'), ('BIENTOT', 'Expire bientôt'), ('VALIDE', 'Valide'), ('PLANIFIE', 'Planifié'), ('EFFECTUE', 'Effectué')], max_length=20)),
+                ('sujet', models.CharField(max_length=200)),
+                ('libelle', models.CharField(max_length=100)),
+                ('chauffeur', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='echeance', to='web.chauffeur')),
+                ('document', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='echeance', to='web.documentvehicule')),
+                ('entretien', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='echeance', to='web.entretien')),
+                ('vehicule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='web.vehicule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['type_echeance', 'date_echeance'], name='echeance_type_date_idx'), models.Index(fields=['date_echeance'], name='echeance_date_idx')],
+            },
+        ),
+        migrations.RunPython(remplir_echeances, migrations.RunPython.noop),
+    ]
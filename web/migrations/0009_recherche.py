@@ -0,0 +1,77 @@
+from django.db import migrations
+
+
+# Tables FTS5 de web/recherche.py et leurs triggers (SQLite uniquement :
+# ailleurs, la recherche se replie sur des filtres par préfixe).
+TOKENIZER = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def sans_separateurs(colonne):
+    return f"replace(replace(replace({colonne}, '-', ''), ' ', ''), '.', '')"
+
+
+# table FTS -> (table source, colonnes source, colonnes indexées : expression
+# sur la ligne `{0}`)
+INDEXATIONS = {
+    "web_recherche_vehicule": ("web_vehicule", ("immatriculation", "marque", "modele"), {
+        "immatriculation": "{0}.immatriculation",
+        "plaque": sans_separateurs("{0}.immatriculation"),
+        "marque": "{0}.marque",
+        "modele": "{0}.modele",
+    }),
+    "web_recherche_chauffeur": ("web_chauffeur", ("nom", "telephone", "numero_permis"), {
+        "nom": "{0}.nom",
+        "telephone": sans_separateurs("{0}.telephone"),
+        "numero_permis": "{0}.numero_permis",
+    }),
+}
+
+
+def valeurs(colonnes, ligne):
+    return ", ".join(expression.format(ligne) for expression in colonnes.values())
+
+
+def creer_index_recherche(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    for fts, (source, suivies, colonnes) in INDEXATIONS.items():
+        noms = ", ".join(colonnes)
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({noms}, {TOKENIZER})")
+        schema_editor.execute(
+            f"INSERT INTO {fts} (rowid, {noms}) SELECT id, {valeurs(colonnes, source)} FROM {source}"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {fts} (rowid, {noms}) VALUES (new.id, {valeurs(colonnes, 'new')}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN "
+            f"DELETE FROM {fts} WHERE rowid = old.id; END"
+        )
+        affectations = ", ".join(f"{nom} = {expression.format('new')}" for nom, expression in colonnes.items())
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {', '.join(suivies)} ON {source} BEGIN "
+            f"UPDATE {fts} SET {affectations} WHERE rowid = new.id; END"
+        )
+
+
+def supprimer_index_recherche(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    for fts in INDEXATIONS:
+        for suffixe in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffixe}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0008_echeanceevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index_recherche, supprimer_index_recherche),
+    ]
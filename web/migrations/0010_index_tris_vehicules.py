@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:07
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0009_recherche'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['immatriculation', 'id'], name='vehicule_immat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['marque', 'modele', 'id'], name='vehicule_marque_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(fields=['kilometrage', 'id'], name='vehicule_km_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicule',
+            index=models.Index(django.db.models.functions.text.Lower('marque'), models.F('date_creation'), models.F('id'), name='vehicule_marque_ci_idx'),
+        ),
+    ]
@@ -1,8 +1,177 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Lower
+from django.dispatch import Signal
 from django.conf import settings
+from datetime import timedelta
 import random
 
+
+# ----------------------------
+# ÉCRITURES EN MASSE
+# ----------------------------
+# QuerySet.update() et bulk_create() n'envoient pas pre_save / post_save :
+# ces signaux permettent aux données dérivées (FleetStats, ...) de suivre.
+pre_lot_modifie = Signal()
+post_lot_modifie = Signal()
+post_lot_cree = Signal()
+
+# modèle -> champs lus par les récepteurs de pre/post_lot_modifie (voir
+# suivre_lot) : un update() qui n'en modifie aucun ne fige pas les pk et
+# n'envoie pas les signaux
+CHAMPS_LOT = {}
+
+
+def suivre_lot(model, champs):
+    CHAMPS_LOT.setdefault(model, set()).update(champs)
+
+
+class SuiviQuerySet(models.QuerySet):
+    """
+    QuerySet qui signale les écritures en masse (update / bulk_create)
+    """
+    def update(self, **kwargs):
+        if not (pre_lot_modifie.has_listeners(self.model) or post_lot_modifie.has_listeners(self.model)):
+            return super().update(**kwargs)
+        suivis = CHAMPS_LOT.get(self.model)
+        if suivis is not None and suivis.isdisjoint(kwargs):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            # le filtre peut ne plus correspondre après l'update : on fige les pk
+            pks = list(self.values_list("pk", flat=True))
+            etat = {}
+            champs = list(kwargs)
+            pre_lot_modifie.send(sender=self.model, pks=pks, champs=champs, etat=etat, using=self.db)
+            rows = super().update(**kwargs)
+            post_lot_modifie.send(sender=self.model, pks=pks, champs=champs, etat=etat, using=self.db)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        conflits = bool(kwargs.get("ignore_conflicts") or kwargs.get("update_conflicts"))
+        post_lot_cree.send(sender=self.model, objets=objs, conflits=conflits, using=self.db)
+        return objs
+
+
+# ----------------------------
+# ÉCHÉANCES (classification en SQL)
+# ----------------------------
+class JoursRestants(models.Func):
+    """
+    Nombre de jours entre `jour` et la date de `champ` (négatif si dépassée).
+    """
+    output_field = models.IntegerField()
+    arg_joiner = " - "
+    template = "(%(expressions)s)"
+
+    def __init__(self, champ, jour):
+        super().__init__(F(champ), Value(jour, output_field=models.DateField()))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function="DATEDIFF", template="%(function)s(%(expressions)s)",
+            arg_joiner=", ", **extra_context,
+        )
+
+
+class Etat(models.TextChoices):
+    EXPIRE = "EXPIRE", "Expiré"
+    RETARD = "RETARD", "En retard"
+    BIENTOT = "BIENTOT", "Expire bientôt"
+    VALIDE = "VALIDE", "Valide"
+    PLANIFIE = "PLANIFIE", "Planifié"
+    EFFECTUE = "EFFECTUE", "Effectué"
+
+
+class EcheanceQuerySet(SuiviQuerySet):
+    """
+    Classe les lignes selon une date d'échéance, dans la base :
+    `etat` et `jours_restants` sont calculés en SQL.
+    """
+    champ_echeance = None
+    delai_bientot = 30
+    etat_depasse = Etat.EXPIRE
+    etat_normal = Etat.VALIDE
+
+    def _actives(self):
+        return self
+
+    def echues(self, jour):
+        return self._actives().filter(**{f"{self.champ_echeance}__lt": jour})
+
+    def bientot(self, jour):
+        limite = jour + timedelta(days=self.delai_bientot)
+        return self._actives().filter(**{f"{self.champ_echeance}__range": [jour, limite]})
+
+    def _cas_etat(self, jour):
+        limite = jour + timedelta(days=self.delai_bientot)
+        return [
+            When(**{f"{self.champ_echeance}__lt": jour}, then=Value(self.etat_depasse)),
+            When(**{f"{self.champ_echeance}__lte": limite}, then=Value(Etat.BIENTOT)),
+        ]
+
+    def avec_etat(self, jour):
+        return self.annotate(
+            etat=Case(*self._cas_etat(jour), default=Value(self.etat_normal)),
+            jours_restants=JoursRestants(self.champ_echeance, jour),
+        )
+
+    def par_etat(self, jour):
+        """
+        Nombre de lignes par état, en un seul GROUP BY.
+        """
+        lignes = (
+            self.annotate(etat=Case(*self._cas_etat(jour), default=Value(self.etat_normal)))
+            .order_by()
+            .values("etat")
+            .annotate(n=Count("pk"))
+        )
+        return {ligne["etat"]: ligne["n"] for ligne in lignes}
+
+    def etat_de(self, echeance, jour):
+        """
+        Même classement que avec_etat, pour une date déjà en mémoire.
+        """
+        if echeance < jour:
+            return self.etat_depasse
+        if echeance <= jour + timedelta(days=self.delai_bientot):
+            return Etat.BIENTOT
+        return self.etat_normal
+
+
+class DocumentVehiculeQuerySet(EcheanceQuerySet):
+    champ_echeance = "date_expiration"
+    delai_bientot = 30
+
+
+class ChauffeurQuerySet(EcheanceQuerySet):
+    champ_echeance = "date_expiration_permis"
+    delai_bientot = 30
+
+
+class EntretienQuerySet(EcheanceQuerySet):
+    champ_echeance = "date_prevue"
+    delai_bientot = 7
+    etat_depasse = Etat.RETARD
+    etat_normal = Etat.PLANIFIE
+
+    def _actives(self):
+        return self.filter(effectue=False)
+
+    def _cas_etat(self, jour):
+        return [When(effectue=True, then=Value(Etat.EFFECTUE)), *super()._cas_etat(jour)]
+
+
 # ----------------------------
 # UTILISATEUR
 # ----------------------------
@@ -48,6 +217,21 @@ class Vehicule(models.Model):
         related_name="vehicules"
     )
 
+    objects = SuiviQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # pagination keyset de la liste (avec ou sans filtre de statut)
+            models.Index(fields=["statut", "date_creation", "id"], name="vehicule_statut_idx"),
+            models.Index(fields=["date_creation", "id"], name="vehicule_creation_idx"),
+            # autres tris de TRIS_VEHICULES, id départageant les ex aequo
+            models.Index(fields=["immatriculation", "id"], name="vehicule_immat_idx"),
+            models.Index(fields=["marque", "modele", "id"], name="vehicule_marque_idx"),
+            models.Index(fields=["kilometrage", "id"], name="vehicule_km_idx"),
+            # filtre marque insensible à la casse (filtres.filtrer_vehicules), tri par défaut
+            models.Index(Lower("marque"), "date_creation", "id", name="vehicule_marque_ci_idx"),
+        ]
+
     def __str__(self):
         return f"{self.marque} {self.modele} - {self.immatriculation}"
 
@@ -55,8 +239,6 @@ class Vehicule(models.Model):
 # ----------------------------
 # DOCUMENTS VEHICULE
 # ----------------------------
-from datetime import date
-
 class DocumentVehicule(models.Model):
 
     class TypeDocument(models.TextChoices):
@@ -68,12 +250,12 @@ class DocumentVehicule(models.Model):
     type_document = models.CharField(max_length=20, choices=TypeDocument.choices)
     date_expiration = models.DateField()
 
-    def est_expire(self):
-        return self.date_expiration < date.today()
-
-    def expire_bientot(self):
-        return 0 <= (self.date_expiration - date.today()).days <= 30
+    objects = DocumentVehiculeQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["date_expiration", "vehicule"], name="document_expiration_idx"),
+        ]
 
 
 # ----------------------------
@@ -99,6 +281,13 @@ class Chauffeur(models.Model):
     numero_permis = models.CharField(max_length=50, unique=True)
     date_expiration_permis = models.DateField()
 
+    objects = ChauffeurQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date_expiration_permis"], name="chauffeur_permis_idx"),
+        ]
+
     def __str__(self):
         return self.utilisateur.get_full_name() if self.utilisateur else self.nom
 
@@ -120,14 +309,102 @@ class Entretien(models.Model):
     cout = models.DecimalField(max_digits=10, decimal_places=2)
     effectue = models.BooleanField(default=False)
 
+    objects = EntretienQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # alertes retard / à venir : seuls les entretiens non effectués
+            models.Index(
+                fields=["date_prevue", "vehicule"],
+                name="entretien_a_faire_idx",
+                condition=models.Q(effectue=False),
+            ),
+            # historique par véhicule (entretien_list)
+            models.Index(fields=["vehicule", "-date_prevue"], name="entretien_vehicule_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.type_entretien} - {self.vehicule.immatriculation}"
 
 
+# ----------------------------
+# STATISTIQUES FLOTTE (instantané quotidien)
+# ----------------------------
+class FleetStats(models.Model):
+    """
+    KPI du tableau de bord pour un jour donné, créés par le job de nuit
+    (`avancer_echeances`, requis), tenus à jour par deltas (voir
+    web/signals.py) et reconstruits par `rebuild_fleet_stats`.
+    """
+    jour = models.DateField(unique=True)
+
+    total_vehicules = models.IntegerField(default=0)
+    vehicules_disponibles = models.IntegerField(default=0)
+    vehicules_mission = models.IntegerField(default=0)
+    vehicules_maintenance = models.IntegerField(default=0)
+
+    total_chauffeurs = models.IntegerField(default=0)
+    chauffeurs_disponibles = models.IntegerField(default=0)
+    chauffeurs_mission = models.IntegerField(default=0)
+    chauffeurs_permis_expire_count = models.IntegerField(default=0)
+
+    total_documents = models.IntegerField(default=0)
+    documents_expires_count = models.IntegerField(default=0)
+    documents_bientot_count = models.IntegerField(default=0)
+
+    total_entretiens = models.IntegerField(default=0)
+    entretiens_retard_count = models.IntegerField(default=0)
+    entretiens_bientot_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Statistiques du {self.jour}"
+
+
+# ----------------------------
+# ÉCHÉANCES À VENIR (chronologie)
+# ----------------------------
+class EcheanceEvent(models.Model):
+    """
+    Une ligne par expiration de document, expiration de permis ou entretien
+    planifié, tenue à jour par signaux (voir web/echeances.py). Les panneaux
+    d'alertes et le calendrier ne sont que des parcours d'intervalle de dates.
+    """
+    class Type(models.TextChoices):
+        DOCUMENT = "DOCUMENT", "Document"
+        PERMIS = "PERMIS", "Permis"
+        ENTRETIEN = "ENTRETIEN", "Entretien"
+
+    type_echeance = models.CharField(max_length=20, choices=Type.choices)
+    date_echeance = models.DateField()
+    etat = models.CharField(max_length=20, choices=Etat.choices)
+
+    # libellés dénormalisés : l'affichage ne nécessite aucune jointure
+    sujet = models.CharField(max_length=200)
+    libelle = models.CharField(max_length=100)
+
+    vehicule = models.ForeignKey(Vehicule, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    document = models.OneToOneField(DocumentVehicule, on_delete=models.CASCADE, null=True, blank=True, related_name="echeance")
+    chauffeur = models.OneToOneField(Chauffeur, on_delete=models.CASCADE, null=True, blank=True, related_name="echeance")
+    entretien = models.OneToOneField(Entretien, on_delete=models.CASCADE, null=True, blank=True, related_name="echeance")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["type_echeance", "date_echeance"], name="echeance_type_date_idx"),
+            models.Index(fields=["date_echeance"], name="echeance_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_echeance_display()} {self.sujet} — {self.date_echeance}"
+
+
 # ----------------------------
 # OTP RECUPERATION MOT DE PASSE
 # ----------------------------
 class PasswordResetOTP(models.Model):
+    """
+    Ancien stockage des codes OTP, remplacé par le cache (web/otp.py).
+    Les lignes restantes se suppriment avec la commande purger_otp.
+    """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
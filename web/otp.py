@@ -0,0 +1,54 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+from . import metriques
+
+
+# ----------------------------
+# CODES OTP EN CACHE
+# ----------------------------
+# Un code par utilisateur, avec une durée de vie (OTP_DUREE) et un
+# compteur d'essais (OTP_ESSAIS_MAX) : aucune écriture en base. Émettre
+# un nouveau code remplace le précédent et remet les essais à zéro.
+def _cles(user_id):
+    return f"otp:{user_id}:code", f"otp:{user_id}:essais"
+
+
+def emettre(user_id):
+    code = f"{secrets.randbelow(900000) + 100000}"
+    cle_code, cle_essais = _cles(user_id)
+    cache.set_many({cle_code: code, cle_essais: 0}, timeout=settings.OTP_DUREE)
+    metriques.compter("flotte_otp_emis_total")
+    return code
+
+
+def verifier(user_id, code):
+    """
+    Vérifie et consomme le code : vrai au plus une fois par code émis.
+    Chaque essai est compté avant la comparaison ; au-delà de
+    OTP_ESSAIS_MAX, le code est détruit.
+    """
+    cle_code, cle_essais = _cles(user_id)
+    try:
+        essais = cache.incr(cle_essais)
+    except ValueError:
+        # expiré ou jamais émis
+        return False
+
+    if essais > settings.OTP_ESSAIS_MAX:
+        cache.delete_many([cle_code, cle_essais])
+        return False
+
+    attendu = cache.get(cle_code)
+    if attendu is None or not constant_time_compare(attendu, code):
+        return False
+
+    # entre deux vérifications concurrentes du bon code, seule celle qui
+    # supprime effectivement la clé l'emporte
+    if not cache.delete(cle_code):
+        return False
+    cache.delete(cle_essais)
+    return True
@@ -0,0 +1,99 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CurseurInvalide(Exception):
+    pass
+
+
+# ----------------------------
+# CURSEURS
+# ----------------------------
+def encoder_curseur(valeurs):
+    brut = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in valeurs])
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip("=")
+
+
+def decoder_curseur(curseur, champs):
+    """
+    Décode un curseur et reconvertit chaque valeur dans le type du champ
+    de tri correspondant.
+    """
+    try:
+        brut = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4))
+        valeurs = json.loads(brut)
+    except (ValueError, TypeError):
+        raise CurseurInvalide(curseur)
+
+    if not isinstance(valeurs, list) or len(valeurs) != len(champs):
+        raise CurseurInvalide(curseur)
+
+    try:
+        return [champ.to_python(valeur) for champ, valeur in zip(champs, valeurs)]
+    except ValidationError:
+        raise CurseurInvalide(curseur)
+
+
+# ----------------------------
+# PAGINATION PAR CLÉ (keyset)
+# ----------------------------
+def _apres(ordre, valeurs):
+    """
+    Condition « strictement après » la position `valeurs` dans `ordre` :
+    (a > va) OR (a = va AND b > vb) OR ...
+    """
+    condition = Q()
+    egalites = {}
+    for cle, valeur in zip(ordre, valeurs):
+        nom = cle.lstrip("-")
+        lookup = "lt" if cle.startswith("-") else "gt"
+        condition |= Q(**egalites, **{f"{nom}__{lookup}": valeur})
+        egalites[nom] = valeur
+    return condition
+
+
+def _inverser(ordre):
+    return [cle[1:] if cle.startswith("-") else f"-{cle}" for cle in ordre]
+
+
+def paginer_keyset(queryset, ordre, apres=None, avant=None, taille=50):
+    """
+    Pagine `queryset` selon `ordre` (dont la dernière clé doit être unique,
+    ex. ("-date_creation", "-id")) sans OFFSET ni COUNT : le coût d'une page
+    ne dépend pas de la taille de la table.
+
+    Renvoie {"objets", "suivant", "precedent"} où suivant / precedent sont
+    les curseurs des pages adjacentes (None s'il n'y en a pas).
+    """
+    ordre = list(ordre)
+    noms = [cle.lstrip("-") for cle in ordre]
+    champs = [queryset.model._meta.get_field(nom) for nom in noms]
+
+    if avant:
+        # on parcourt à l'envers puis on remet la page dans l'ordre
+        sens = _inverser(ordre)
+        qs = queryset.filter(_apres(sens, decoder_curseur(avant, champs))).order_by(*sens)
+        objets = list(qs[:taille + 1])
+        plus = len(objets) > taille
+        objets = objets[:taille][::-1]
+        a_suivant, a_precedent = True, plus
+    else:
+        qs = queryset.order_by(*ordre)
+        if apres:
+            qs = qs.filter(_apres(ordre, decoder_curseur(apres, champs)))
+        objets = list(qs[:taille + 1])
+        plus = len(objets) > taille
+        objets = objets[:taille]
+        a_suivant, a_precedent = plus, bool(apres)
+
+    def position(obj):
+        return encoder_curseur([getattr(obj, nom) for nom in noms])
+
+    return {
+        "objets": objets,
+        "suivant": position(objets[-1]) if objets and a_suivant else None,
+        "precedent": position(objets[0]) if objets and a_precedent else None,
+    }
@@ -0,0 +1,163 @@
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Vehicule, Chauffeur
+
+
+# ----------------------------
+# RECHERCHE PLEIN TEXTE (FTS5)
+# ----------------------------
+# Sous SQLite, deux tables virtuelles FTS5 (migration 0009), tenues à jour
+# par des triggers : toute écriture y passe, ORM, opérations par lots ou
+# SQL brut (generer_flotte). Le tokenizer unicode61 ignore casse et accents
+# (« helene » trouve « Hélène ») ; chaque terme est cherché en préfixe.
+# Les plaques et les téléphones sont aussi indexés sans séparateurs
+# (« AB123 » trouve « AB-123-CD »).
+TABLES_FTS = {
+    Vehicule: "web_recherche_vehicule",
+    Chauffeur: "web_recherche_chauffeur",
+}
+
+# champs cherchés sans index plein texte (autres bases)
+CHAMPS_RECHERCHE = {
+    Vehicule: ("immatriculation", "marque", "modele"),
+    Chauffeur: ("nom", "telephone", "numero_permis"),
+}
+
+TERMES_MAX = 5
+
+
+def _sans_separateurs(colonne):
+    return f"replace(replace(replace({colonne}, '-', ''), ' ', ''), '.', '')"
+
+
+# colonnes FTS -> expression sur la table source (comme la migration 0009)
+COLONNES_FTS = {
+    Vehicule: {
+        "immatriculation": "immatriculation",
+        "plaque": _sans_separateurs("immatriculation"),
+        "marque": "marque",
+        "modele": "modele",
+    },
+    Chauffeur: {
+        "nom": "nom",
+        "telephone": _sans_separateurs("telephone"),
+        "numero_permis": "numero_permis",
+    },
+}
+
+
+def termes(texte):
+    # les guillemets délimitent les chaînes FTS5 : retirés de la saisie ;
+    # un terme sans lettre ni chiffre ne donnerait aucun mot
+    mots = [mot for mot in texte.replace('"', " ").split() if any(c.isalnum() for c in mot)]
+    return mots[:TERMES_MAX]
+
+
+def expression_fts(texte):
+    """
+    Expression MATCH : chaque terme de la saisie en préfixe, tous requis.
+    Un terme avec séparateurs (« AB-12 ») devient une phrase dont le dernier
+    mot est un préfixe. None si la saisie est vide.
+    """
+    mots = termes(texte)
+    if not mots:
+        return None
+    return " ".join(f'"{mot}"*' for mot in mots)
+
+
+def fts_disponible(using):
+    return connections[using].vendor == "sqlite"
+
+
+def rechercher(model, texte, limite=10, avant=None):
+    """
+    Les `limite` dernières lignes de `model` (Vehicule ou Chauffeur) qui
+    correspondent à la saisie, en une requête. `avant` : pagination par
+    clé, lignes d'id inférieur (le dernier id de la page précédente).
+    """
+    expression = expression_fts(texte)
+    if expression is None:
+        return []
+
+    using = router.db_for_read(model)
+    if not fts_disponible(using):
+        queryset = _rechercher_sans_fts(model, texte, using)
+        if avant is not None:
+            queryset = queryset.filter(pk__lt=avant)
+        return list(queryset[:limite])
+
+    # pas de ORDER BY rank : le score serait calculé pour chaque ligne
+    # trouvée (la moitié de la flotte pour « sy »). En rowid décroissant,
+    # FTS5 s'arrête après `limite` lignes : les plus récentes d'abord.
+    table = TABLES_FTS[model]
+    condition, params = "", [expression]
+    if avant is not None:
+        condition = "AND r.rowid < %s "
+        params.append(avant)
+    return list(model.objects.db_manager(using).raw(
+        f"SELECT t.* FROM {table} r JOIN {model._meta.db_table} t ON t.id = r.rowid "
+        f"WHERE {table} MATCH %s {condition}ORDER BY r.rowid DESC LIMIT %s",
+        [*params, limite],
+    ))
+
+
+def _rechercher_sans_fts(model, texte, using):
+    # repli : préfixes insensibles à la casse, sans index ni accents
+    queryset = model.objects.using(using).order_by("-pk")
+    for mot in termes(texte):
+        condition = Q()
+        for champ in CHAMPS_RECHERCHE[model]:
+            condition |= Q(**{f"{champ}__istartswith": mot})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+# ----------------------------
+# CHARGEMENTS MASSIFS
+# ----------------------------
+def reindexer(using="default"):
+    """
+    Reconstruit les tables FTS depuis les tables source, en une passe.
+    """
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        for model, colonnes in COLONNES_FTS.items():
+            table = TABLES_FTS[model]
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, {', '.join(colonnes)}) "
+                f"SELECT id, {', '.join(colonnes.values())} FROM {model._meta.db_table}"
+            )
+
+
+def suspendre_indexation(using="default"):
+    """
+    Retire les triggers d'insertion avant un chargement massif (une
+    insertion FTS par ligne coûte plus que la ligne elle-même). Renvoie
+    leur définition, pour reprendre_indexation().
+    """
+    if not fts_disponible(using):
+        return []
+
+    noms = [f"{table}_ai" for table in TABLES_FTS.values()]
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join(['%s'] * len(noms))})",
+            noms,
+        )
+        triggers = cursor.fetchall()
+        for nom, _ in triggers:
+            cursor.execute(f"DROP TRIGGER {nom}")
+    return triggers
+
+
+def reprendre_indexation(triggers, using="default"):
+    """
+    Reconstruit l'index et remet les triggers tels que la migration les a créés.
+    """
+    reindexer(using)
+    with connections[using].cursor() as cursor:
+        for _, sql in triggers:
+            cursor.execute(sql)
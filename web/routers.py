@@ -0,0 +1,66 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+ALIAS_REPLIQUE = "replica"
+CLE_SESSION = "derniere_ecriture"
+
+# état de la requête en cours, posé par RepliqueMiddleware :
+# {"lecture_seule": vue @lecture_replique, "ecriture": la requête a écrit}
+requete_en_cours = ContextVar("requete_replique", default=None)
+
+
+def replique_configuree():
+    return ALIAS_REPLIQUE in connections
+
+
+def ecriture_recente(request):
+    """
+    Vrai si ce client a écrit il y a moins de REPLICA_DELAI_LECTURE
+    secondes : la réplique peut ne pas encore avoir ses écritures.
+    """
+    return _recente(request.session.get(CLE_SESSION))
+
+
+async def aecriture_recente(request):
+    return _recente(await request.session.aget(CLE_SESSION))
+
+
+def _recente(derniere):
+    return derniere is not None and time.time() - derniere < settings.REPLICA_DELAI_LECTURE
+
+
+# ----------------------------
+# ROUTEUR LECTURE / ÉCRITURE
+# ----------------------------
+class LectureEcritureRouter:
+    """
+    Les lectures des vues en lecture seule vont sur la réplique ; tout le
+    reste (écritures, autres vues, commandes) sur la base principale.
+    Sans alias « replica » dans DATABASES, le routeur ne change rien.
+    """
+
+    def db_for_read(self, model, **hints):
+        etat = requete_en_cours.get()
+        if etat and etat["lecture_seule"] and replique_configuree():
+            return ALIAS_REPLIQUE
+        return None
+
+    def db_for_write(self, model, **hints):
+        etat = requete_en_cours.get()
+        if etat is not None:
+            etat["ecriture"] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # même schéma, mêmes données (réplication)
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # la réplique reçoit son schéma par la réplication
+        if db == ALIAS_REPLIQUE:
+            return False
+        return None
@@ -0,0 +1,227 @@
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+
+from . import echeances, metriques
+from .generation import incrementer_generation
+from .utilisateurs import invalider_utilisateur
+from .middleware import requete_mesuree
+from .models import (
+    Vehicule, Chauffeur, EcheanceEvent, pre_lot_modifie, post_lot_modifie, post_lot_cree, suivre_lot,
+)
+from .stats import (
+    CHAMPS_SUIVIS, contribution, contribution_instance, contribution_lot,
+    appliquer_delta, reconstruire_fleet_stats,
+)
+
+
+# ----------------------------
+# FLEETSTATS : deltas sur save / delete
+# ----------------------------
+def memoriser_contribution(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    instance._contribution_avant = Counter()
+    if instance._state.adding or instance.pk is None:
+        return
+
+    ancien = sender._base_manager.filter(pk=instance.pk).values(*CHAMPS_SUIVIS[sender]).first()
+    if ancien is not None:
+        instance._contribution_avant = contribution(sender, ancien, timezone.now().date())
+
+
+def appliquer_contribution(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    jour = timezone.now().date()
+    avant = getattr(instance, "_contribution_avant", Counter())
+    appliquer_delta(avant, contribution_instance(instance, jour), jour)
+    instance._contribution_avant = Counter()
+
+
+def retirer_contribution(sender, instance, **kwargs):
+    jour = timezone.now().date()
+    appliquer_delta(contribution_instance(instance, jour), Counter(), jour)
+
+
+# ----------------------------
+# FLEETSTATS : écritures en masse
+# ----------------------------
+def memoriser_contribution_lot(sender, pks, champs, etat, **kwargs):
+    if set(CHAMPS_SUIVIS[sender]).isdisjoint(champs):
+        return
+    jour = timezone.now().date()
+    etat["fleet_stats"] = (jour, contribution_lot(sender, pks, jour))
+
+
+def appliquer_contribution_lot(sender, pks, etat, **kwargs):
+    if "fleet_stats" not in etat:
+        return
+    jour, avant = etat["fleet_stats"]
+    appliquer_delta(avant, contribution_lot(sender, pks, jour), jour)
+
+
+def ajouter_contribution_lot(sender, objets, conflits=False, **kwargs):
+    jour = timezone.now().date()
+    if conflits:
+        # impossible de savoir quelles lignes ont réellement été insérées
+        reconstruire_fleet_stats(jour)
+        return
+
+    apres = Counter()
+    for objet in objets:
+        apres.update(contribution_instance(objet, jour))
+    appliquer_delta(Counter(), apres, jour)
+
+
+for modele in CHAMPS_SUIVIS:
+    uid = f"fleet_stats_{modele.__name__}"
+    pre_save.connect(memoriser_contribution, sender=modele, dispatch_uid=uid)
+    post_save.connect(appliquer_contribution, sender=modele, dispatch_uid=uid)
+    post_delete.connect(retirer_contribution, sender=modele, dispatch_uid=uid)
+    pre_lot_modifie.connect(memoriser_contribution_lot, sender=modele, dispatch_uid=uid)
+    post_lot_modifie.connect(appliquer_contribution_lot, sender=modele, dispatch_uid=uid)
+    post_lot_cree.connect(ajouter_contribution_lot, sender=modele, dispatch_uid=uid)
+    suivre_lot(modele, CHAMPS_SUIVIS[modele])
+
+
+# ----------------------------
+# CHRONOLOGIE DES ÉCHÉANCES
+# ----------------------------
+CHAMPS_SUJET = {"immatriculation", "marque", "modele"}
+
+
+def synchroniser_echeance(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    echeances.synchroniser(sender, [instance.pk], timezone.now().date())
+
+
+def synchroniser_echeances_lot(sender, pks, champs, **kwargs):
+    if set(echeances.CHAMPS_ECHEANCE[sender]).isdisjoint(champs):
+        return
+    echeances.synchroniser(sender, pks, timezone.now().date())
+
+
+def synchroniser_echeances_creees(sender, objets, **kwargs):
+    pks = [objet.pk for objet in objets if objet.pk is not None]
+    echeances.synchroniser(sender, pks, timezone.now().date())
+
+
+def renommer_echeances(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    EcheanceEvent.objects.filter(
+        vehicule=instance, type_echeance=EcheanceEvent.Type.DOCUMENT
+    ).exclude(sujet=instance.immatriculation).update(sujet=instance.immatriculation)
+    EcheanceEvent.objects.filter(
+        vehicule=instance, type_echeance=EcheanceEvent.Type.ENTRETIEN
+    ).exclude(sujet=str(instance)).update(sujet=str(instance))
+
+
+def renommer_echeances_lot(sender, pks, champs, **kwargs):
+    if CHAMPS_SUJET.intersection(champs):
+        echeances.renommer_vehicules(pks)
+
+
+for modele in echeances.SOURCES:
+    uid = f"echeances_{modele.__name__}"
+    post_save.connect(synchroniser_echeance, sender=modele, dispatch_uid=uid)
+    post_lot_modifie.connect(synchroniser_echeances_lot, sender=modele, dispatch_uid=uid)
+    post_lot_cree.connect(synchroniser_echeances_creees, sender=modele, dispatch_uid=uid)
+    suivre_lot(modele, echeances.CHAMPS_ECHEANCE[modele])
+
+post_save.connect(renommer_echeances, sender=Vehicule, dispatch_uid="echeances_Vehicule")
+post_lot_modifie.connect(renommer_echeances_lot, sender=Vehicule, dispatch_uid="echeances_Vehicule")
+suivre_lot(Vehicule, CHAMPS_SUJET)
+
+
+# ----------------------------
+# CACHE DES FRAGMENTS : génération de la flotte
+# ----------------------------
+def invalider_fragments(sender, **kwargs):
+    # tout de suite (même requête / même transaction), puis au commit :
+    # un fragment calculé par une autre requête avant le commit, donc sur
+    # des données périmées, ne survit pas à la seconde incrémentation
+    incrementer_generation()
+    transaction.on_commit(incrementer_generation, using=kwargs.get("using"))
+
+
+# les fragments n'affichent que des champs déjà déclarés par suivre_lot
+# (KPI, échéances, sujet des véhicules)
+for modele in CHAMPS_SUIVIS:
+    uid = f"fragments_{modele.__name__}"
+    post_save.connect(invalider_fragments, sender=modele, dispatch_uid=uid)
+    post_delete.connect(invalider_fragments, sender=modele, dispatch_uid=uid)
+    post_lot_modifie.connect(invalider_fragments, sender=modele, dispatch_uid=uid)
+    post_lot_cree.connect(invalider_fragments, sender=modele, dispatch_uid=uid)
+
+
+# ----------------------------
+# CACHE DES UTILISATEURS (session -> User + profil chauffeur)
+# ----------------------------
+def _invalider_utilisateurs(pks, using):
+    # tout de suite, puis au commit (même raison que pour les fragments)
+    for pk in pks:
+        invalider_utilisateur(pk)
+        transaction.on_commit(lambda pk=pk: invalider_utilisateur(pk), using=using)
+
+
+def invalider_utilisateur_modifie(sender, instance, using=None, **kwargs):
+    _invalider_utilisateurs([instance.pk], using)
+
+
+def invalider_profil_chauffeur(sender, instance, using=None, **kwargs):
+    if instance.utilisateur_id is not None:
+        _invalider_utilisateurs([instance.utilisateur_id], using)
+
+
+def invalider_profils_lot(sender, pks, using=None, **kwargs):
+    profils = Chauffeur.objects.using(using).filter(pk__in=pks).exclude(utilisateur=None)
+    _invalider_utilisateurs(profils.values_list("utilisateur_id", flat=True), using)
+
+
+def invalider_profils_crees(sender, objets, using=None, **kwargs):
+    _invalider_utilisateurs([o.utilisateur_id for o in objets if o.utilisateur_id is not None], using)
+
+
+post_save.connect(invalider_utilisateur_modifie, sender=settings.AUTH_USER_MODEL, dispatch_uid="utilisateurs_User")
+post_delete.connect(invalider_utilisateur_modifie, sender=settings.AUTH_USER_MODEL, dispatch_uid="utilisateurs_User")
+post_save.connect(invalider_profil_chauffeur, sender=Chauffeur, dispatch_uid="utilisateurs_Chauffeur")
+post_delete.connect(invalider_profil_chauffeur, sender=Chauffeur, dispatch_uid="utilisateurs_Chauffeur")
+post_lot_modifie.connect(invalider_profils_lot, sender=Chauffeur, dispatch_uid="utilisateurs_Chauffeur")
+post_lot_cree.connect(invalider_profils_crees, sender=Chauffeur, dispatch_uid="utilisateurs_Chauffeur")
+# le profil en cache reprend toute la ligne
+suivre_lot(Chauffeur, [champ.name for champ in Chauffeur._meta.concrete_fields])
+
+
+# ----------------------------
+# MÉTRIQUES (/metrics)
+# ----------------------------
+def mesurer_requete(sender, request, response, mesure, **kwargs):
+    match = request.resolver_match
+    # étiquette bornée : le nom d'URL, jamais le chemin
+    route = match.url_name if match and match.url_name else "aucune"
+    metriques.compter("flotte_requetes_total", route=route, statut=response.status_code)
+    metriques.observer("flotte_requete_duree_secondes", mesure.total, route=route)
+    metriques.observer("flotte_requete_sql", mesure.sql.requetes, route=route)
+    metriques.publier()
+
+
+def compter_connexion(sender, **kwargs):
+    metriques.compter("flotte_connexions_total", resultat="succes")
+
+
+def compter_echec_connexion(sender, **kwargs):
+    metriques.compter("flotte_connexions_total", resultat="echec")
+
+
+requete_mesuree.connect(mesurer_requete, dispatch_uid="metriques_requetes")
+user_logged_in.connect(compter_connexion, dispatch_uid="metriques_connexions")
+user_login_failed.connect(compter_echec_connexion, dispatch_uid="metriques_connexions")
@@ -0,0 +1,240 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from . import echeances
+from .generation import incrementer_generation
+from .models import Vehicule, DocumentVehicule, Entretien, Chauffeur, FleetStats, Etat, EcheanceEvent
+
+
+# champs dont dépend la contribution d'une ligne aux KPI
+CHAMPS_SUIVIS = {
+    Vehicule: ("statut",),
+    Chauffeur: ("statut", "date_expiration_permis"),
+    DocumentVehicule: ("date_expiration",),
+    Entretien: ("date_prevue", "effectue"),
+}
+
+COMPTEURS = [
+    "total_vehicules", "vehicules_disponibles", "vehicules_mission", "vehicules_maintenance",
+    "total_chauffeurs", "chauffeurs_disponibles", "chauffeurs_mission", "chauffeurs_permis_expire_count",
+    "total_documents", "documents_expires_count", "documents_bientot_count",
+    "total_entretiens", "entretiens_retard_count", "entretiens_bientot_count",
+]
+
+STATUTS_VEHICULE = {
+    Vehicule.Statut.DISPONIBLE: "vehicules_disponibles",
+    Vehicule.Statut.MISSION: "vehicules_mission",
+    Vehicule.Statut.MAINTENANCE: "vehicules_maintenance",
+}
+
+STATUTS_CHAUFFEUR = {
+    Chauffeur.Statut.DISPONIBLE: "chauffeurs_disponibles",
+    Chauffeur.Statut.MISSION: "chauffeurs_mission",
+}
+
+
+# ----------------------------
+# KPI FLOTTE (une requête agrégée par table)
+# ----------------------------
+def statistiques_flotte(jour):
+    """
+    Calcule tous les KPI du tableau de bord depuis zéro, avec une seule
+    requête par table (aggregate conditionnel ou GROUP BY par état).
+    """
+    vehicules = Vehicule.objects.aggregate(
+        total_vehicules=Count("id"),
+        vehicules_disponibles=Count("id", filter=Q(statut=Vehicule.Statut.DISPONIBLE)),
+        vehicules_mission=Count("id", filter=Q(statut=Vehicule.Statut.MISSION)),
+        vehicules_maintenance=Count("id", filter=Q(statut=Vehicule.Statut.MAINTENANCE)),
+    )
+
+    chauffeurs = Chauffeur.objects.aggregate(
+        total_chauffeurs=Count("id"),
+        chauffeurs_disponibles=Count("id", filter=Q(statut=Chauffeur.Statut.DISPONIBLE)),
+        chauffeurs_mission=Count("id", filter=Q(statut=Chauffeur.Statut.MISSION)),
+        chauffeurs_permis_expire_count=Count("id", filter=Q(date_expiration_permis__lt=jour)),
+    )
+
+    documents = DocumentVehicule.objects.par_etat(jour)
+    entretiens = Entretien.objects.par_etat(jour)
+
+    return {
+        **vehicules,
+        **chauffeurs,
+        "total_documents": sum(documents.values()),
+        "documents_expires_count": documents.get(Etat.EXPIRE, 0),
+        "documents_bientot_count": documents.get(Etat.BIENTOT, 0),
+        "total_entretiens": sum(entretiens.values()),
+        "entretiens_retard_count": entretiens.get(Etat.RETARD, 0),
+        "entretiens_bientot_count": entretiens.get(Etat.BIENTOT, 0),
+    }
+
+
+def reconstruire_fleet_stats(jour):
+    """
+    Recalcule entièrement la ligne FleetStats du jour (corrige toute dérive).
+    """
+    # lecture et écriture dans la même transaction (IMMEDIATE sous SQLite) :
+    # une écriture concurrente est soit comptée ici, soit appliquée en
+    # delta à la ligne créée
+    try:
+        with transaction.atomic():
+            stats, _ = FleetStats.objects.update_or_create(jour=jour, defaults=statistiques_flotte(jour))
+    except IntegrityError:
+        # une autre requête vient de créer la ligne du jour
+        stats, _ = FleetStats.objects.update_or_create(jour=jour, defaults=statistiques_flotte(jour))
+    # les fragments KPI ont pu être rendus depuis une ligne plus ancienne
+    # (voir signals.invalider_fragments pour la double incrémentation)
+    incrementer_generation()
+    transaction.on_commit(incrementer_generation)
+    return stats
+
+
+def requete_fleet_stats(jour):
+    """
+    Lignes FleetStats jusqu'au `jour`, la plus récente d'abord (lue par
+    derniere_fleet_stats, expliquée par explain_hotpaths).
+    """
+    return FleetStats.objects.filter(jour__lte=jour).order_by("-jour")
+
+
+def derniere_fleet_stats(jour):
+    """
+    Ligne FleetStats du jour, ou à défaut la plus récente. None si la table
+    est vide.
+
+    La ligne du jour n'est créée que par le job de nuit (avancer_echeances),
+    jamais par une requête : il est requis pour des compteurs justes. Entre
+    minuit et son passage, les KPI sont ceux de la veille (kpis["jour"]),
+    sans les écritures du jour, que le job reprend en recalculant tout.
+    """
+    return requete_fleet_stats(jour).first()
+
+
+def kpis_de(stats, jour):
+    kpis = {nom: getattr(stats, nom) for nom in COMPTEURS}
+    # jour des compteurs : s'il n'est pas `jour`, ils ne correspondent pas
+    # aux panneaux d'alertes, calculés au jour courant
+    kpis["jour"] = stats.jour
+    kpis["a_jour"] = stats.jour == jour
+    return kpis
+
+
+def kpis_du_jour(jour):
+    """
+    Lecture O(1) des KPI, en une requête ; reconstruction seulement si
+    aucune ligne n'existe encore (première installation).
+    """
+    stats = derniere_fleet_stats(jour)
+    if stats is None:
+        stats = reconstruire_fleet_stats(jour)
+    return kpis_de(stats, jour)
+
+
+# ----------------------------
+# DELTAS
+# ----------------------------
+def contribution(model, valeurs, jour):
+    """
+    Contribution d'une ligne (dict des CHAMPS_SUIVIS) aux compteurs du jour.
+    Doit rester cohérent avec statistiques_flotte().
+    """
+    c = Counter()
+
+    if model is Vehicule:
+        c["total_vehicules"] += 1
+        if valeurs["statut"] in STATUTS_VEHICULE:
+            c[STATUTS_VEHICULE[valeurs["statut"]]] += 1
+
+    elif model is Chauffeur:
+        c["total_chauffeurs"] += 1
+        if valeurs["statut"] in STATUTS_CHAUFFEUR:
+            c[STATUTS_CHAUFFEUR[valeurs["statut"]]] += 1
+        if valeurs["date_expiration_permis"] < jour:
+            c["chauffeurs_permis_expire_count"] += 1
+
+    elif model is DocumentVehicule:
+        c["total_documents"] += 1
+        if valeurs["date_expiration"] < jour:
+            c["documents_expires_count"] += 1
+        elif valeurs["date_expiration"] <= jour + timedelta(days=30):
+            c["documents_bientot_count"] += 1
+
+    elif model is Entretien:
+        c["total_entretiens"] += 1
+        if not valeurs["effectue"]:
+            if valeurs["date_prevue"] < jour:
+                c["entretiens_retard_count"] += 1
+            elif valeurs["date_prevue"] <= jour + timedelta(days=7):
+                c["entretiens_bientot_count"] += 1
+
+    return c
+
+
+def contribution_instance(instance, jour):
+    model = type(instance)
+    valeurs = {champ: getattr(instance, champ) for champ in CHAMPS_SUIVIS[model]}
+    return contribution(model, valeurs, jour)
+
+
+def contribution_lot(model, pks, jour, taille=500):
+    """
+    Somme des contributions d'un ensemble de lignes, lues par paquets.
+    """
+    total = Counter()
+    for i in range(0, len(pks), taille):
+        lignes = model._base_manager.filter(pk__in=pks[i:i + taille]).values(*CHAMPS_SUIVIS[model])
+        for valeurs in lignes:
+            total.update(contribution(model, valeurs, jour))
+    return total
+
+
+def appliquer_delta(avant, apres, jour):
+    """
+    Applique (apres - avant) à la ligne du jour avec des UPDATE atomiques.
+    Sans ligne du jour (avant le job de nuit), rien n'est fait : le job la
+    recalcule depuis la base, qui contient déjà la modification.
+    """
+    delta = {nom: apres.get(nom, 0) - avant.get(nom, 0) for nom in COMPTEURS}
+    delta = {nom: valeur for nom, valeur in delta.items() if valeur}
+    if not delta:
+        return
+
+    FleetStats.objects.filter(jour=jour).update(
+        **{nom: F(nom) + valeur for nom, valeur in delta.items()}
+    )
+
+
+# ----------------------------
+# ALERTES (chaque liste est lue une seule fois)
+# ----------------------------
+# au plus ALERTES_PAR_PANNEAU lignes par liste, les plus anciennes
+# échéances d'abord ; le total vient de FleetStats (kpis)
+ALERTES_PAR_PANNEAU = 50
+
+
+def requetes_alertes(today):
+    """
+    Querysets des panneaux d'alertes du tableau de bord (non évalués) :
+    des parcours d'intervalle sur la chronologie des échéances, bornés à
+    ALERTES_PAR_PANNEAU lignes.
+    """
+    Type = EcheanceEvent.Type
+    requetes = {
+        "documents_expires": echeances.echues(Type.DOCUMENT, today),
+        "documents_bientot": echeances.bientot(Type.DOCUMENT, today),
+        "entretiens_retard": echeances.echues(Type.ENTRETIEN, today),
+        "entretiens_bientot": echeances.bientot(Type.ENTRETIEN, today),
+        "chauffeurs_permis_expire": echeances.echues(Type.PERMIS, today),
+    }
+    return {nom: qs.order_by("date_echeance", "id")[:ALERTES_PAR_PANNEAU] for nom, qs in requetes.items()}
+
+
+def alertes_flotte(today):
+    """
+    Évalue chaque liste d'alertes une seule fois.
+    """
+    return {nom: list(qs) for nom, qs in requetes_alertes(today).items()}
@@ -0,0 +1,229 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import echeances, recherche
+from .models import User, Chauffeur, Vehicule, DocumentVehicule, Entretien
+from .stats import reconstruire_fleet_stats
+
+
+MOT_DE_PASSE = "flotte"
+MARQUES = [("Renault", "Clio"), ("Peugeot", "208"), ("Toyota", "Yaris"), ("Citroën", "C3"), ("Dacia", "Sandero")]
+TAILLE_LOT = 20000
+
+
+class Repartition:
+    """
+    Réglages de la flotte générée : volumes (documents et entretiens par
+    véhicule) et parts des différents états d'échéance.
+    """
+    def __init__(
+        self, chauffeurs=0.5, documents=3, entretiens=4,
+        documents_expires=0.08, documents_bientot=0.07,
+        entretiens_effectues=0.6, entretiens_retard=0.1,
+        permis_expires=0.05, statuts=(60, 30, 10),
+    ):
+        self.chauffeurs = chauffeurs
+        self.documents = documents
+        self.entretiens = entretiens
+        self.documents_expires = documents_expires
+        self.documents_bientot = documents_bientot
+        self.entretiens_effectues = entretiens_effectues
+        self.entretiens_retard = entretiens_retard
+        self.permis_expires = permis_expires
+        self.statuts = statuts
+
+
+# ----------------------------
+# INSERTION PAR LOTS
+# ----------------------------
+# bulk_create prépare chaque instance champ par champ et, sous SQLite, ne
+# passe que ~166 lignes par requête (999 paramètres) : ~15 000 lignes/s.
+# Ici les valeurs sont déjà au format de la base (adaptées une fois pour
+# toutes) et partent par executemany, lot par lot : sans signaux, comme
+# les écritures du gestionnaire de base.
+def inserer(model, champs, lignes, lot=TAILLE_LOT):
+    qn = connection.ops.quote_name
+    colonnes = ", ".join(qn(model._meta.get_field(champ).column) for champ in champs)
+    sql = (
+        f"INSERT INTO {qn(model._meta.db_table)} ({colonnes}) "
+        f"VALUES ({', '.join(['%s'] * len(champs))})"
+    )
+    total = 0
+    lignes = iter(lignes)
+    with connection.cursor() as cursor:
+        while paquet := list(islice(lignes, lot)):
+            cursor.executemany(sql, paquet)
+            total += len(paquet)
+    return total
+
+
+def _index_secondaires():
+    for model in (Chauffeur, Vehicule, DocumentVehicule, Entretien):
+        for index in model._meta.indexes:
+            yield model, index
+
+
+def _inseres(model, depart):
+    # pk croissantes : les lignes insérées après la plus grande pk de départ
+    return list(model._base_manager.filter(pk__gt=depart).order_by("pk").values_list("pk", flat=True))
+
+
+def _dates(jour, debut, fin):
+    # valeurs déjà adaptées au format de la base, une par jour de l'intervalle
+    return [connection.ops.adapt_datefield_value(jour + timedelta(days=n)) for n in range(debut, fin + 1)]
+
+
+# ----------------------------
+# FLOTTE SYNTHÉTIQUE
+# ----------------------------
+def generer_flotte(vehicules, repartition=None, graine=0, mot_de_passe=MOT_DE_PASSE,
+                   differer_index=False, echeances_et_stats=True, lot=TAILLE_LOT):
+    """
+    Remplit une base vide : chauffeurs (chacun avec son compte), véhicules,
+    documents et entretiens, déterministes pour une même graine. Renvoie
+    {table: lignes insérées} et les durées de chaque phase.
+    """
+    repartition = repartition or Repartition()
+    hasard = random.Random(graine)
+    alea = hasard.random
+
+    # random.choice / randint sont lents à l'échelle du million de tirages
+    def tirer(valeurs):
+        return valeurs[int(alea() * len(valeurs))]
+
+    def entier(a, b):
+        return a + int(alea() * (b - a + 1))
+    jour = timezone.now().date()
+    maintenant = timezone.now()
+    ops = connection.ops
+
+    nb_chauffeurs = max(1, int(vehicules * repartition.chauffeurs))
+    # un seul hachage (coûteux par construction) pour tous les comptes
+    empreinte = make_password(mot_de_passe)
+    cree_le = ops.adapt_datetimefield_value(maintenant)
+
+    lignes, durees = {}, {}
+    debut = time.perf_counter()
+
+    # seules les lignes de ce chargement, pas celles déjà en base
+    depart = {
+        nom: model._base_manager.aggregate(dernier=Max("pk"))["dernier"] or 0
+        for nom, model in (("utilisateurs", User), ("chauffeurs", Chauffeur), ("vehicules", Vehicule))
+    }
+
+    # remis en place même si une insertion échoue (finally)
+    triggers, retires = [], []
+    try:
+        if differer_index:
+            triggers = recherche.suspendre_indexation()
+            with connection.schema_editor() as editor:
+                for model, index in _index_secondaires():
+                    editor.remove_index(model, index)
+                    retires.append((model, index))
+
+        # données cohérentes par construction : pas de vérification des clés
+        # étrangères ligne à ligne (comme loaddata)
+        with connection.constraint_checks_disabled(), transaction.atomic():
+            lignes["utilisateurs"] = inserer(User, [
+                "password", "is_superuser", "username", "first_name", "last_name", "email",
+                "is_staff", "is_active", "date_joined", "role", "telephone",
+            ], (
+                (empreinte, False, f"chauffeur{i}", "Chauffeur", str(i), "", False, True, cree_le,
+                 "driver", f"07{i:08d}")
+                for i in range(nb_chauffeurs)
+            ), lot)
+            comptes = _inseres(User, depart["utilisateurs"])
+
+            permis_expires = _dates(jour, -365, -1)
+            permis_valides = _dates(jour, 0, 1500)
+            lignes["chauffeurs"] = inserer(Chauffeur, [
+                "utilisateur", "nom", "telephone", "statut", "numero_permis", "date_expiration_permis",
+            ], (
+                (pk, f"Chauffeur {i}", f"06{i:08d}", Chauffeur.Statut.DISPONIBLE.value, f"P{i:08d}",
+                 tirer(permis_expires if alea() < repartition.permis_expires else permis_valides))
+                for i, pk in enumerate(comptes)
+            ), lot)
+            chauffeurs = _inseres(Chauffeur, depart["chauffeurs"])
+
+            statuts = hasard.choices(list(Vehicule.Statut.values), weights=repartition.statuts, k=vehicules)
+            # dates de création étalées : la liste paginée par date a un ordre réaliste
+            lignes["vehicules"] = inserer(Vehicule, [
+                "immatriculation", "marque", "modele", "annee", "kilometrage", "statut", "date_creation", "chauffeur",
+            ], (
+                (f"SY-{i:07d}", *tirer(MARQUES), entier(2010, 2025), entier(0, 300000),
+                 statuts[i], ops.adapt_datetimefield_value(maintenant - timedelta(minutes=vehicules - i)),
+                 chauffeurs[i % len(chauffeurs)])
+                for i in range(vehicules)
+            ), lot)
+            pks = _inseres(Vehicule, depart["vehicules"])
+
+            expires, bientot, valides = _dates(jour, -365, -1), _dates(jour, 0, 30), _dates(jour, 31, 730)
+            seuil_bientot = repartition.documents_expires + repartition.documents_bientot
+
+            def date_document():
+                tirage = alea()
+                if tirage < repartition.documents_expires:
+                    return tirer(expires)
+                return tirer(bientot if tirage < seuil_bientot else valides)
+
+            types_documents = list(DocumentVehicule.TypeDocument.values)
+            lignes["documents"] = inserer(DocumentVehicule, ["vehicule", "type_document", "date_expiration"], (
+                (pk, types_documents[j % len(types_documents)], date_document())
+                for pk in pks for j in range(repartition.documents)
+            ), lot)
+
+            passees, retard, a_venir = _dates(jour, -730, -1), _dates(jour, -180, -1), _dates(jour, 0, 180)
+            couts = [ops.adapt_decimalfield_value(Decimal(cout), 10, 2) for cout in range(50, 2001, 10)]
+            seuil_retard = repartition.entretiens_effectues + repartition.entretiens_retard
+
+            def entretien():
+                # (date_prevue, cout, effectue)
+                tirage = alea()
+                if tirage < repartition.entretiens_effectues:
+                    return tirer(passees), tirer(couts), True
+                return tirer(retard if tirage < seuil_retard else a_venir), tirer(couts), False
+
+            types_entretiens = [choix for choix, _ in Entretien.TYPE_CHOICES]
+            lignes["entretiens"] = inserer(Entretien, [
+                "vehicule", "type_entretien", "date_prevue", "cout", "effectue",
+            ], (
+                (pk, tirer(types_entretiens), *entretien())
+                for pk in pks for _ in range(repartition.entretiens)
+            ), lot)
+
+        durees["insertion"] = time.perf_counter() - debut
+    finally:
+        if differer_index:
+            debut = time.perf_counter()
+            with connection.schema_editor() as editor:
+                for model, index in retires:
+                    editor.add_index(model, index)
+            recherche.reprendre_indexation(triggers)
+            durees["index"] = time.perf_counter() - debut
+
+    if echeances_et_stats:
+        debut = time.perf_counter()
+        echeances.reconstruire(jour)
+        reconstruire_fleet_stats(jour)
+        durees["echeances_et_stats"] = time.perf_counter() - debut
+
+    return lignes, durees
+
+
+def construire_flotte(vehicules, graine=0):
+    """
+    Flotte synthétique de bench_flotte, avec un manager (mot de passe
+    MOT_DE_PASSE), renvoyé.
+    """
+    generer_flotte(vehicules, graine=graine)
+    return User.objects.create_user(
+        username="bench-manager", telephone="0100000000", password=MOT_DE_PASSE, role="manager"
+    )
@@ -1,3 +1,1491 @@
-from django.test import TestCase
+import csv
+import itertools
+import json
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, check_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    User, Vehicule, DocumentVehicule, Entretien, Chauffeur, FleetStats, EcheanceEvent, PasswordResetOTP,
+)
+from .filtres import filtrer_vehicules, TRIS_VEHICULES, TRI_VEHICULES_DEFAUT
+from .forms import EntretienForm
+from .middleware import ProfilageMiddleware
+from .stats import COMPTEURS, reconstruire_fleet_stats, statistiques_flotte
+from .synthese import construire_flotte, generer_flotte, Repartition
+from .urls import urlpatterns
+from . import affectation, metriques, otp, recherche, views
+
+
+def creer_flotte(n=5, comptes=False):
+    """
+    Petite flotte de test : n véhicules avec documents et entretiens,
+    n chauffeurs dont un avec un permis expiré (et leur compte si `comptes`).
+    """
+    today = timezone.now().date()
+    # ligne FleetStats du jour, comme après le job de nuit : les écritures
+    # suivantes y sont appliquées en deltas
+    if not FleetStats.objects.filter(jour=today).exists():
+        reconstruire_fleet_stats(today)
+    for i in range(n):
+        utilisateur = None
+        if comptes:
+            utilisateur = User.objects.create(
+                username=f"chauffeur{i}", telephone=f"07000000{i:02d}",
+                first_name="Chauffeur", last_name=str(i), role="driver",
+            )
+        chauffeur = Chauffeur.objects.create(
+            utilisateur=utilisateur,
+            nom=f"Chauffeur {i}",
+            telephone=f"06000000{i:02d}",
+            numero_permis=f"P{i:05d}",
+            date_expiration_permis=today + timedelta(days=-10 if i == 0 else 365),
+        )
+        vehicule = Vehicule.objects.create(
+            immatriculation=f"AB-{i:03d}-CD",
+            marque="Renault",
+            modele="Clio",
+            annee=2020,
+            kilometrage=1000 * i,
+            statut=Vehicule.Statut.MISSION if i % 2 else Vehicule.Statut.DISPONIBLE,
+            chauffeur=chauffeur,
+        )
+        DocumentVehicule.objects.create(
+            vehicule=vehicule,
+            type_document=DocumentVehicule.TypeDocument.ASSURANCE,
+            date_expiration=today + timedelta(days=-5 if i % 2 else 10),
+        )
+        Entretien.objects.create(
+            vehicule=vehicule,
+            type_entretien="vidange",
+            date_prevue=today + timedelta(days=-3 if i % 2 else 3),
+            cout=100,
+        )
+
+
+class DashboardTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(self.manager)
+
+    def test_kpis(self):
+        creer_flotte(5)
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(response.status_code, 200)
+        kpis, alertes = response.context["kpis"], response.context["alertes"]
+        self.assertEqual(kpis["total_vehicules"], 5)
+        self.assertEqual(kpis["vehicules_disponibles"], 3)
+        self.assertEqual(kpis["vehicules_mission"], 2)
+        self.assertEqual(kpis["total_chauffeurs"], 5)
+        self.assertEqual(kpis["documents_expires_count"], 2)
+        self.assertEqual(kpis["documents_bientot_count"], 3)
+        self.assertEqual(len(alertes["entretiens_retard"]), 2)
+        self.assertEqual(len(alertes["chauffeurs_permis_expire"]), 1)
+
+    def test_panneaux_alertes_bornes(self):
+        creer_flotte(6)
+        with mock.patch("web.stats.ALERTES_PAR_PANNEAU", 2):
+            response = self.client.get(reverse("dashboard"))
+
+        alertes = response.context["alertes"]
+        self.assertEqual(len(alertes["documents_bientot"]), 2)
+        self.assertEqual(len(alertes["chauffeurs_permis_expire"]), 1)
+        # total lu dans FleetStats, pas compté sur la liste
+        self.assertContains(response, "2 affiché(s) sur 3 document(s) bientôt expiré(s)")
+        self.assertNotContains(response, "permis expiré(s)")
+
+    def test_budget_requetes_independant_de_la_taille(self):
+        # utilisateur (session en cache) + FleetStats + 5 listes d'alertes + 2 activités
+        creer_flotte(3)
+        with self.assertNumQueries(9):
+            self.client.get(reverse("dashboard"))
+
+        Vehicule.objects.all().delete()
+        Chauffeur.objects.all().delete()
+        creer_flotte(20)
+        # utilisateur désormais en cache
+        with self.assertNumQueries(8):
+            self.client.get(reverse("dashboard"))
+
+    def test_fragments_en_cache(self):
+        creer_flotte(3)
+        self.client.get(reverse("dashboard"))
+
+        # session, utilisateur, KPI, alertes et activité viennent du cache
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "AB-002-CD")
+
+        # toute écriture sur la flotte change la génération
+        Vehicule.objects.filter(immatriculation="AB-002-CD").update(immatriculation="ZZ-002-ZZ")
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "ZZ-002-ZZ")
+        self.assertNotContains(response, "AB-002-CD")
+
+    def test_fragments_changent_de_jour(self):
+        creer_flotte(3)
+        self.client.get(reverse("dashboard"))
+
+        demain = timezone.now() + timedelta(days=1)
+        # avant le job de nuit : KPI de la veille, rien n'est reconstruit dans la requête
+        with mock.patch("django.utils.timezone.now", return_value=demain):
+            with CaptureQueriesContext(connection) as requetes, self.assertNoLogs("web.requetes", "WARNING"):
+                response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["kpis"]["total_vehicules"], 3)
+        self.assertFalse(FleetStats.objects.filter(jour=demain.date()).exists())
+
+        # alertes recalculées pour le nouveau jour, activité récente en cache
+        sql = " ".join(requete["sql"] for requete in requetes)
+        self.assertIn("web_echeanceevent", sql)
+        self.assertNotIn('ORDER BY "web_entretien"."id" DESC', sql)
+
+        # le job de nuit crée la ligne du jour et invalide les fragments KPI
+        with mock.patch("django.utils.timezone.now", return_value=demain):
+            call_command("avancer_echeances", stdout=StringIO())
+            self.assertTrue(FleetStats.objects.filter(jour=demain.date()).exists())
+            with CaptureQueriesContext(connection) as requetes, self.assertNoLogs("web.requetes", "WARNING"):
+                self.client.get(reverse("dashboard"))
+        self.assertIn("web_fleetstats", " ".join(requete["sql"] for requete in requetes))
+
+
+    def test_bascule_de_jour(self):
+        # KPI de la veille jusqu'au job de nuit : signalés comme tels, et
+        # sans totaux dans les panneaux d'alertes (calculés au jour courant)
+        creer_flotte(3)
+        demain = timezone.now() + timedelta(days=1)
+        with mock.patch("django.utils.timezone.now", return_value=demain), \
+                mock.patch("web.stats.ALERTES_PAR_PANNEAU", 1):
+            # écriture avant le job : pas de reconstruction dans la requête
+            with CaptureQueriesContext(connection) as requetes:
+                Vehicule.objects.create(
+                    immatriculation="NU-001-IT", marque="Fiat", modele="500", annee=2020, kilometrage=0
+                )
+            self.assertNotIn("COUNT", " ".join(requete["sql"] for requete in requetes))
+            self.assertFalse(FleetStats.objects.filter(jour=demain.date()).exists())
+
+            response = self.client.get(reverse("dashboard"))
+            kpis = response.context["kpis"]
+            self.assertEqual((kpis["jour"], kpis["a_jour"]), (timezone.now().date() - timedelta(days=1), False))
+            self.assertEqual(kpis["total_vehicules"], 3)
+            self.assertContains(response, "Compteurs au")
+            self.assertNotContains(response, "affiché(s) sur")
+
+            # le job recalcule tout, écriture de la journée comprise
+            call_command("avancer_echeances", stdout=StringIO())
+            response = self.client.get(reverse("dashboard"))
+            kpis = response.context["kpis"]
+            self.assertEqual((kpis["jour"], kpis["a_jour"]), (demain.date(), True))
+            self.assertEqual(kpis["total_vehicules"], 4)
+            self.assertNotContains(response, "Compteurs au")
+            self.assertContains(response, "1 affiché(s) sur 2 document(s) bientôt expiré(s)")
+
+
+class FleetStatsTests(TestCase):
+
+    def assertStatsCoherentes(self):
+        today = timezone.now().date()
+        stats = FleetStats.objects.get(jour=today)
+        attendu = statistiques_flotte(today)
+        self.assertEqual({nom: getattr(stats, nom) for nom in COMPTEURS}, attendu)
+
+    def test_deltas_save_delete(self):
+        creer_flotte(4)
+        self.assertStatsCoherentes()
+
+        vehicule = Vehicule.objects.first()
+        vehicule.statut = Vehicule.Statut.MAINTENANCE
+        vehicule.save()
+        Entretien.objects.first().delete()
+        Vehicule.objects.last().delete()
+        self.assertStatsCoherentes()
+
+    def test_deltas_ecritures_en_masse(self):
+        creer_flotte(4)
+        Vehicule.objects.filter(statut=Vehicule.Statut.DISPONIBLE).update(statut=Vehicule.Statut.MISSION)
+        Entretien.objects.update(effectue=True)
+        DocumentVehicule.objects.bulk_create([
+            DocumentVehicule(
+                vehicule=Vehicule.objects.first(),
+                type_document=DocumentVehicule.TypeDocument.VISITE,
+                date_expiration=timezone.now().date() - timedelta(days=1),
+            )
+        ])
+        self.assertStatsCoherentes()
+
+    def test_rebuild_fleet_stats(self):
+        creer_flotte(2)
+        FleetStats.objects.update(total_vehicules=999)
+        call_command("rebuild_fleet_stats", stdout=StringIO())
+        self.assertStatsCoherentes()
+
+
+class VehiculeListTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(self.manager)
+
+    def test_pagination_keyset(self):
+        creer_flotte(7)
+        url = reverse("vehicule_list")
+
+        with mock.patch("web.views.VEHICULES_PAR_PAGE", 3):
+            vus = []
+            response = self.client.get(url, {"tri": "immatriculation"})
+            while True:
+                page = response.context["page"]
+                vus += [v.immatriculation for v in page["objets"]]
+                if not page["suivant"]:
+                    break
+                response = self.client.get(url, {"tri": "immatriculation", "apres": page["suivant"]})
+
+            precedent = self.client.get(url, {"tri": "immatriculation", "avant": page["precedent"]})
+
+        self.assertEqual(vus, sorted(f"AB-{i:03d}-CD" for i in range(7)))
+        self.assertEqual(
+            [v.immatriculation for v in precedent.context["page"]["objets"]],
+            ["AB-003-CD", "AB-004-CD", "AB-005-CD"],
+        )
+
+    def test_filtres(self):
+        creer_flotte(4)
+        Vehicule.objects.filter(immatriculation="AB-000-CD").update(chauffeur=None)
+
+        response = self.client.get(reverse("vehicule_list"), {"statut": "MISSION"})
+        self.assertEqual(len(response.context["vehicules"]), 2)
+
+        response = self.client.get(reverse("vehicule_list"), {"chauffeur": "non"})
+        self.assertEqual([v.immatriculation for v in response.context["vehicules"]], ["AB-000-CD"])
+
+    def test_tris_et_filtre_marque_indexes(self):
+        creer_flotte(4)
+        for tri, ordre in TRIS_VEHICULES.items():
+            plan = Vehicule.objects.order_by(*ordre)[:51].explain()
+            self.assertIn("USING INDEX", plan, tri)
+            self.assertNotIn("TEMP B-TREE", plan, tri)
+
+        vehicules, _ = filtrer_vehicules(Vehicule.objects.all(), {"marque": "RENAULT"})
+        plan = vehicules.order_by(*TRIS_VEHICULES[TRI_VEHICULES_DEFAUT])[:51].explain()
+        self.assertIn("vehicule_marque_ci_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertEqual(vehicules.count(), 4)
+
+    def test_flotte_vide(self):
+        response = self.client.get(reverse("vehicule_list"))
+        self.assertContains(response, "Aucun véhicule enregistré")
+        # actions de l'en-tête seulement, l'état vide ne propose que l'ajout
+        self.assertContains(response, reverse("export_csv", args=["vehicules"]), count=1)
+        self.assertContains(response, reverse("affectation_automatique"), count=1)
+        self.assertContains(response, reverse("vehicule_create"), count=2)
+
+    def test_curseur_invalide(self):
+        response = self.client.get(reverse("vehicule_list"), {"apres": "n'importe quoi"})
+        self.assertRedirects(response, reverse("vehicule_list"))
+
+    def test_requetes_constantes(self):
+        creer_flotte(10)
+        # utilisateur (mis en cache ensuite) + une page
+        with self.assertNumQueries(2):
+            self.client.get(reverse("vehicule_list"))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class BudgetRequetesTests(TestCase):
+    """
+    Parcourt toutes les routes de web/urls.py sur une flotte peuplée :
+    BudgetRequetesMiddleware lève BudgetDepasse si une vue dépasse le
+    budget déclaré avec @budget_requetes.
+    """
+
+    def setUp(self):
+        creer_flotte(25, comptes=True)
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.driver = Chauffeur.objects.exclude(utilisateur=None).first().utilisateur
+
+    def test_toutes_les_routes(self):
+        today = timezone.now().date()
+        v1, v2 = Vehicule.objects.all()[:2]
+        doc = DocumentVehicule.objects.first()
+        entretien = Entretien.objects.first()
+        chauffeur = Chauffeur.objects.last()
+        vehicule = {
+            "immatriculation": "ZZ-999-ZZ", "marque": "Peugeot", "modele": "208",
+            "annee": 2022, "kilometrage": 10, "statut": "DISPONIBLE", "chauffeur": "",
+        }
+        document = {"vehicule": v1.pk, "type_document": "VISITE", "date_expiration": today}
+        maintenance = {
+            "vehicule": v1.pk, "type_entretien": "revision", "date_prevue": today, "cout": "50",
+        }
+
+        # (nom, args, méthode, données, utilisateur)
+        scenarios = [
+            ("bienvenue", [], "get", None, None),
+            ("register", [], "get", None, None),
+            ("register", [], "post", {
+                "first_name": "Jean", "last_name": "Dupont", "telephone": "0699999999",
+                "role": "driver", "password": "secret", "confirm_password": "secret",
+                "numero_permis": "PX1", "date_expiration_permis": today,
+            }, None),
+            ("login", [], "post", {"telephone": "0100000000", "password": "secret"}, None),
+            ("logout", [], "get", None, self.manager),
+            ("password_reset", [], "post", {"telephone": "0100000000"}, None),
+            ("verify_otp", [], "post", {"code": "000000"}, None),
+            ("set_new_password", [], "get", None, None),
+            ("dashboard", [], "get", None, self.manager),
+            ("dashboard", [], "get", None, self.driver),
+            ("vehicule_list", [], "get", None, self.manager),
+            ("vehicule_create", [], "get", None, self.manager),
+            ("vehicule_create", [], "post", vehicule, self.manager),
+            ("vehicule_update", [v1.pk], "get", None, self.manager),
+            ("vehicule_update", [v1.pk], "post", {**vehicule, "immatriculation": "ZZ-111-ZZ"}, self.manager),
+            ("vehicule_assign", [v1.pk], "get", None, self.manager),
+            ("vehicule_assign", [v1.pk], "post", {"chauffeur": chauffeur.pk}, self.manager),
+            ("document_create", [], "get", None, self.manager),
+            ("document_create", [], "post", document, self.manager),
+            ("document_update", [doc.pk], "post", document, self.manager),
+            ("document_list", [v1.pk], "get", None, self.manager),
+            ("entretien_create", [], "get", None, self.manager),
+            ("entretien_create", [], "post", maintenance, self.manager),
+            ("entretien_update", [entretien.pk], "post", maintenance, self.manager),
+            ("entretien_list", [v1.pk], "get", None, self.manager),
+            ("chauffeur_list", [], "get", None, self.manager),
+            ("calendrier", [], "get", None, self.manager),
+            ("import_flotte", [], "get", None, self.manager),
+            ("export_csv", ["entretiens"], "get", None, self.manager),
+            ("dashboard_async", [], "get", None, self.manager),
+            ("dashboard_async", [], "get", None, self.driver),
+            ("document_list_async", [v1.pk], "get", None, self.manager),
+            ("entretien_list_async", [v1.pk], "get", None, self.manager),
+            ("api_liste", ["vehicules"], "get", {"include": "chauffeur,documents,entretiens"}, self.manager),
+            ("api_detail", ["vehicules", v1.pk], "get", {"include": "chauffeur"}, self.manager),
+            ("api_detail", ["vehicules", v1.pk], "get", None, self.driver),
+            ("metriques", [], "get", None, None),
+            ("recherche", [], "get", {"q": "AB 00"}, self.manager),
+            ("autocompletion", ["chauffeurs"], "get", {"q": "chauffeur"}, self.manager),
+            ("affectation_automatique", [], "get", None, self.manager),
+            ("chauffeur_update", [chauffeur.pk], "get", None, self.manager),
+            ("chauffeur_update", [chauffeur.pk], "post", {
+                "nom": "X", "telephone": "1", "numero_permis": "PY1",
+                "date_expiration_permis": today, "statut": "MISSION",
+            }, self.manager),
+            ("document_delete", [doc.pk], "post", None, self.manager),
+            ("entretien_delete", [entretien.pk], "post", None, self.manager),
+            ("vehicule_delete", [v2.pk], "post", None, self.manager),
+            ("chauffeur_delete", [chauffeur.pk], "post", None, self.manager),
+        ]
+
+        for nom, args, methode, donnees, utilisateur in scenarios:
+            with self.subTest(route=nom, methode=methode):
+                self.client.logout()
+                if utilisateur:
+                    self.client.force_login(utilisateur)
+                response = getattr(self.client, methode)(reverse(nom, args=args), donnees)
+                self.assertLess(response.status_code, 400)
+
+        self.assertEqual(
+            {nom for nom, *_ in scenarios},
+            {pattern.name for pattern in urlpatterns},
+        )
+
+    def test_budget_depasse(self):
+        from .middleware import BudgetDepasse
+
+        self.client.force_login(self.manager)
+        with mock.patch.object(views.dashboard, "budget_requetes", 1):
+            with self.assertRaises(BudgetDepasse):
+                self.client.get(reverse("dashboard"))
+
+
+class EcheanceQuerySetTests(TestCase):
+
+    def test_avec_etat_et_par_etat(self):
+        creer_flotte(4)
+        today = timezone.now().date()
+        vehicule = Vehicule.objects.first()
+        DocumentVehicule.objects.create(
+            vehicule=vehicule, type_document="VISITE", date_expiration=today + timedelta(days=90)
+        )
+
+        etats = {
+            (doc.date_expiration - today).days: (doc.etat, doc.jours_restants)
+            for doc in DocumentVehicule.objects.avec_etat(today)
+        }
+        self.assertEqual(etats, {-5: ("EXPIRE", -5), 10: ("BIENTOT", 10), 90: ("VALIDE", 90)})
+        self.assertEqual(
+            DocumentVehicule.objects.par_etat(today),
+            {"EXPIRE": 2, "BIENTOT": 2, "VALIDE": 1},
+        )
+
+    def test_entretiens(self):
+        creer_flotte(4)
+        today = timezone.now().date()
+        en_retard = Entretien.objects.filter(date_prevue__lt=today).first()
+        Entretien.objects.filter(pk=en_retard.pk).update(effectue=True)
+
+        self.assertEqual(
+            Entretien.objects.par_etat(today),
+            {"EFFECTUE": 1, "RETARD": 1, "BIENTOT": 2},
+        )
+        self.assertEqual(Entretien.objects.echues(today).count(), 1)
+
+
+class EcheanceEventTests(TestCase):
+
+    def test_synchronisation(self):
+        creer_flotte(3)
+        today = timezone.now().date()
+        Type = EcheanceEvent.Type
+
+        self.assertEqual(EcheanceEvent.objects.filter(type_echeance=Type.DOCUMENT).count(), 3)
+        self.assertEqual(EcheanceEvent.objects.filter(type_echeance=Type.PERMIS).count(), 3)
+
+        # un entretien effectué sort de la chronologie (y compris en masse)
+        Entretien.objects.filter(date_prevue__lt=today).update(effectue=True)
+        self.assertEqual(EcheanceEvent.objects.filter(type_echeance=Type.ENTRETIEN).count(), 2)
+
+        doc = DocumentVehicule.objects.first()
+        doc.date_expiration = today - timedelta(days=1)
+        doc.save()
+        self.assertEqual(doc.echeance.etat, "EXPIRE")
+
+        vehicule = doc.vehicule
+        vehicule.immatriculation = "XX-000-XX"
+        vehicule.save()
+        self.assertEqual(EcheanceEvent.objects.get(document=doc).sujet, "XX-000-XX")
+
+        doc_id = doc.pk
+        doc.delete()
+        self.assertFalse(EcheanceEvent.objects.filter(document_id=doc_id).exists())
+
+    def test_update_hors_champs_suivis(self):
+        # ni pk figées, ni relecture, ni événements recalculés : le seul UPDATE
+        creer_flotte(3)
+        evenements = sorted(EcheanceEvent.objects.values_list("pk", "etat"))
+        with CaptureQueriesContext(connection) as requetes:
+            Entretien.objects.update(cout=99)
+        self.assertEqual(len(requetes), 1)
+        self.assertEqual(sorted(EcheanceEvent.objects.values_list("pk", "etat")), evenements)
+
+        with CaptureQueriesContext(connection) as requetes:
+            Entretien.objects.update(effectue=True)
+        self.assertGreater(len(requetes), 1)
+        self.assertFalse(EcheanceEvent.objects.filter(type_echeance="ENTRETIEN").exists())
+
+    def test_avancer_echeances(self):
+        creer_flotte(2)
+        EcheanceEvent.objects.update(etat="VALIDE")
+        call_command("avancer_echeances", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(EcheanceEvent.objects.filter(type_echeance="DOCUMENT").values_list("etat", flat=True)),
+            ["BIENTOT", "EXPIRE"],
+        )
+        self.assertEqual(
+            EcheanceEvent.objects.get(chauffeur__numero_permis="P00000").etat, "EXPIRE"
+        )
+
+    def test_reconstruire_comme_les_signaux(self):
+        # INSERT ... SELECT : mêmes événements que _evenement, ligne à ligne
+        creer_flotte(4)
+        Entretien.objects.filter(pk=Entretien.objects.first().pk).update(effectue=True)
+        colonnes = [
+            "type_echeance", "date_echeance", "etat", "sujet", "libelle",
+            "vehicule", "document", "chauffeur", "entretien",
+        ]
+        avant = sorted(EcheanceEvent.objects.values_list(*colonnes))
+
+        call_command("avancer_echeances", "--reconstruire", stdout=StringIO())
+        self.assertEqual(sorted(EcheanceEvent.objects.values_list(*colonnes)), avant)
+
+    def test_reconstruire_atomique(self):
+        from . import echeances
+
+        creer_flotte(3)
+        avant = EcheanceEvent.objects.count()
+        selection = echeances._selection
+        appels = iter([selection, mock.Mock(side_effect=RuntimeError)])
+
+        # échec après la suppression et le premier INSERT ... SELECT
+        with mock.patch("web.echeances._selection", side_effect=lambda *args: next(appels)(*args)):
+            with self.assertRaises(RuntimeError):
+                echeances.reconstruire(timezone.now().date())
+        self.assertEqual(EcheanceEvent.objects.count(), avant)
+
+
+class ImportFlotteTests(TestCase):
+
+    def test_import_csv_avec_doublons(self):
+        from .importation import importer
+
+        reconstruire_fleet_stats(timezone.now().date())
+        Vehicule.objects.create(
+            immatriculation="EX-001-ST", marque="Renault", modele="Clio", annee=2020, kilometrage=0
+        )
+        flux = StringIO(
+            "immatriculation,marque,modele,annee,kilometrage\n"
+            "AA-001-AA,Peugeot,208,2021,100\n"
+            "EX-001-ST,Renault,Clio,2020,0\n"
+            "AA-001-AA,Peugeot,208,2021,100\n"
+            "AA-002-AA,Peugeot,308,pas une année,100\n"
+            "AA-003-AA,Toyota,Yaris,2019,5000\n"
+        )
+        rapport = importer("vehicules", flux, taille_lot=2)
+
+        self.assertEqual((rapport.lus, rapport.crees, rapport.rejetes), (5, 2, 3))
+        self.assertEqual([ligne for ligne, _ in rapport.erreurs], [3, 4, 5])
+        self.assertEqual(Vehicule.objects.get(immatriculation="AA-003-AA").statut, "DISPONIBLE")
+        self.assertEqual(FleetStats.objects.get(jour=timezone.now().date()).total_vehicules, 3)
+
+    def test_import_lot_en_conflit(self):
+        from .importation import importer, ImportFormMixin
+
+        def concurrent():
+            # l'immatriculation est créée ailleurs après le contrôle des doublons du lot
+            if not Vehicule.objects.filter(immatriculation="AA-001-AA").exists():
+                Vehicule.objects.create(
+                    immatriculation="AA-001-AA", marque="Fiat", modele="500", annee=2020, kilometrage=0
+                )
+
+        flux = StringIO(
+            "immatriculation,marque,modele,annee,kilometrage\n"
+            "AA-001-AA,Peugeot,208,2021,100\n"
+            "AA-002-AA,Peugeot,308,2021,100\n"
+            "AA-003-AA,Toyota,Yaris,2019,5000\n"
+        )
+        with mock.patch.object(ImportFormMixin, "validate_unique", side_effect=concurrent):
+            rapport = importer("vehicules", flux, taille_lot=2)
+
+        self.assertEqual((rapport.lus, rapport.crees, rapport.rejetes), (3, 1, 2))
+        self.assertEqual([ligne for ligne, _ in rapport.erreurs], [2, 3])
+        self.assertIn("lot rejeté", rapport.erreurs[0][1])
+        self.assertEqual(Vehicule.objects.get(immatriculation="AA-001-AA").marque, "Fiat")
+        self.assertTrue(Vehicule.objects.filter(immatriculation="AA-003-AA").exists())
+
+    def test_import_jsonl_documents(self):
+        from .importation import importer
+
+        creer_flotte(1)
+        flux = StringIO(
+            '{"immatriculation": "AB-000-CD", "type_document": "VISITE", "date_expiration": "2030-01-01"}\n'
+            '{"immatriculation": "ZZ-404-ZZ", "type_document": "VISITE", "date_expiration": "2030-01-01"}\n'
+            'pas du json\n'
+        )
+        rapport = importer("documents", flux, format="jsonl")
+
+        self.assertEqual((rapport.crees, rapport.rejetes), (1, 2))
+        self.assertEqual(EcheanceEvent.objects.filter(type_echeance="DOCUMENT").count(), 2)
+
+    def test_import_jsonl_valeurs_non_textuelles(self):
+        from .importation import importer
+
+        flux = StringIO(
+            '{"nom": "Num", "telephone": 600000001, "numero_permis": 12345, "date_expiration_permis": "2030-01-01"}\n'
+            '{"nom": "Nul", "telephone": "0600000002", "numero_permis": null, "date_expiration_permis": "2030-01-01"}\n'
+        )
+        rapport = importer("chauffeurs", flux, format="jsonl")
+        self.assertEqual((rapport.crees, rapport.rejetes), (1, 1))
+        self.assertEqual(Chauffeur.objects.get(nom="Num").numero_permis, "12345")
+        self.assertEqual(rapport.erreurs[0][0], 2)
+
+        flux = StringIO(
+            '{"immatriculation": null, "marque": "Dacia", "modele": "Logan", "annee": 2020, "kilometrage": 0}\n'
+            '{"immatriculation": "NU-001-LL", "marque": "Dacia", "modele": "Logan", "annee": 2020, '
+            '"kilometrage": 0, "numero_permis": 12345}\n'
+        )
+        rapport = importer("vehicules", flux, format="jsonl")
+        self.assertEqual((rapport.crees, rapport.rejetes), (1, 1))
+        self.assertEqual(Vehicule.objects.get(immatriculation="NU-001-LL").chauffeur.nom, "Num")
+
+
+class ExportCsvTests(TestCase):
+
+    def setUp(self):
+        creer_flotte(5)
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(self.manager)
+
+    def lire(self, response):
+        return b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+
+    def test_export_vehicules_filtre(self):
+        response = self.client.get(reverse("export_csv", args=["vehicules"]), {"statut": "MISSION"})
+
+        self.assertTrue(response.streaming)
+        lignes = self.lire(response)
+        self.assertTrue(lignes[0].startswith("immatriculation,marque,modele"))
+        self.assertEqual(len(lignes), 1 + Vehicule.objects.filter(statut="MISSION").count())
+
+    def test_export_entretiens_sans_instancier_de_modeles(self):
+        vehicule = Vehicule.objects.first()
+
+        with mock.patch.object(Entretien, "from_db") as from_db:
+            response = self.client.get(reverse("export_csv", args=["entretiens"]), {"vehicule": vehicule.pk})
+            lignes = self.lire(response)
+
+        from_db.assert_not_called()
+        self.assertEqual(len(lignes), 1 + vehicule.entretiens.count())
+        self.assertIn(vehicule.immatriculation, lignes[1])
+
+    def test_export_reimportable(self):
+        from .importation import importer
+
+        lignes = self.lire(self.client.get(reverse("export_csv", args=["vehicules"])))
+        Vehicule.objects.all().delete()
+        rapport = importer("vehicules", StringIO("\n".join(lignes)))
+
+        self.assertEqual((rapport.crees, rapport.rejetes), (5, 0))
+
+    def test_export_formules_neutralisees(self):
+        from .importation import importer
+
+        Vehicule.objects.filter(immatriculation="AB-000-CD").update(marque='=HYPERLINK("http://x")', modele="@SUM")
+        lignes = self.lire(self.client.get(reverse("export_csv", args=["vehicules"])))
+        cellules = next(ligne for ligne in csv.reader(lignes) if ligne[0] == "AB-000-CD")
+        self.assertEqual(cellules[1:4], ['\'=HYPERLINK("http://x")', "'@SUM", "2020"])
+
+        # l'apostrophe est retirée à la ré-importation
+        Vehicule.objects.all().delete()
+        importer("vehicules", StringIO("\n".join(lignes)))
+        vehicule = Vehicule.objects.get(immatriculation="AB-000-CD")
+        self.assertEqual((vehicule.marque, vehicule.modele), ('=HYPERLINK("http://x")', "@SUM"))
+
+    def test_export_inconnu(self):
+        response = self.client.get(reverse("export_csv", args=["inconnu"]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        creer_flotte(5)
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(self.manager)
+
+    def test_liste_champs_inclusions_et_curseur(self):
+        url = reverse("api_liste", args=["vehicules"])
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"fields": "immatriculation", "include": "documents", "taille": 2})
+        donnees = response.json()
+
+        self.assertEqual(list(donnees["resultats"][0]), ["id", "immatriculation", "documents"])
+        self.assertEqual(len(donnees["resultats"]), 2)
+        self.assertIsNone(donnees["precedent"])
+
+        suite = self.client.get(url, {"fields": "immatriculation", "taille": 2, "apres": donnees["suivant"]}).json()
+        self.assertEqual([v["immatriculation"] for v in suite["resultats"]], ["AB-002-CD", "AB-003-CD"])
+
+    def test_parametres_invalides(self):
+        url = reverse("api_liste", args=["vehicules"])
+        self.assertEqual(self.client.get(url, {"fields": "prix"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"apres": "pas-un-curseur"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("api_liste", args=["inconnu"])).status_code, 404)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_etag_et_304(self):
+        url = reverse("api_liste", args=["chauffeurs"])
+        etag = self.client.get(url)["ETag"]
+
+        # session et utilisateur en cache : aucune requête
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Chauffeur.objects.filter(numero_permis="P00001").update(nom="Nouveau")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_ecriture(self):
+        vehicule = Vehicule.objects.get(immatriculation="AB-000-CD")
+        url = reverse("api_liste", args=["entretiens"])
+
+        response = self.client.post(url, {
+            "vehicule": vehicule.pk, "type_entretien": "vidange", "date_prevue": "2030-01-01", "cout": "80",
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        detail = response["Location"]
+
+        response = self.client.patch(detail, {"effectue": True}, content_type="application/json")
+        self.assertEqual(response.json()["effectue"], True)
+        self.assertEqual(response.json()["type_entretien"], "vidange")
+
+        response = self.client.patch(detail, {"cout": "gratuit"}, content_type="application/json")
+        self.assertIn("cout", response.json()["erreurs"])
+
+        self.assertEqual(self.client.delete(detail).status_code, 204)
+        self.assertEqual(self.client.get(detail).status_code, 404)
+
+    def test_ecriture_reservee_aux_managers(self):
+        chauffeur = User.objects.create_user(
+            username="driver", telephone="0200000000", password="secret", role="driver"
+        )
+        self.client.force_login(chauffeur)
+        vehicule = Vehicule.objects.first()
+
+        url = reverse("api_detail", args=["vehicules", vehicule.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 403)
+
+    def test_lecture_reservee_aux_managers(self):
+        # comme la liste HTML des chauffeurs : téléphones et permis réservés
+        chauffeur = User.objects.create_user(
+            username="driver", telephone="0200000000", password="secret", role="driver"
+        )
+        self.client.force_login(chauffeur)
+        vehicule = Vehicule.objects.first()
+
+        for ressource in ("chauffeurs", "documents", "entretiens"):
+            response = self.client.get(reverse("api_liste", args=[ressource]))
+            self.assertEqual(response.status_code, 403)
+            self.assertNotIn("numero_permis", response.content.decode())
+        detail = reverse("api_detail", args=["chauffeurs", vehicule.chauffeur_id])
+        self.assertEqual(self.client.get(detail).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse("api_liste", args=["vehicules"]), {"include": "chauffeur"}).status_code, 403
+        )
+        self.assertEqual(self.client.get(reverse("api_liste", args=["vehicules"])).status_code, 200)
+
+
+class VuesAsynchronesTests(TestCase):
+
+    def setUp(self):
+        creer_flotte(5, comptes=True)
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.vehicule = Vehicule.objects.get(immatriculation="AB-001-CD")
+
+    def assertMemePage(self, nom, nom_async, args=()):
+        cache.clear()
+        synchrone = self.client.get(reverse(nom, args=args))
+        cache.clear()
+        asynchrone = self.client.get(reverse(nom_async, args=args))
+        self.assertEqual(asynchrone.status_code, 200)
+        self.assertEqual(asynchrone.content, synchrone.content)
+
+    def test_memes_pages_que_les_vues_synchrones(self):
+        self.client.force_login(self.manager)
+        self.assertMemePage("dashboard", "dashboard_async")
+        self.assertMemePage("document_list", "document_list_async", [self.vehicule.pk])
+        self.assertMemePage("entretien_list", "entretien_list_async", [self.vehicule.pk])
+
+        self.client.force_login(Chauffeur.objects.exclude(utilisateur=None).first().utilisateur)
+        self.assertMemePage("dashboard", "dashboard_async")
+
+    def test_fragments_en_cache_sans_requete(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse("dashboard_async"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("dashboard_async"))
+        self.assertContains(response, "AB-004-CD")
+
+    async def test_client_asgi(self):
+        await self.async_client.aforce_login(self.manager)
+        response = await self.async_client.get(reverse("entretien_list_async", args=[self.vehicule.pk]))
+        self.assertContains(response, "AB-001-CD")
+
+    async def test_middlewares_asynchrones(self):
+        # sous ASGI, la chaîne reste asynchrone et compte toujours le SQL
+        # lancé depuis les vues async (sync_to_async)
+        self.assertTrue(iscoroutinefunction(ProfilageMiddleware(views.dashboard_async)))
+        await self.async_client.aforce_login(self.manager)
+        url = reverse("document_list_async", args=[self.vehicule.pk])
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            response = await self.async_client.get(url)
+        requetes = int(re.search(r'sql;desc="(\d+) req\."', response.headers["Server-Timing"]).group(1))
+        self.assertGreaterEqual(requetes, 2)
+
+    def test_vehicule_inconnu(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse("document_list_async", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class RepliqueTests(TransactionTestCase):
+    """
+    La réplique est ici une seconde connexion sur la base de test
+    (comme FLOTTE_REPLICA_DB avec TEST MIRROR).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # alias ajouté après la création des bases de test
+        connections.settings["replica"] = {
+            **connections["default"].settings_dict, "TEST": {"MIRROR": "default"},
+        }
+        cls.databases = {"default", "replica"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+
+    def setUp(self):
+        creer_flotte(3)
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(self.manager)
+
+    def test_listes_lues_sur_la_replique(self):
+        with CaptureQueriesContext(connections["replica"]) as replique:
+            self.client.get(reverse("vehicule_list"))
+            self.client.get(reverse("api_liste", args=["chauffeurs"]))
+
+        sql = " ".join(requete["sql"] for requete in replique)
+        self.assertIn("web_vehicule", sql)
+        self.assertIn("web_chauffeur", sql)
+        self.assertNotIn("django_session", sql)
+
+    def test_lire_ses_propres_ecritures(self):
+        vehicule = Vehicule.objects.get(immatriculation="AB-000-CD")
+        donnees = {
+            "immatriculation": "ZZ-000-ZZ", "marque": vehicule.marque, "modele": vehicule.modele,
+            "annee": vehicule.annee, "kilometrage": 1, "statut": vehicule.statut, "chauffeur": "",
+        }
+
+        with CaptureQueriesContext(connections["replica"]) as replique:
+            response = self.client.post(reverse("vehicule_update", args=[vehicule.pk]), donnees, follow=True)
+        self.assertContains(response, "ZZ-000-ZZ")
+        self.assertEqual(len(replique), 0)
+
+        # une fois le délai de réplication passé, retour sur la réplique
+        plus_tard = time.time() + settings.REPLICA_DELAI_LECTURE + 1
+        with mock.patch("web.routers.time.time", return_value=plus_tard):
+            with CaptureQueriesContext(connections["replica"]) as replique:
+                self.client.get(reverse("vehicule_list"))
+        self.assertGreater(len(replique), 0)
+
+
+class ProfilSqliteTests(TestCase):
+
+    def test_pragmas_production(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            base = DatabaseWrapper(
+                {**connection.settings_dict, "NAME": str(Path(dossier) / "flotte.sqlite3"),
+                 "OPTIONS": settings.SQLITE_OPTIONS_PRODUCTION},
+                alias="production",
+            )
+            try:
+                with base.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], "wal")
+                    cursor.execute("PRAGMA synchronous")
+                    # NORMAL
+                    self.assertEqual(cursor.fetchone()[0], 1)
+                self.assertEqual(base.transaction_mode, "IMMEDIATE")
+            finally:
+                base.close()
+
+
+@override_settings(LIMITES_TENTATIVES={
+    "connexion": {"telephone": (3, 300), "ip": (100, 300)},
+    "otp": {"telephone": (2, 900), "ip": (100, 900)},
+    "verification_otp": {"utilisateur": (3, 900), "ip": (100, 900)},
+})
+class LimitationTests(TestCase):
+
+    # milieu d'une fenêtre de 300 s : pas de bascule pendant un test
+    INSTANT = 300 * 5_000_000 + 150
+
+    def setUp(self):
+        cache.clear()
+        horloge = mock.patch("web.limitation.time.time", return_value=self.INSTANT)
+        horloge.start()
+        self.addCleanup(horloge.stop)
+        self.user = User.objects.create_user(
+            username="u", telephone="0600000000", password="secret", role="driver"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def connexion(self, telephone, password="faux"):
+        return self.client.post(reverse("login"), {"telephone": telephone, "password": password})
+
+    def test_un_seul_hachage_par_tentative(self):
+        with mock.patch("django.contrib.auth.base_user.make_password", wraps=make_password) as hachage, \
+                mock.patch("django.contrib.auth.base_user.check_password", wraps=check_password) as verification:
+            self.connexion("0699999999")
+            self.assertEqual((hachage.call_count, verification.call_count), (1, 0))
+
+            self.connexion("0600000000")
+            self.assertEqual((hachage.call_count, verification.call_count), (1, 1))
+
+    def test_connexion_limitee_par_telephone(self):
+        for _ in range(3):
+            self.assertEqual(self.connexion("0600000000").status_code, 200)
+
+        with mock.patch.object(views, "authenticate") as authentifier, self.assertNumQueries(0):
+            response = self.connexion("0600000000", "secret")
+        self.assertEqual(response.status_code, 429)
+        authentifier.assert_not_called()
+
+        # un autre numéro depuis la même IP passe encore
+        self.assertEqual(self.connexion("0611111111").status_code, 200)
+
+    def test_fenetre_glissante(self):
+        for _ in range(3):
+            self.connexion("0600000000")
+        self.assertEqual(self.connexion("0600000000").status_code, 429)
+
+        # deux fenêtres plus tard, les tentatives sont oubliées
+        with mock.patch("web.limitation.time.time", return_value=self.INSTANT + 600):
+            response = self.connexion("0600000000", "secret")
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+
+    def test_otp_limite_avant_ecriture(self):
+        for _ in range(2):
+            self.client.post(reverse("password_reset"), {"telephone": "0600000000"})
+
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("password_reset"), {"telephone": "0600000000"})
+        self.assertEqual(response.status_code, 429)
+
+
+class OtpTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="u", telephone="0600000000", password="secret", role="driver"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def demander_code(self):
+        with mock.patch("web.views.otp.emettre", wraps=otp.emettre) as emettre, \
+                mock.patch("builtins.print"):
+            self.client.post(reverse("password_reset"), {"telephone": "0600000000"})
+        return cache.get(f"otp:{self.user.pk}:code") if emettre.called else None
+
+    def test_reinitialisation_sans_table(self):
+        code = self.demander_code()
+        self.assertIsNotNone(code)
+
+        response = self.client.post(reverse("verify_otp"), {"code": code})
+        self.assertRedirects(response, reverse("set_new_password"), fetch_redirect_response=False)
+        self.client.post(reverse("set_new_password"), {"password1": "nouveau", "password2": "nouveau"})
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("nouveau"))
+        self.assertFalse(PasswordResetOTP.objects.exists())
+
+    def test_code_consomme_une_seule_fois(self):
+        code = otp.emettre(self.user.pk)
+        self.assertTrue(otp.verifier(self.user.pk, code))
+        self.assertFalse(otp.verifier(self.user.pk, code))
+
+    @override_settings(OTP_ESSAIS_MAX=2)
+    def test_essais_limites(self):
+        code = otp.emettre(self.user.pk)
+        self.assertFalse(otp.verifier(self.user.pk, "000000"))
+        self.assertFalse(otp.verifier(self.user.pk, "000001"))
+        # troisième essai : le code est détruit, même juste
+        self.assertFalse(otp.verifier(self.user.pk, code))
+        self.assertIsNone(cache.get(f"otp:{self.user.pk}:code"))
+
+    def test_code_expire(self):
+        code = otp.emettre(self.user.pk)
+        cache.delete(f"otp:{self.user.pk}:essais")
+        self.assertFalse(otp.verifier(self.user.pk, code))
+
+    def test_purger_otp(self):
+        PasswordResetOTP.objects.bulk_create(PasswordResetOTP(user=self.user, code="123456") for _ in range(3))
+        sortie = StringIO()
+        call_command("purger_otp", "--lot", "2", stdout=sortie)
+        self.assertFalse(PasswordResetOTP.objects.exists())
+        self.assertIn("3 OTP", sortie.getvalue())
+
+
+class UtilisateurEnCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        creer_flotte(2, comptes=True)
+        # chauffeur0 : permis expiré
+        self.driver = User.objects.get(username="chauffeur0")
+        self.client.force_login(self.driver)
+
+    def tearDown(self):
+        cache.clear()
+
+    def requetes_auth(self, url):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        tables = ('"django_session"', '"web_user"', '"web_chauffeur"')
+        return response, [q["sql"] for q in requetes if any(f"FROM {t}" in q["sql"] for t in tables)]
+
+    def test_aucune_requete_auth_en_regime_etabli(self):
+        self.client.get(reverse("dashboard"))
+
+        response, requetes = self.requetes_auth(reverse("dashboard"))
+        self.assertEqual(requetes, [])
+        self.assertEqual(response.context["chauffeur"].etat, "EXPIRE")
+        self.assertEqual(len(response.context["mes_vehicules"]), 1)
+
+    def test_invalide_a_l_enregistrement(self):
+        self.client.get(reverse("dashboard"))
+
+        self.driver.first_name = "Renommé"
+        self.driver.save()
+        Chauffeur.objects.filter(utilisateur=self.driver).update(
+            date_expiration_permis=timezone.now().date() + timedelta(days=365)
+        )
+
+        response, requetes = self.requetes_auth(reverse("dashboard"))
+        self.assertEqual(len(requetes), 1)
+        self.assertEqual(response.wsgi_request.user.first_name, "Renommé")
+        self.assertEqual(response.context["chauffeur"].etat, "VALIDE")
+
+    def test_mot_de_passe_change_deconnecte(self):
+        self.client.get(reverse("dashboard"))
+        self.driver.set_password("autre")
+        self.driver.save()
+
+        response = self.client.get(reverse("dashboard"))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('dashboard')}", fetch_redirect_response=False)
+
+
+class FichiersStatiquesTests(TestCase):
+
+    def test_collectstatic_empreintes_et_compression(self):
+        manifeste = {**settings.STORAGES, "staticfiles": {
+            "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+        }}
+        with tempfile.TemporaryDirectory() as racine, \
+                override_settings(STATIC_ROOT=racine, STORAGES=manifeste, DEBUG=False):
+            call_command("collectstatic", interactive=False, verbosity=0)
+
+            page = Client().get(reverse("login")).content.decode()
+            self.assertNotIn("unpkg.com", page)
+            url = re.search(r'src="(/static/web/vendor/lucide-icones\.[0-9a-f]{12}\.js)"', page).group(1)
+            for suffixe in ("", ".gz", ".br"):
+                self.assertTrue(Path(racine, url.removeprefix("/static/") + suffixe).exists())
+
+            response = Client().get(url, HTTP_ACCEPT_ENCODING="br, gzip")
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertIn("immutable", response["Cache-Control"])
+
+
+class ProfilageTests(TestCase):
+
+    def setUp(self):
+        manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(manager)
+        creer_flotte(3)
+
+    def test_server_timing(self):
+        response = self.client.get(reverse("vehicule_list"))
+
+        mesures = dict(
+            re.match(r"(\w+);.*dur=([\d.]+)", partie.strip()).groups()
+            for partie in response.headers["Server-Timing"].split(",")
+        )
+        self.assertEqual(set(mesures), {"sql", "gabarits", "vue", "total"})
+        self.assertGreater(float(mesures["gabarits"]), 0)
+        self.assertLessEqual(
+            float(mesures["sql"]) + float(mesures["gabarits"]) + float(mesures["vue"]),
+            float(mesures["total"]) + 0.05,
+        )
+
+    def test_requetes_lentes_journalisees(self):
+        profilage = {**settings.PROFILAGE, "seuil_ms": 0, "sql_lentes": 2, "cprofile": 1.0}
+        with override_settings(PROFILAGE=profilage), self.assertLogs("web.requetes_lentes") as journal:
+            self.client.get(reverse("dashboard"), {"q": "secret"})
+
+        entree = json.loads(journal.records[0].getMessage())
+        self.assertEqual(entree["route"], "dashboard")
+        self.assertEqual(entree["chemin"], reverse("dashboard"))
+        self.assertGreater(entree["requetes"], 2)
+        self.assertEqual(len(entree["sql_lentes"]), 2)
+        self.assertGreaterEqual(entree["sql_lentes"][0]["ms"], entree["sql_lentes"][1]["ms"])
+        self.assertIn("cumulative", entree["profil"])
+
+    def test_requetes_rapides_non_journalisees(self):
+        with self.assertNoLogs("web.requetes_lentes"):
+            self.client.get(reverse("vehicule_list"))
+
+
+class RechercheTests(TestCase):
+
+    def setUp(self):
+        creer_flotte(3, comptes=True)
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(self.manager)
+
+    def chercher(self, texte):
+        return self.client.get(reverse("recherche"), {"q": texte}).json()
+
+    def test_prefixes_accents_et_plaque_sans_tirets(self):
+        Chauffeur.objects.filter(nom="Chauffeur 1").update(nom="Hélène Dupré")
+
+        self.assertEqual([v["libelle"] for v in self.chercher("ab-00")["vehicules"]][-1], "Renault Clio - AB-000-CD")
+        self.assertEqual(len(self.chercher("AB001")["vehicules"]), 1)
+        self.assertEqual([c["libelle"] for c in self.chercher("helene dup")["chauffeurs"]], ["Hélène Dupré"])
+        self.assertEqual(len(self.chercher("P00002")["chauffeurs"]), 1)
+        self.assertEqual(len(self.chercher("0600000001")["chauffeurs"]), 1)
+        self.assertEqual(self.chercher('"  -'), {"vehicules": [], "chauffeurs": []})
+
+    def test_index_suit_les_ecritures(self):
+        vehicule = Vehicule.objects.get(immatriculation="AB-002-CD")
+        vehicule.immatriculation = "XY-777-ZZ"
+        vehicule.save()
+        Vehicule.objects.filter(pk=vehicule.pk).update(marque="Citroën")
+
+        resultats = self.chercher("citroen xy77")["vehicules"]
+        self.assertEqual([v["id"] for v in resultats], [vehicule.pk])
+        self.assertEqual(self.chercher("AB-002")["vehicules"], [])
+
+        vehicule.delete()
+        self.assertEqual(self.chercher("XY")["vehicules"], [])
+
+    def test_chargement_massif(self):
+        User.objects.filter(role="driver").delete()
+        triggers = recherche.suspendre_indexation()
+        generer_flotte(4, echeances_et_stats=False)
+        self.assertEqual(self.chercher("SY")["vehicules"], [])
+
+        recherche.reprendre_indexation(triggers)
+        self.assertEqual([v["libelle"] for v in self.chercher("SY0000003")["vehicules"]], ["Dacia Sandero - SY-0000003"])
+        Vehicule.objects.create(immatriculation="QQ-100-QQ", marque="Dacia", modele="Logan", annee=2020, kilometrage=0)
+        self.assertEqual(len(self.chercher("QQ")["vehicules"]), 1)
+
+    def test_reserve_aux_managers(self):
+        self.client.force_login(Chauffeur.objects.exclude(utilisateur=None).first().utilisateur)
+        self.assertEqual(self.client.get(reverse("recherche"), {"q": "AB"}).status_code, 403)
+
+
+class AutocompletionTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(self.manager)
+
+    def requetes(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(requetes), response.content.decode()
+
+    def test_formulaires_independants_de_la_taille(self):
+        creer_flotte(2, comptes=True)
+        vehicule = Vehicule.objects.first()
+        pages = [
+            reverse("entretien_create"), reverse("document_create"),
+            reverse("vehicule_assign", args=[vehicule.pk]), reverse("vehicule_update", args=[vehicule.pk]),
+        ]
+        avant = [self.requetes(url)[0] for url in pages]
+
+        for i in range(20):
+            chauffeur = Chauffeur.objects.create(
+                nom=f"Renfort {i}", telephone=f"05000000{i:02d}", numero_permis=f"R{i:05d}",
+                date_expiration_permis=timezone.now().date(),
+            )
+            Vehicule.objects.create(
+                immatriculation=f"RF-{i:03d}", marque="Dacia", modele="Logan", annee=2021,
+                kilometrage=0, chauffeur=chauffeur,
+            )
+        self.assertEqual([self.requetes(url)[0] for url in pages], avant)
+
+        _, page = self.requetes(reverse("vehicule_assign", args=[vehicule.pk]))
+        self.assertNotIn("<option", page)
+        self.assertIn(f'value="{vehicule.chauffeur_id}"', page)
+        self.assertIn(f'value="{vehicule.chauffeur.utilisateur.get_full_name()}"', page)
+
+    def test_validation_lit_la_seule_cle_soumise(self):
+        creer_flotte(3)
+        vehicule = Vehicule.objects.first()
+        donnees = {"type_entretien": "vidange", "date_prevue": timezone.now().date(), "cout": "80"}
+
+        form = EntretienForm({**donnees, "vehicule": vehicule.pk})
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertTrue(form.is_valid())
+        # le champ lit l'objet, la validation du modèle vérifie la clé
+        self.assertEqual(len(requetes), 2)
+        for requete in requetes.captured_queries:
+            self.assertIn(f'WHERE "web_vehicule"."id" = {vehicule.pk} LIMIT', requete["sql"])
+
+        self.assertIn("vehicule", EntretienForm({**donnees, "vehicule": 999999}).errors)
+
+    def test_pagination_par_cle(self):
+        creer_flotte(25)
+        url = reverse("autocompletion", args=["vehicules"])
+
+        premiere = self.client.get(url).json()
+        self.assertEqual(len(premiere["resultats"]), 20)
+        seconde = self.client.get(url, {"avant": premiere["suivant"]}).json()
+        self.assertEqual(len(seconde["resultats"]), 5)
+        self.assertIsNone(seconde["suivant"])
+        self.assertEqual(
+            {r["id"] for r in premiere["resultats"] + seconde["resultats"]},
+            set(Vehicule.objects.values_list("pk", flat=True)),
+        )
+
+        trouves = self.client.get(url, {"q": "AB-01"}).json()
+        self.assertEqual(len(trouves["resultats"]), 10)
+        self.assertTrue(all("AB-01" in r["libelle"] for r in trouves["resultats"]))
+        self.assertEqual(self.client.get(reverse("autocompletion", args=["inconnue"])).status_code, 404)
+
+
+def valeur_metrique(texte, serie):
+    for ligne in texte.splitlines():
+        if ligne.startswith(serie + " "):
+            return float(ligne.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class AffectationTests(TestCase):
+
+    def setUp(self):
+        self.today = timezone.now().date()
+
+    def chauffeur(self, i, permis=365, statut=Chauffeur.Statut.DISPONIBLE):
+        return Chauffeur.objects.create(
+            nom=f"Chauffeur {i}", telephone=f"06000000{i:02d}", numero_permis=f"P{i:05d}",
+            date_expiration_permis=self.today + timedelta(days=permis), statut=statut,
+        )
+
+    def vehicule(self, i, marque="Renault", chauffeur=None, statut=Vehicule.Statut.DISPONIBLE):
+        return Vehicule.objects.create(
+            immatriculation=f"AF-{i:03d}", marque=marque, modele="X", annee=2020, kilometrage=0,
+            statut=statut, chauffeur=chauffeur,
+        )
+
+    def test_couplage_optimal(self):
+        # comparé à l'énumération de toutes les affectations possibles
+        poids = {"charge": 10, "marque_connue": 12, "par_chauffeur": 2}
+        vehicules = [(1, "renault"), (2, "renault"), (3, "dacia"), (4, "peugeot"), (5, "dacia")]
+        chauffeurs = [(10, 0, {"dacia"}), (11, 10, {"renault"}), (12, 5, set())]
+        places = [(pk, base + rang * 10, connues) for pk, base, connues in chauffeurs for rang in range(2)]
+        meilleur = min(
+            sum(places[p][1] - (12 if vehicules[i][1] in places[p][2] else 0) for i, p in enumerate(choix))
+            for choix in itertools.permutations(range(len(places)), len(vehicules))
+        )
+
+        propositions, cout = affectation.apparier(vehicules, chauffeurs, poids)
+        self.assertEqual(cout, meilleur)
+        self.assertEqual(sorted(v for v, _ in propositions), [1, 2, 3, 4, 5])
+        self.assertTrue(all(n <= 2 for n in Counter(c for _, c in propositions).values()))
+
+    def test_eligibilite_et_preferences(self):
+        libre, charge = self.chauffeur(1), self.chauffeur(2)
+        self.chauffeur(3, permis=-1)
+        self.chauffeur(4, statut=Chauffeur.Statut.MISSION)
+        self.vehicule(1, "Dacia", chauffeur=charge)
+        expire = self.chauffeur(5, permis=-1)
+
+        a, b = self.vehicule(2, "Dacia"), self.vehicule(3, "Renault", chauffeur=expire)
+        self.vehicule(4, statut=Vehicule.Statut.MAINTENANCE)
+        self.vehicule(5, chauffeur=libre)
+
+        resultat = affectation.affecter(self.today)
+        self.assertEqual((resultat.vehicules, resultat.chauffeurs), (2, 2))
+        # le moins chargé prend l'un, l'autre va au chauffeur qui connaît Dacia
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual(a.chauffeur, charge)
+        self.assertEqual(b.chauffeur, libre)
+        self.assertFalse(Vehicule.objects.filter(chauffeur=None, statut=Vehicule.Statut.DISPONIBLE).exists())
+
+    def test_application_en_lot(self):
+        for i in range(40):
+            self.chauffeur(i)
+            self.vehicule(i, ["Renault", "Dacia", "Peugeot"][i % 3])
+
+        with CaptureQueriesContext(connection) as requetes:
+            resultat = affectation.affecter(self.today)
+        self.assertEqual(len(resultat.propositions), 40)
+        # un seul executemany pour les 40 véhicules
+        mises_a_jour = [q["sql"] for q in requetes.captured_queries if 'UPDATE "web_vehicule"' in q["sql"]]
+        self.assertEqual(len(mises_a_jour), 1)
+        self.assertTrue(mises_a_jour[0].startswith("40 times"))
+        self.assertEqual(len(set(Vehicule.objects.values_list("chauffeur", flat=True))), 40)
+
+    def test_vue(self):
+        manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        self.client.force_login(manager)
+        self.chauffeur(1)
+        vehicule = self.vehicule(1)
+
+        response = self.client.get(reverse("affectation_automatique"))
+        self.assertContains(response, "AF-001")
+        self.assertContains(response, "Chauffeur 1")
+        vehicule.refresh_from_db()
+        self.assertIsNone(vehicule.chauffeur)
+
+        response = self.client.post(reverse("affectation_automatique"))
+        self.assertRedirects(response, reverse("vehicule_list"))
+        vehicule.refresh_from_db()
+        self.assertEqual(vehicule.chauffeur.nom, "Chauffeur 1")
+
+
+class MetriquesTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", telephone="0100000000", password="secret", role="manager"
+        )
+        creer_flotte(3)
+
+    def lire(self):
+        response = self.client.get(reverse("metriques"))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_compteurs_histogrammes_et_jauges(self):
+        avant = self.lire()
+        self.client.post(reverse("login"), {"telephone": "0100000000", "password": "faux"})
+        self.client.post(reverse("password_reset"), {"telephone": "0100000000"})
+        self.client.force_login(self.manager)
+        self.client.get(reverse("vehicule_list"))
+        apres = self.lire()
+
+        def delta(serie):
+            return valeur_metrique(apres, serie) - valeur_metrique(avant, serie)
+
+        self.assertEqual(delta('flotte_requetes_total{route="vehicule_list",statut="200"}'), 1)
+        self.assertEqual(delta('flotte_requete_duree_secondes_count{route="vehicule_list"}'), 1)
+        self.assertEqual(delta('flotte_requete_sql_bucket{route="vehicule_list",le="+Inf"}'), 1)
+        self.assertEqual(delta('flotte_connexions_total{resultat="echec"}'), 1)
+        self.assertEqual(delta('flotte_connexions_total{resultat="succes"}'), 1)
+        self.assertEqual(delta("flotte_otp_emis_total"), 1)
+        self.assertIn("# TYPE flotte_requete_duree_secondes histogram", apres)
+        self.assertEqual(valeur_metrique(apres, 'flotte_vehicules{statut="MISSION"}'), 1)
+        self.assertEqual(valeur_metrique(apres, "flotte_documents_expires"), 1)
+
+    def test_threads_termines_verses_aux_retraites(self):
+        avant = metriques.instantane()["compteurs"].get(("flotte_otp_emis_total", ()), 0)
+
+        def requete():
+            metriques.compter("flotte_otp_emis_total")
+            metriques.observer("flotte_requete_sql", 3, route="test")
+
+        for _ in range(20):
+            thread = threading.Thread(target=requete)
+            thread.start()
+            thread.join()
+
+        donnees = metriques.instantane()
+        self.assertEqual(donnees["compteurs"][("flotte_otp_emis_total", ())], avant + 20)
+        self.assertEqual(donnees["histogrammes"][("flotte_requete_sql", (("route", "test"),))][-1], 20)
+        # un magasin par thread vivant, pas un par thread ayant existé
+        self.assertLessEqual(len(metriques._magasins), threading.active_count())
+
+    def test_acces_reserve(self):
+        self.assertEqual(self.client.get(reverse("metriques"), REMOTE_ADDR="10.0.0.1").status_code, 403)
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse("metriques"), REMOTE_ADDR="10.0.0.1").status_code, 200)
+
+    def test_agregation_des_workers(self):
+        with tempfile.TemporaryDirectory() as dossier, override_settings(METRIQUES_DIR=dossier):
+            Path(dossier, "autre-worker.json").write_text(json.dumps({
+                "compteurs": [["flotte_otp_emis_total", [], 5]],
+                "histogrammes": [["flotte_requete_sql", [["route", "dashboard"]], [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1]]],
+            }))
+            locaux = metriques.instantane()["compteurs"].get(("flotte_otp_emis_total", ()), 0)
+            texte = self.lire()
+
+            self.assertEqual(valeur_metrique(texte, "flotte_otp_emis_total"), locaux + 5)
+            self.assertGreaterEqual(valeur_metrique(texte, 'flotte_requete_sql_bucket{route="dashboard",le="0"}'), 1)
+            self.assertEqual(len(list(Path(dossier).glob("*.json"))), 2)
+
+
+class BancEssaiTests(TestCase):
+
+    def test_flotte_synthetique(self):
+        construire_flotte(20)
+        self.assertEqual(Vehicule.objects.count(), 20)
+        self.assertEqual(Chauffeur.objects.exclude(utilisateur=None).count(), 10)
+        self.assertEqual(DocumentVehicule.objects.count(), 60)
+        self.assertEqual(FleetStats.objects.get().total_entretiens, 80)
+        self.assertTrue(EcheanceEvent.objects.exists())
+
+    def test_generateur_deterministe(self):
+        lignes, _ = generer_flotte(10, Repartition(documents=2, entretiens=1), graine=7, echeances_et_stats=False)
+        self.assertEqual(lignes, {"utilisateurs": 5, "chauffeurs": 5, "vehicules": 10, "documents": 20, "entretiens": 10})
+        premier = list(Entretien.objects.order_by("pk").values_list("type_entretien", "date_prevue", "cout"))
+        self.assertTrue(self.client.login(telephone="0700000000", password="flotte"))
+
+        Vehicule.objects.all().delete()
+        Chauffeur.objects.all().delete()
+        User.objects.filter(role="driver").delete()
+        generer_flotte(10, Repartition(documents=2, entretiens=1), graine=7, echeances_et_stats=False)
+        self.assertEqual(list(Entretien.objects.order_by("pk").values_list("type_entretien", "date_prevue", "cout")), premier)
+
+    def test_comptes_existants_ignores(self):
+        # un compte chauffeur déjà en base ne reçoit pas de profil généré
+        ancien = User.objects.create_user(username="chauffeur-ancien", telephone="0900000000", role="driver")
+        generer_flotte(4, echeances_et_stats=False)
+        self.assertFalse(Chauffeur.objects.filter(utilisateur=ancien).exists())
+        self.assertEqual(Chauffeur.objects.filter(utilisateur__username__startswith="chauffeur").count(), 2)
+
+    def test_routes_parametrees_couvertes(self):
+        from .management.commands.bench_flotte import ARGUMENTS
+
+        parametrees = {p.name for p in urlpatterns if p.pattern.converters}
+        self.assertEqual(parametrees - set(ARGUMENTS), set())
+
+
+class ChargementMassifTests(TransactionTestCase):
+    """
+    generer_flotte(differer_index=True) modifie le schéma : hors de la
+    transaction d'un TestCase.
+    """
+
+    def schema(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger') ORDER BY name")
+            return [nom for nom, in cursor.fetchall()]
+
+    def test_index_remis_apres_echec(self):
+        avant = self.schema()
+        with mock.patch("web.synthese.inserer", side_effect=RuntimeError("disque plein")):
+            with self.assertRaises(RuntimeError):
+                generer_flotte(10, differer_index=True)
+        self.assertEqual(self.schema(), avant)
+        self.assertFalse(Vehicule.objects.exists())
@@ -7,7 +7,10 @@ from .views import (
     entretien_create, entretien_list, welcome, vehicule_update,
     vehicule_delete, document_update, document_delete, assign_vehicule,
     entretien_update, entretien_delete, chauffeur_list,
-    chauffeur_update, chauffeur_delete)
+    chauffeur_update, chauffeur_delete, calendrier, import_flotte, export_csv,
+    api_liste, api_detail, dashboard_async, document_list_async,
+    entretien_list_async, exposition_metriques, recherche_flotte, autocompletion,
+    affectation_automatique)
 
 urlpatterns = [
     path("", welcome, name='bienvenue'),
@@ -27,6 +30,7 @@ urlpatterns = [
     path("documents/<int:pk>/supprimer/", document_delete, name="document_delete"),
     path("vehicule/<int:vehicule_id>/documents/", document_list, name="document_list"),
     path("vehicules/<int:pk>/assign/", assign_vehicule, name="vehicule_assign"),
+    path("vehicules/affectation/", affectation_automatique, name="affectation_automatique"),
     path("entretiens/ajouter/", entretien_create, name="entretien_create"),
     path("entretiens/<int:pk>/modifier/", entretien_update, name="entretien_update"),
     path("entretiens/<int:pk>/supprimer/", entretien_delete, name="entretien_delete"),
@@ -34,5 +38,16 @@ urlpatterns = [
     path("chauffeurs/", chauffeur_list, name="chauffeur_list"),
     path("chauffeurs/<int:pk>/modifier/", chauffeur_update, name="chauffeur_update"),
     path("chauffeurs/<int:pk>/supprimer/", chauffeur_delete, name="chauffeur_delete"),
+    path("calendrier/", calendrier, name="calendrier"),
+    path("import/", import_flotte, name="import_flotte"),
+    path("export/<str:nom>.csv", export_csv, name="export_csv"),
+    path("api/<str:ressource>/", api_liste, name="api_liste"),
+    path("api/<str:ressource>/<int:pk>/", api_detail, name="api_detail"),
+    path("recherche/", recherche_flotte, name="recherche"),
+    path("autocompletion/<str:source>/", autocompletion, name="autocompletion"),
+    path("metrics", exposition_metriques, name="metriques"),
+    path("async/bord/", dashboard_async, name="dashboard_async"),
+    path("async/vehicule/<int:vehicule_id>/documents/", document_list_async, name="document_list_async"),
+    path("async/vehicule/<int:vehicule_id>/entretiens/", entretien_list_async, name="entretien_list_async"),
 ]
 
@@ -0,0 +1,73 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+
+# à incrémenter quand User ou Chauffeur change de champs : les objets
+# déjà en cache ne sont plus relus
+FORMAT = 1
+DUREE_UTILISATEUR = 60 * 60
+
+
+# ----------------------------
+# UTILISATEUR + PROFIL CHAUFFEUR EN CACHE
+# ----------------------------
+# Chargé à chaque requête authentifiée par TelephoneBackend.get_user. Un
+# numéro de version par utilisateur, incrémenté à chaque modification de
+# l'utilisateur ou de son profil : un objet périmé, remis en cache par une
+# requête concurrente, est rangé sous une ancienne version et jamais relu.
+def _cle_version(pk):
+    return f"utilisateur:{pk}:version"
+
+
+def _cle(pk, version):
+    return f"utilisateur:{pk}:{FORMAT}:{version}"
+
+
+def _requete(pk):
+    return get_user_model()._default_manager.select_related("profil_chauffeur").filter(pk=pk)
+
+
+def _version(pk):
+    cle = _cle_version(pk)
+    version = cache.get(cle)
+    if version is None:
+        # horodatée : jamais une version déjà utilisée, même après éviction
+        cache.add(cle, time.time_ns(), timeout=None)
+        version = cache.get(cle)
+    return version
+
+
+def charger_utilisateur(pk):
+    cle = _cle(pk, _version(pk))
+    user = cache.get(cle)
+    if user is None:
+        user = _requete(pk).first()
+        if user is not None:
+            cache.set(cle, user, DUREE_UTILISATEUR)
+    return user
+
+
+async def acharger_utilisateur(pk):
+    cle_version = _cle_version(pk)
+    version = await cache.aget(cle_version)
+    if version is None:
+        await cache.aadd(cle_version, time.time_ns(), timeout=None)
+        version = await cache.aget(cle_version)
+
+    cle = _cle(pk, version)
+    user = await cache.aget(cle)
+    if user is None:
+        user = await _requete(pk).afirst()
+        if user is not None:
+            await cache.aset(cle, user, DUREE_UTILISATEUR)
+    return user
+
+
+def invalider_utilisateur(pk):
+    try:
+        cache.incr(_cle_version(pk))
+    except ValueError:
+        # pas de version : rien en cache pour cet utilisateur
+        pass
@@ -1,28 +1,51 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.conf import settings
+from django.views.decorators.http import condition
 from django.contrib.auth import login, logout, authenticate, get_user_model
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.db.models import Count, Q
+import asyncio
+import calendar
+from collections import defaultdict
 from datetime import date, timedelta
-
-from .models import Vehicule, DocumentVehicule, Entretien, PasswordResetOTP, Chauffeur
+from urllib.parse import urlencode
+
+from .models import Vehicule, DocumentVehicule, Entretien, Chauffeur, EcheanceEvent
+from .stats import kpis_du_jour, alertes_flotte, STATUTS_VEHICULE
+from .filtres import filtrer_vehicules, TRIS_VEHICULES, TRI_VEHICULES_DEFAUT
+from .pagination import paginer_keyset, CurseurInvalide
+from .decorators import budget_requetes, api_authentifie, lecture_replique
+from .generation import generation, DUREE_FRAGMENTS
 from .forms import (
     RegisterForm, LoginForm, PhoneResetForm, OTPVerificationForm, 
     SetNewPasswordForm, VehiculeForm, DocumentVehiculeForm, 
-    AssignVehiculeForm, EntretienForm, ChauffeurForm
+    AssignVehiculeForm, EntretienForm, ChauffeurForm, ImportFlotteForm
 )
+from .importation import importer, ouvrir_televersement, format_du_fichier
+from .exports import EXPORTS, reponse_csv
+from . import affectation, api, metriques, otp, recherche
+from .asynchrone import liste, akpis_du_jour, aalertes_flotte, fragment_en_cache
+from .limitation import tentative_autorisee, ip_client
 
 User = get_user_model()
 
+VEHICULES_PAR_PAGE = 50
+
 
+@budget_requetes(2)
 def welcome(request):
     return render(request, "web/welcome.html")
 
 # ----------------------------
 # Inscription
 # ----------------------------
+@budget_requetes(16)
 def register(request):
     if request.method == "POST":
         form = RegisterForm(request.POST)
@@ -52,33 +75,44 @@ def register(request):
 
 
 
+TROP_DE_TENTATIVES = "Trop de tentatives. Réessayez dans quelques minutes."
+
+
 # ----------------------------
 # Login par téléphone
 # ----------------------------
+@budget_requetes(10)
 def login_view(request):
+    status = 200
     if request.method == "POST":
         form = LoginForm(request.POST)
         if form.is_valid():
             tel = form.cleaned_data["telephone"]
             password = form.cleaned_data["password"]
 
-            # username correspond maintenant au telephone
-            user = authenticate(request, username=tel, password=password)
-
-            if user:
-                login(request, user)
-                return redirect("dashboard")
+            # refus avant tout hachage ni accès à la base
+            if not tentative_autorisee("connexion", telephone=tel, ip=ip_client(request)):
+                messages.error(request, TROP_DE_TENTATIVES)
+                status = 429
             else:
-                messages.error(request, "Téléphone ou mot de passe incorrect")
+                # username correspond maintenant au telephone
+                user = authenticate(request, username=tel, password=password)
+
+                if user:
+                    login(request, user)
+                    return redirect("dashboard")
+                else:
+                    messages.error(request, "Téléphone ou mot de passe incorrect")
     else:
         form = LoginForm()
 
-    return render(request, "web/comptes/connexion.html", {"form": form})
+    return render(request, "web/comptes/connexion.html", {"form": form}, status=status)
 
 
 # ----------------------------
 # Logout
 # ----------------------------
+@budget_requetes(4)
 def logout_view(request):
     logout(request)
     return redirect("login")
@@ -87,28 +121,28 @@ def logout_view(request):
 # ----------------------------
 # Mot de passe oublié → demander téléphone
 # ----------------------------
+@budget_requetes(5)
 def password_reset_phone(request):
     form = PhoneResetForm(request.POST or None)
 
     if request.method == "POST" and form.is_valid():
         tel = form.cleaned_data["telephone"]
 
-        try:
-            user = User.objects.get(telephone=tel)
+        if not tentative_autorisee("otp", telephone=tel, ip=ip_client(request)):
+            messages.error(request, TROP_DE_TENTATIVES)
+            return render(request, "web/comptes/reset.html", {"form": form}, status=429)
 
-            # supprimer anciens OTP
-            PasswordResetOTP.objects.filter(user=user).delete()
+        user_id = User.objects.filter(telephone=tel).values_list("id", flat=True).first()
+        if user_id is not None:
+            # le nouveau code remplace l'ancien, dans le cache
+            code = otp.emettre(user_id)
 
-            otp = PasswordResetOTP.objects.create(user=user)
-            otp.generate_code()
+            print("SMS OTP (simulé) :", code)
 
-            print("SMS OTP (simulé) :", otp.code)
-
-            request.session["reset_user"] = user.id
+            request.session["reset_user"] = user_id
             return redirect("verify_otp")
 
-        except User.DoesNotExist:
-            messages.error(request, "Numéro inconnu")
+        messages.error(request, "Numéro inconnu")
 
     return render(request, "web/comptes/reset.html", {"form": form})
 
@@ -116,6 +150,7 @@ def password_reset_phone(request):
 # ----------------------------
 # Vérification OTP
 # ----------------------------
+@budget_requetes(4)
 def verify_otp(request):
     if "reset_user" not in request.session:
         return redirect("login")
@@ -126,16 +161,16 @@ def verify_otp(request):
         code = form.cleaned_data["code"]
         user_id = request.session["reset_user"]
 
-        try:
-            otp = PasswordResetOTP.objects.get(user_id=user_id, code=code)
-            otp.is_verified = True
-            otp.save()
+        # un code à 6 chiffres ne résiste pas à un essai exhaustif
+        if not tentative_autorisee("verification_otp", utilisateur=user_id, ip=ip_client(request)):
+            messages.error(request, TROP_DE_TENTATIVES)
+            return render(request, "web/comptes/otp_verify.html", {"form": form}, status=429)
 
+        if otp.verifier(user_id, code):
             request.session["otp_verified"] = True
             return redirect("set_new_password")
 
-        except PasswordResetOTP.DoesNotExist:
-            messages.error(request, "Code invalide")
+        messages.error(request, "Code invalide")
 
     return render(request, "web/comptes/otp_verify.html", {"form": form})
 
@@ -143,6 +178,7 @@ def verify_otp(request):
 # ----------------------------
 # Nouveau mot de passe
 # ----------------------------
+@budget_requetes(8)
 def set_new_password(request):
     if not request.session.get("otp_verified"):
         return redirect("login")
@@ -154,10 +190,9 @@ def set_new_password(request):
         user = User.objects.get(id=user_id)
 
         user.password = make_password(form.cleaned_data["password1"])
-        user.save()
+        user.save(update_fields=["password"])
 
-        # nettoyage OTP et session
-        PasswordResetOTP.objects.filter(user=user).delete()
+        # le code a été consommé à la vérification : reste la session
         request.session.flush()
 
         messages.success(request, "Mot de passe modifié avec succès !")
@@ -166,6 +201,7 @@ def set_new_password(request):
     return render(request, "web/comptes/set_new.html", {"form": form})
 
 
+@budget_requetes(10)
 @login_required
 def vehicule_create(request):
     if request.user.role != "manager":
@@ -182,6 +218,7 @@ def vehicule_create(request):
     return render(request, "web/vehicules/create.html", {"form": form})
 
 
+@budget_requetes(10)
 @login_required
 def vehicule_update(request, pk):
     if request.user.role != "manager":
@@ -199,6 +236,7 @@ def vehicule_update(request, pk):
     return render(request, "web/vehicules/update.html", {"form": form, "vehicule": vehicule})
 
 
+@budget_requetes(14)
 @login_required
 def vehicule_delete(request, pk):
     if request.user.role != "manager":
@@ -215,12 +253,42 @@ def vehicule_delete(request, pk):
     return render(request, "web/vehicules/confirm_delete.html", {"vehicule": vehicule})
 
 
+@budget_requetes(3)
 @login_required
+@lecture_replique
 def vehicule_list(request):
-    vehicules = Vehicule.objects.all()
-    return render(request, "web/vehicules/list_vehicules.html", {"vehicules": vehicules})
+    vehicules, filtres = filtrer_vehicules(Vehicule.objects.all(), request.GET)
+    vehicules = vehicules.select_related("chauffeur").only(
+        "immatriculation", "marque", "modele", "annee", "kilometrage",
+        "statut", "date_creation", "chauffeur__nom",
+    )
+
+    tri = request.GET.get("tri", TRI_VEHICULES_DEFAUT)
+    if tri not in TRIS_VEHICULES:
+        tri = TRI_VEHICULES_DEFAUT
+
+    try:
+        page = paginer_keyset(
+            vehicules,
+            TRIS_VEHICULES[tri],
+            apres=request.GET.get("apres"),
+            avant=request.GET.get("avant"),
+            taille=VEHICULES_PAR_PAGE,
+        )
+    except CurseurInvalide:
+        return redirect("vehicule_list")
+
+    return render(request, "web/vehicules/list_vehicules.html", {
+        "vehicules": page["objets"],
+        "page": page,
+        "filtres": filtres,
+        "tri": tri,
+        "params": urlencode({**filtres, "tri": tri}),
+        "statuts": Vehicule.Statut.choices,
+    })
 
 
+@budget_requetes(10)
 @login_required
 def document_create(request):
     if request.user.role != "manager":
@@ -232,13 +300,14 @@ def document_create(request):
         if form.is_valid():
             doc = form.save()
             messages.success(request, "Document ajouté")
-            return redirect("document_list", vehicule_id=doc.vehicule.id)
+            return redirect("document_list", vehicule_id=doc.vehicule_id)
     else:
         form = DocumentVehiculeForm()
 
     return render(request, "web/documents/ajout_document.html", {"form": form})
 
 
+@budget_requetes(10)
 @login_required
 def document_update(request, pk):
     if request.user.role != "manager":
@@ -251,11 +320,12 @@ def document_update(request, pk):
     if form.is_valid():
         form.save()
         messages.success(request, "Document mis à jour")
-        return redirect("document_list", vehicule_id=document.vehicule.id)
+        return redirect("document_list", vehicule_id=document.vehicule_id)
 
     return render(request, "web/documents/update_document.html", {"form": form, "document": document})
 
 
+@budget_requetes(8)
 @login_required
 def document_delete(request, pk):
     if request.user.role != "manager":
@@ -263,7 +333,7 @@ def document_delete(request, pk):
         return redirect("dashboard")
 
     document = get_object_or_404(DocumentVehicule, pk=pk)
-    vehicule_id = document.vehicule.id
+    vehicule_id = document.vehicule_id
     
     if request.method == "POST":
         document.delete()
@@ -273,9 +343,11 @@ def document_delete(request, pk):
     return render(request, "web/documents/confirm_delete_document.html", {"document": document})
 
 
+@budget_requetes(4)
+@lecture_replique
 def document_list(request, vehicule_id):
     vehicule = Vehicule.objects.get(id=vehicule_id)
-    documents = vehicule.documents.all()
+    documents = vehicule.documents.avec_etat(timezone.now().date())
 
     return render(
         request,
@@ -285,6 +357,7 @@ def document_list(request, vehicule_id):
 
 
 
+@budget_requetes(10)
 @login_required
 def assign_vehicule(request, pk):
     if request.user.role != "manager":
@@ -306,9 +379,46 @@ def assign_vehicule(request, pk):
     })
 
 
+# ----------------------------
+# Affectation automatique
+# ----------------------------
+AFFECTATIONS_APERCU = 50
+
+
+# pas de budget : l'application écrit par lots, en proportion des véhicules
+@login_required
+def affectation_automatique(request):
+    if request.user.role != "manager":
+        messages.error(request, "Accès refusé.")
+        return redirect("dashboard")
+
+    today = timezone.now().date()
+
+    if request.method == "POST":
+        resultat = affectation.affecter(today)
+        if resultat.propositions:
+            messages.success(request, f"{len(resultat.propositions)} véhicule(s) affecté(s) automatiquement.")
+        else:
+            messages.info(request, "Aucune affectation possible : pas de véhicule ou de chauffeur disponible.")
+        return redirect("vehicule_list")
+
+    resultat = affectation.calculer(today)
+    apercu = resultat.propositions[:AFFECTATIONS_APERCU]
+    vehicules = Vehicule.objects.in_bulk([vehicule for vehicule, _ in apercu])
+    chauffeurs = Chauffeur.objects.select_related("utilisateur").in_bulk([chauffeur for _, chauffeur in apercu])
+
+    return render(request, "web/vehicules/affectation.html", {
+        "affectation": resultat,
+        "apercu": [(vehicules[vehicule], chauffeurs[chauffeur]) for vehicule, chauffeur in apercu],
+        "restantes": len(resultat.propositions) - len(apercu),
+    })
+
+
+@budget_requetes(4)
+@lecture_replique
 def entretien_list(request, vehicule_id):
     vehicule = get_object_or_404(Vehicule, id=vehicule_id)
-    entretiens = vehicule.entretiens.all().order_by("-date_prevue")
+    entretiens = vehicule.entretiens.avec_etat(timezone.now().date()).order_by("-date_prevue")
 
     return render(
         request,
@@ -316,21 +426,23 @@ def entretien_list(request, vehicule_id):
         {
             "vehicule": vehicule,
             "entretiens": entretiens,
-            "today": timezone.now().date()
         }
     )
 
 
+@budget_requetes(3)
 @login_required
+@lecture_replique
 def chauffeur_list(request):
     if request.user.role != "manager":
         messages.error(request, "Accès refusé.")
         return redirect("dashboard")
     
-    chauffeurs = Chauffeur.objects.all()
+    chauffeurs = Chauffeur.objects.avec_etat(timezone.now().date())
     return render(request, "web/comptes/list_chauffeurs.html", {"chauffeurs": chauffeurs})
 
 
+@budget_requetes(10)
 @login_required
 def chauffeur_update(request, pk):
     if request.user.role != "manager":
@@ -348,6 +460,7 @@ def chauffeur_update(request, pk):
     return render(request, "web/comptes/update_chauffeur.html", {"form": form, "chauffeur": chauffeur})
 
 
+@budget_requetes(14)
 @login_required
 def chauffeur_delete(request, pk):
     if request.user.role != "manager":
@@ -365,6 +478,7 @@ def chauffeur_delete(request, pk):
         
     return render(request, "web/comptes/confirm_delete_chauffeur.html", {"chauffeur": chauffeur})
 
+@budget_requetes(10)
 @login_required
 def entretien_create(request):
     if request.user.role != "manager":
@@ -376,11 +490,12 @@ def entretien_create(request):
     if request.method == "POST" and form.is_valid():
         entretien = form.save()
         messages.success(request, "Entretien enregistré")
-        return redirect("entretien_list", vehicule_id=entretien.vehicule.id)
+        return redirect("entretien_list", vehicule_id=entretien.vehicule_id)
 
     return render(request, "web/entretiens/ajout_entretien.html", {"form": form})
 
 
+@budget_requetes(10)
 @login_required
 def entretien_update(request, pk):
     if request.user.role != "manager":
@@ -393,11 +508,12 @@ def entretien_update(request, pk):
     if form.is_valid():
         form.save()
         messages.success(request, "Entretien mis à jour")
-        return redirect("entretien_list", vehicule_id=entretien.vehicule.id)
+        return redirect("entretien_list", vehicule_id=entretien.vehicule_id)
 
     return render(request, "web/entretiens/update_entretien.html", {"form": form, "entretien": entretien})
 
 
+@budget_requetes(8)
 @login_required
 def entretien_delete(request, pk):
     if request.user.role != "manager":
@@ -405,7 +521,7 @@ def entretien_delete(request, pk):
         return redirect("dashboard")
 
     entretien = get_object_or_404(Entretien, pk=pk)
-    vehicule_id = entretien.vehicule.id
+    vehicule_id = entretien.vehicule_id
     
     if request.method == "POST":
         entretien.delete()
@@ -415,72 +531,393 @@ def entretien_delete(request, pk):
     return render(request, "web/entretiens/confirm_delete_entretien.html", {"entretien": entretien})
 
 
+@budget_requetes(10)
 @login_required
+@lecture_replique
 def dashboard(request):
-    # ... (existing dashboard code) ...
     user = request.user
     today = timezone.now().date()
     
     if user.role == "driver":
-        # Chauffeur Dashboard
-        chauffeur = getattr(user, 'profil_chauffeur', None)
+        # Chauffeur Dashboard : profil chargé avec l'utilisateur (en cache)
+        chauffeur = getattr(user, "profil_chauffeur", None)
+        if chauffeur:
+            chauffeur.etat = Chauffeur.objects.etat_de(chauffeur.date_expiration_permis, today)
         mes_vehicules = chauffeur.vehicules.all() if chauffeur else []
         
         context = {
             "chauffeur": chauffeur,
             "mes_vehicules": mes_vehicules,
-            "today": today,
         }
         return render(request, "web/comptes/dashboard_chauffeur.html", context)
 
-    # Manager Dashboard (logic preserved)
-    in_30_days = today + timedelta(days=30)
-    in_7_days = today + timedelta(days=7)
+    # Manager Dashboard
+    # données paresseuses : lues seulement si le fragment n'est pas en cache
+    context = {
+        "kpis": SimpleLazyObject(lambda: kpis_du_jour(today)),
+        "alertes": SimpleLazyObject(lambda: alertes_flotte(today)),
+        # ACTIVITÉ RÉCENTE
+        "derniers_vehicules": Vehicule.objects.order_by("-date_creation")[:5],
+        "derniers_entretiens": Entretien.objects.select_related("vehicule").order_by("-id")[:5],
+        # clés des fragments en cache
+        "generation": generation(),
+        "jour": today.isoformat(),
+        "duree_fragments": DUREE_FRAGMENTS,
+    }
+    return render(request, "web/comptes/dashboard.html", context)
 
-    # KPI VEHICULES
-    total_vehicules = Vehicule.objects.count()
-    vehicules_disponibles = Vehicule.objects.filter(statut="DISPONIBLE").count()
-    vehicules_mission = Vehicule.objects.filter(statut="MISSION").count()
-    vehicules_maintenance = Vehicule.objects.filter(statut="MAINTENANCE").count()
 
-    # KPI CHAUFFEURS
-    total_chauffeurs = Chauffeur.objects.count()
-    chauffeurs_disponibles = Chauffeur.objects.filter(statut="DISPONIBLE").count()
-    chauffeurs_mission = Chauffeur.objects.filter(statut="MISSION").count()
+# ----------------------------
+# Calendrier des échéances
+# ----------------------------
+@budget_requetes(3)
+@login_required
+@lecture_replique
+def calendrier(request):
+    if request.user.role != "manager":
+        messages.error(request, "Accès refusé.")
+        return redirect("dashboard")
+
+    today = timezone.now().date()
+    try:
+        annee, mois = (int(x) for x in request.GET.get("mois", "").split("-"))
+        debut = date(annee, mois, 1)
+    except ValueError:
+        debut = today.replace(day=1)
+
+    semaines = calendar.Calendar().monthdatescalendar(debut.year, debut.month)
+
+    # un seul parcours d'intervalle sur l'index des dates d'échéance
+    par_jour = defaultdict(list)
+    evenements = EcheanceEvent.objects.filter(
+        date_echeance__range=[semaines[0][0], semaines[-1][-1]]
+    ).order_by("date_echeance", "type_echeance")
+    for evenement in evenements:
+        par_jour[evenement.date_echeance].append(evenement)
+
+    precedent = (debut - timedelta(days=1)).replace(day=1)
+    suivant = (debut + timedelta(days=31)).replace(day=1)
+
+    return render(request, "web/echeances/calendrier.html", {
+        "debut": debut,
+        "today": today,
+        "semaines": [[(jour, par_jour[jour]) for jour in semaine] for semaine in semaines],
+        "precedent": precedent.strftime("%Y-%m"),
+        "suivant": suivant.strftime("%Y-%m"),
+    })
+
+
+# ----------------------------
+# Import en masse (CSV / JSONL)
+# ----------------------------
+@login_required
+def import_flotte(request):
+    if request.user.role != "manager":
+        messages.error(request, "Accès refusé.")
+        return redirect("dashboard")
 
-    # DOCUMENTS
-    documents_expires = DocumentVehicule.objects.filter(date_expiration__lt=today)
-    documents_bientot = DocumentVehicule.objects.filter(date_expiration__range=[today, in_30_days])
-    documents_expires_count = documents_expires.count()
-    documents_bientot_count = documents_bientot.count()
+    form = ImportFlotteForm(request.POST or None, request.FILES or None)
+    rapport = None
 
-    # ENTRETIENS
-    entretiens_retard = Entretien.objects.filter(date_prevue__lt=today, effectue=False)
-    entretiens_bientot = Entretien.objects.filter(date_prevue__range=[today, in_7_days], effectue=False)
+    if request.method == "POST" and form.is_valid():
+        fichier = form.cleaned_data["fichier"]
+        rapport = importer(
+            form.cleaned_data["type_import"],
+            ouvrir_televersement(fichier),
+            format=format_du_fichier(fichier.name),
+        )
+        if rapport.crees:
+            messages.success(request, f"{rapport.crees} ligne(s) importée(s)")
 
-    # PERMIS
-    chauffeurs_permis_expire = Chauffeur.objects.filter(date_expiration_permis__lt=today)
+    return render(request, "web/imports/import.html", {"form": form, "rapport": rapport})
 
-    # ACTIVITÉ RÉCENTE
-    derniers_vehicules = Vehicule.objects.order_by("-date_creation")[:5]
-    derniers_entretiens = Entretien.objects.order_by("-id")[:5]
 
-    context = {
-        "total_vehicules": total_vehicules,
-        "vehicules_disponibles": vehicules_disponibles,
-        "vehicules_mission": vehicules_mission,
-        "vehicules_maintenance": vehicules_maintenance,
-        "total_chauffeurs": total_chauffeurs,
-        "chauffeurs_disponibles": chauffeurs_disponibles,
-        "chauffeurs_mission": chauffeurs_mission,
-        "documents_expires_count": documents_expires_count,
-        "documents_bientot_count": documents_bientot_count,
-        "documents_expires": documents_expires,
-        "documents_bientot": documents_bientot,
-        "entretiens_retard": entretiens_retard,
-        "entretiens_bientot": entretiens_bientot,
-        "chauffeurs_permis_expire": chauffeurs_permis_expire,
-        "derniers_vehicules": derniers_vehicules,
-        "derniers_entretiens": derniers_entretiens,
+# ----------------------------
+# Exports CSV (en flux)
+# ----------------------------
+@budget_requetes(2)
+@login_required
+@lecture_replique
+def export_csv(request, nom):
+    if request.user.role != "manager":
+        messages.error(request, "Accès refusé.")
+        return redirect("dashboard")
+
+    if nom not in EXPORTS:
+        raise Http404
+
+    return reponse_csv(nom, request.GET)
+
+
+# ----------------------------
+# API JSON
+# ----------------------------
+def _etag_api(request, *args, **kwargs):
+    return api.etag(request)
+
+
+def _erreur_api(message, status):
+    return api.reponse_json({"erreur": message}, status=status)
+
+
+@budget_requetes(10)
+@api_authentifie
+@lecture_replique
+@condition(etag_func=_etag_api)
+def api_liste(request, ressource):
+    try:
+        res = api.ressource(ressource)
+
+        if request.method in ("GET", "HEAD"):
+            api.verifier_lecture(res, request.GET, request.user)
+            return api.reponse_json(api.page(res, request.GET))
+
+        if request.method == "POST":
+            if request.user.role != "manager":
+                return _erreur_api("Accès refusé.", 403)
+            objet, erreurs = api.enregistrer(res, api.lire_corps(request))
+            if erreurs:
+                return api.reponse_json({"erreurs": erreurs}, status=400)
+            response = api.reponse_json(api.serialiser(res, objet), status=201)
+            response["Location"] = reverse("api_detail", args=[ressource, objet.pk])
+            return response
+
+    except api.ErreurApi as e:
+        return _erreur_api(str(e), e.statut)
+    except CurseurInvalide:
+        return _erreur_api("Curseur invalide.", 400)
+
+    return _erreur_api("Méthode non autorisée.", 405)
+
+
+@budget_requetes(14)
+@api_authentifie
+@lecture_replique
+@condition(etag_func=_etag_api)
+def api_detail(request, ressource, pk):
+    try:
+        res = api.ressource(ressource)
+
+        if request.method in ("GET", "HEAD"):
+            api.verifier_lecture(res, request.GET, request.user)
+            champs = api.champs_demandes(res, request.GET)
+            inclusions = api.inclusions_demandees(res, request.GET)
+            objet = api.construire_queryset(res, champs, inclusions).filter(pk=pk).first()
+            if objet is None:
+                return _erreur_api("Introuvable.", 404)
+            return api.reponse_json(api.serialiser(res, objet, champs, inclusions))
+
+        if request.method not in ("PATCH", "DELETE"):
+            return _erreur_api("Méthode non autorisée.", 405)
+
+        if request.user.role != "manager":
+            return _erreur_api("Accès refusé.", 403)
+
+        objet = res.model.objects.filter(pk=pk).first()
+        if objet is None:
+            return _erreur_api("Introuvable.", 404)
+
+        if request.method == "DELETE":
+            objet.delete()
+            return HttpResponse(status=204)
+
+        objet, erreurs = api.enregistrer(res, api.lire_corps(request), instance=objet)
+        if erreurs:
+            return api.reponse_json({"erreurs": erreurs}, status=400)
+        return api.reponse_json(api.serialiser(res, objet))
+
+    except api.ErreurApi as e:
+        return _erreur_api(str(e), e.statut)
+
+
+# ----------------------------
+# Recherche (barre du haut)
+# ----------------------------
+RESULTATS_RECHERCHE = 8
+
+
+@budget_requetes(3)
+@login_required
+@lecture_replique
+def recherche_flotte(request):
+    if request.user.role != "manager":
+        return _erreur_api("Accès refusé.", 403)
+
+    texte = request.GET.get("q", "")[:100]
+    vehicules = recherche.rechercher(Vehicule, texte, RESULTATS_RECHERCHE)
+    chauffeurs = recherche.rechercher(Chauffeur, texte, RESULTATS_RECHERCHE)
+    return api.reponse_json({
+        "vehicules": [
+            {
+                "id": v.pk, "libelle": str(v), "detail": v.get_statut_display(),
+                "url": reverse("vehicule_update", args=[v.pk]),
+            }
+            for v in vehicules
+        ],
+        # c.nom plutôt que str(c), qui lirait le compte utilisateur
+        "chauffeurs": [
+            {
+                "id": c.pk, "libelle": c.nom, "detail": f"{c.telephone} · {c.numero_permis}",
+                "url": reverse("chauffeur_update", args=[c.pk]),
+            }
+            for c in chauffeurs
+        ],
+    })
+
+
+# ----------------------------
+# Autocomplétion des formulaires (widget Autocompletion)
+# ----------------------------
+RESULTATS_AUTOCOMPLETION = 20
+
+SOURCES_AUTOCOMPLETION = {
+    "vehicules": Vehicule,
+    "chauffeurs": Chauffeur,
+}
+
+
+@budget_requetes(4)
+@login_required
+@lecture_replique
+def autocompletion(request, source):
+    if request.user.role != "manager":
+        return _erreur_api("Accès refusé.", 403)
+    if source not in SOURCES_AUTOCOMPLETION:
+        raise Http404
+
+    model = SOURCES_AUTOCOMPLETION[source]
+    # libellés : str(), comme les choix de ModelChoiceField
+    objets = model.objects.select_related("utilisateur") if model is Chauffeur else model.objects.all()
+    avant = request.GET.get("avant", "")
+    avant = int(avant) if avant.isdigit() else None
+    texte = request.GET.get("q", "")[:100]
+
+    # une ligne de plus que la page : y a-t-il une suite ?
+    if texte.strip():
+        ids = [o.pk for o in recherche.rechercher(model, texte, RESULTATS_AUTOCOMPLETION + 1, avant)]
+        trouves = objets.in_bulk(ids[:RESULTATS_AUTOCOMPLETION])
+        page = [trouves[pk] for pk in ids[:RESULTATS_AUTOCOMPLETION] if pk in trouves]
+        suite = len(ids) > RESULTATS_AUTOCOMPLETION
+    else:
+        if avant is not None:
+            objets = objets.filter(pk__lt=avant)
+        page = list(objets.order_by("-pk")[:RESULTATS_AUTOCOMPLETION + 1])
+        suite = len(page) > RESULTATS_AUTOCOMPLETION
+        page = page[:RESULTATS_AUTOCOMPLETION]
+
+    return api.reponse_json({
+        "resultats": [{"id": o.pk, "libelle": str(o)} for o in page],
+        "suivant": page[-1].pk if suite else None,
+    })
+
+
+# ----------------------------
+# Métriques Prometheus
+# ----------------------------
+@budget_requetes(12)
+def exposition_metriques(request):
+    # le collecteur ne se connecte pas : accès par adresse, ou manager
+    if ip_client(request) not in settings.METRIQUES_IPS and getattr(request.user, "role", None) != "manager":
+        return HttpResponseForbidden()
+
+    kpis = kpis_du_jour(timezone.now().date())
+    jauges = {
+        ("flotte_vehicules", (("statut", statut.value),)): kpis[compteur]
+        for statut, compteur in STATUTS_VEHICULE.items()
     }
-    return render(request, "web/comptes/dashboard.html", context)
+    jauges["flotte_documents_expires", ()] = kpis["documents_expires_count"]
+
+    return HttpResponse(metriques.exposition(jauges), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ----------------------------
+# Variantes asynchrones (ASGI)
+# ----------------------------
+# Mêmes pages que dashboard / document_list / entretien_list ; les
+# requêtes indépendantes sont lancées ensemble avec asyncio.gather.
+@budget_requetes(10)
+@login_required
+@lecture_replique
+async def dashboard_async(request):
+    user = await request.auser()
+    request.user = user
+    today = timezone.now().date()
+
+    if user.role == "driver":
+        chauffeur = getattr(user, "profil_chauffeur", None)
+        if chauffeur:
+            chauffeur.etat = Chauffeur.objects.etat_de(chauffeur.date_expiration_permis, today)
+        mes_vehicules = await liste(chauffeur.vehicules.all()) if chauffeur else []
+        return render(request, "web/comptes/dashboard_chauffeur.html", {
+            "chauffeur": chauffeur,
+            "mes_vehicules": mes_vehicules,
+        })
+
+    gen = generation()
+    jour = today.isoformat()
+    en_cache = await asyncio.gather(
+        fragment_en_cache("dashboard_kpis", gen, jour),
+        fragment_en_cache("dashboard_alertes", gen, jour),
+        fragment_en_cache("dashboard_activite", gen),
+    )
+
+    # seules les données des fragments absents du cache sont lues
+    taches = {}
+    # le fragment des alertes affiche aussi les totaux de FleetStats
+    if not en_cache[0] or not en_cache[1]:
+        taches["kpis"] = akpis_du_jour(today)
+    if not en_cache[1]:
+        taches["alertes"] = aalertes_flotte(today)
+    if not en_cache[2]:
+        taches["derniers_vehicules"] = liste(Vehicule.objects.order_by("-date_creation")[:5])
+        taches["derniers_entretiens"] = liste(
+            Entretien.objects.select_related("vehicule").order_by("-id")[:5]
+        )
+    donnees = dict(zip(taches, await asyncio.gather(*taches.values())))
+
+    return render(request, "web/comptes/dashboard.html", {
+        **donnees,
+        "generation": gen,
+        "jour": jour,
+        "duree_fragments": DUREE_FRAGMENTS,
+    })
+
+
+@budget_requetes(4)
+@lecture_replique
+async def document_list_async(request, vehicule_id):
+    today = timezone.now().date()
+    vehicule, documents = await asyncio.gather(
+        aget_object_or_404(Vehicule, id=vehicule_id),
+        liste(DocumentVehicule.objects.filter(vehicule_id=vehicule_id).avec_etat(today)),
+    )
+    request.user = await request.auser()
+
+    return render(
+        request,
+        "web/documents/list_document.html",
+        {"vehicule": vehicule, "documents": documents}
+    )
+
+
+@budget_requetes(4)
+@lecture_replique
+async def entretien_list_async(request, vehicule_id):
+    today = timezone.now().date()
+    vehicule, entretiens = await asyncio.gather(
+        aget_object_or_404(Vehicule, id=vehicule_id),
+        liste(
+            Entretien.objects.filter(vehicule_id=vehicule_id)
+            .avec_etat(today).order_by("-date_prevue")
+        ),
+    )
+    request.user = await request.auser()
+
+    return render(
+        request,
+        "web/entretiens/entretien_list.html",
+        {
+            "vehicule": vehicule,
+            "entretiens": entretiens,
+        }
+    )